@@ -1,6 +1,10 @@
 # game/ai/astar.py
-import heapq
-import math
+from game.ai.graph import get_graph
+from game.ai.bucket_queue import BucketQueue
+from game.ai.danger import DangerField, GUARD_AVOID
+from game.ai.jps import jps_search
+from game.ai.bidirectional import bidirectional_bfs, bidirectional_best_first
+from game.ai.instrumentation import current_probe
 
 def manhattan_distance(a, b):
     return abs(a[0] - b[0]) + abs(a[1] - b[1])
@@ -8,68 +12,67 @@ def manhattan_distance(a, b):
 def zero_heuristic(a, b):
     return 0
 
-def astar_path(tiles, start, goal, algorithm_mode="A_STAR", guards=None):
-    rows = len(tiles)
-    cols = len(tiles[0])
+def astar_path(tiles, start, goal, algorithm_mode="A_STAR", guards=None, danger=None):
+    graph = get_graph(tiles)
+    s, t = graph.node_id(start), graph.node_id(goal)
+    if s is None or t is None:
+        return None
+    indptr, indices, xs, ys = graph.indptr, graph.indices, graph.xs, graph.ys
     
     if algorithm_mode == "UCS": 
-        h_func = zero_heuristic
+        h_weight = 0
     else: 
-        h_func = manhattan_distance
-    
-    open_set = [(0, start)]  
-    g_score = {start: 0}
-    came_from = {start: None}
+        h_weight = 1
+    gx, gy = goal
 
-    while open_set:
-        f, current = heapq.heappop(open_set)
+    # Chi phí né guard (vị trí hiện tại + ô tiếp theo dự đoán) dựng sẵn một lần
+    if danger is None and guards:
+        danger = DangerField.for_guards(graph.width, graph.height, guards, GUARD_AVOID)
+    avoid_cost = (danger.costs if danger else {}).get
 
-        if current == goal:
-            path = []
-            while current is not None:
-                path.append(current)
-                current = came_from.get(current)
-            return path[::-1]
+    # JPS chỉ dùng được khi mọi bước có chi phí 1; có chi phí né guard/địa hình thì quay về A*
+    if algorithm_mode == "JPS" and graph.uniform and not (danger and danger.costs):
+        return jps_search(graph, s, t)[0]
+    # Các chế độ hai chiều; BFS hai chiều cũng chỉ đúng khi chi phí đều
+    if algorithm_mode == "BIDIRECTIONAL_BFS" and graph.uniform and not (danger and danger.costs):
+        return bidirectional_bfs(graph, s, t)[0]
+    if algorithm_mode in ("BIDIRECTIONAL_UCS", "BIDIRECTIONAL_BFS", "BIDIRECTIONAL_A_STAR"):
+        use_heuristic = algorithm_mode == "BIDIRECTIONAL_A_STAR"
+        return bidirectional_best_first(graph, s, t, danger.costs if danger else None, use_heuristic)[0]
+    
+    probe = current_probe()
+    with graph.buffers() as buf:
+        g_score, came_from, stamp = buf.g, buf.parent, buf.stamp
+        q = buf.next_query()
+        g_score[s], came_from[s], stamp[s] = 0, -1, q
+        open_set = BucketQueue()
+        open_set.push(0, s)
+        terrain = graph.cost
 
-        x, y = current
-        
-        for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-            neighbor = (x + dx, y + dy)
-            nx, ny = neighbor
+        while open_set:
+            f, current = open_set.pop()
+            if probe:
+                probe.open_size(len(open_set) + 1)
+            if g_score[current] < f - h_weight * (abs(xs[current] - gx) + abs(ys[current] - gy)):
+                continue  # Mục cũ: ô đã được lấy ra với g nhỏ hơn, không mở rộng lại
+            if probe:
+                probe.expanded += 1
 
-            if 0 <= ny < rows and 0 <= nx < cols and tiles[ny][nx] == 0:
-                
-                avoid_cost = 0
-                if guards:
-                    for guard in guards:
-                        gx, gy = guard.tile_x, guard.tile_y
-                        dist = abs(nx - gx) + abs(ny - gy)
-                        
-                   
-                        # 1. Dự đoán vị trí tiếp theo của guard
-                        guard_next_pos = None
-                        if guard.path and guard.path_index < len(guard.path):
-                            guard_next_pos = guard.path[guard.path_index]
+            if current == t:
+                return graph.path_to(came_from, current)
 
-                        # 2. Phạt cực nặng nếu ô đang xét là điểm đến tiếp theo của guard
-                        if guard_next_pos and neighbor == guard_next_pos:
-                            avoid_cost += 200000 
-
-                        # 3. Áp dụng chi phí tĩnh như cũ
-                        if dist == 0:
-                            avoid_cost += 100000
-                        elif dist == 1:
-                            avoid_cost += 50000 
-                        elif dist == 2:
-                            avoid_cost += 5000  
-                
-                tentative_g_score = g_score.get(current, float('inf')) + 1 + avoid_cost
+            for j in range(indptr[current], indptr[current + 1]):
+                neighbor = indices[j]
+                tentative_g_score = g_score[current] + terrain[neighbor] + avoid_cost(neighbor, 0)
                 
-                if neighbor not in g_score or tentative_g_score < g_score[neighbor]:
+                if stamp[neighbor] != q or tentative_g_score < g_score[neighbor]:
+                    if probe and stamp[neighbor] == q:
+                        probe.reopens += 1
+                    stamp[neighbor] = q
                     g_score[neighbor] = tentative_g_score
                     came_from[neighbor] = current
-                    h_score = h_func(neighbor, goal) 
+                    h_score = h_weight * (abs(xs[neighbor] - gx) + abs(ys[neighbor] - gy))
                     f_score = tentative_g_score + h_score
-                    heapq.heappush(open_set, (f_score, neighbor))
+                    open_set.push(f_score, neighbor)
 
-    return None
\ No newline at end of file
+    return None
@@ -0,0 +1,136 @@
+# game/ai/bidirectional.py
+# Tìm kiếm hai chiều trên GridGraph: một phía từ start, một phía từ goal,
+# dừng khi hai phía gặp nhau và chắc chắn không còn đường ngắn hơn.
+import heapq
+
+INF = float("inf")
+
+
+def _join(graph, parent_f, parent_b, a, b):
+    """Đường đi s..a (cây xuôi) nối với b..t (cây ngược), với a -> b là cạnh gặp nhau"""
+    path = graph.path_to(parent_f, a)
+    xs, ys = graph.xs, graph.ys
+    v = b
+    while v != -1:
+        path.append((xs[v], ys[v]))
+        v = parent_b[v]
+    return path
+
+
+def bidirectional_bfs(graph, s, t):
+    """BFS hai chiều theo từng tầng; luôn mở rộng phía có biên nhỏ hơn.
+
+    Khi một tầng chạm vào phía kia, ta vẫn duyệt hết tầng đó và lấy điểm gặp
+    có tổng độ sâu nhỏ nhất -> đường đi ngắn nhất như BFS thường.
+    Trả về (path, nodes_expanded, nodes_generated).
+    """
+    if s == t:
+        return [graph.coords(s)], 1, 1
+    if not graph.passable[t]:
+        return None, 0, 1  # Không có cạnh nào đi vào ô tường
+    indptr, indices = graph.indptr, graph.indices
+    with graph.buffers() as fwd, graph.buffers() as bwd:
+        qf, qb = fwd.next_query(), bwd.next_query()
+        fwd.g[s], fwd.parent[s], fwd.stamp[s] = 0, -1, qf
+        bwd.g[t], bwd.parent[t], bwd.stamp[t] = 0, -1, qb
+        frontiers = {True: [s], False: [t]}
+        nodes_expanded = 0
+        nodes_generated = 2
+
+        while frontiers[True] and frontiers[False]:
+            forward = len(frontiers[True]) <= len(frontiers[False])
+            this, other = (fwd, bwd) if forward else (bwd, fwd)
+            q_this, q_other = (qf, qb) if forward else (qb, qf)
+            best, meet = INF, None
+            next_level = []
+            for u in frontiers[forward]:
+                nodes_expanded += 1
+                for j in range(indptr[u], indptr[u + 1]):
+                    v = indices[j]
+                    if other.stamp[v] == q_other:
+                        total = this.g[u] + 1 + other.g[v]
+                        if total < best:
+                            best, meet = total, (u, v)
+                    elif this.stamp[v] != q_this:
+                        this.stamp[v], this.g[v], this.parent[v] = q_this, this.g[u] + 1, u
+                        next_level.append(v)
+                        nodes_generated += 1
+            if meet is not None:
+                a, b = meet if forward else meet[::-1]
+                return _join(graph, fwd.parent, bwd.parent, a, b), nodes_expanded, nodes_generated
+            frontiers[forward] = next_level
+    return None, nodes_expanded, nodes_generated
+
+
+def bidirectional_best_first(graph, s, t, node_costs=None, use_heuristic=True):
+    """UCS/A* hai chiều với chi phí đi vào ô v = graph.cost[v] (địa hình) + node_costs[v].
+
+    Heuristic dùng thế năng cân bằng p(v) = (h_t(v) - h_s(v)) / 2 (phía ngược
+    dùng -p) nên hai phía chạy trên cùng một đồ thị chi phí rút gọn; nhân đôi
+    mọi khoá để giữ số nguyên. Dừng khi top_xuôi + top_ngược >= 2 * mu, với mu
+    là độ dài đường tốt nhất đã gặp. use_heuristic=False -> Dijkstra/UCS hai chiều.
+    Trả về (path, nodes_expanded, nodes_generated).
+    """
+    if s == t:
+        return [graph.coords(s)], 1, 1
+    if not graph.passable[t]:
+        return None, 0, 1
+    indptr, indices, xs, ys, terrain = graph.indptr, graph.indices, graph.xs, graph.ys, graph.cost
+    sx, sy, tx, ty = xs[s], ys[s], xs[t], ys[t]
+    extra = (node_costs or {}).get
+
+    def potential(v):
+        if not use_heuristic:
+            return 0
+        x, y = xs[v], ys[v]
+        return (abs(x - tx) + abs(y - ty)) - (abs(x - sx) + abs(y - sy))
+
+    with graph.buffers() as fwd, graph.buffers() as bwd:
+        qf, qb = fwd.next_query(), bwd.next_query()
+        fwd.g[s], fwd.parent[s], fwd.stamp[s] = 0, -1, qf
+        bwd.g[t], bwd.parent[t], bwd.stamp[t] = 0, -1, qb
+        open_f = [(potential(s), 0, s)]
+        open_b = [(-potential(t), 0, t)]
+        mu, meet = INF, None
+        nodes_expanded = 0
+        nodes_generated = 2
+
+        while open_f and open_b:
+            # Bỏ các mục cũ ở đỉnh heap trước khi so điều kiện dừng
+            while open_f and open_f[0][1] != fwd.g[open_f[0][2]]:
+                heapq.heappop(open_f)
+            while open_b and open_b[0][1] != bwd.g[open_b[0][2]]:
+                heapq.heappop(open_b)
+            if not open_f or not open_b or open_f[0][0] + open_b[0][0] >= 2 * mu:
+                break
+
+            forward = len(open_f) <= len(open_b)
+            if forward:
+                _, g, u = heapq.heappop(open_f)
+                nodes_expanded += 1
+                for j in range(indptr[u], indptr[u + 1]):
+                    v = indices[j]
+                    new_g = g + terrain[v] + extra(v, 0)
+                    if fwd.stamp[v] != qf or new_g < fwd.g[v]:
+                        fwd.stamp[v], fwd.g[v], fwd.parent[v] = qf, new_g, u
+                        heapq.heappush(open_f, (2 * new_g + potential(v), new_g, v))
+                        nodes_generated += 1
+                        if bwd.stamp[v] == qb and new_g + bwd.g[v] < mu:
+                            mu, meet = new_g + bwd.g[v], v
+            else:
+                _, g, u = heapq.heappop(open_b)
+                nodes_expanded += 1
+                # Cạnh thật là v -> u, chi phí là chi phí đi vào u
+                new_g = g + terrain[u] + extra(u, 0)
+                for j in range(indptr[u], indptr[u + 1]):
+                    v = indices[j]
+                    if bwd.stamp[v] != qb or new_g < bwd.g[v]:
+                        bwd.stamp[v], bwd.g[v], bwd.parent[v] = qb, new_g, u
+                        heapq.heappush(open_b, (2 * new_g - potential(v), new_g, v))
+                        nodes_generated += 1
+                        if fwd.stamp[v] == qf and fwd.g[v] + new_g < mu:
+                            mu, meet = fwd.g[v] + new_g, v
+
+        if meet is None:
+            return None, nodes_expanded, nodes_generated
+        return _join(graph, fwd.parent, bwd.parent, meet, bwd.parent[meet]), nodes_expanded, nodes_generated
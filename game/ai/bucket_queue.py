@@ -0,0 +1,49 @@
+# game/ai/bucket_queue.py
+# Hàng đợi ưu tiên dạng "xô" (Dial) cho chi phí nguyên nhỏ: mỗi độ ưu tiên là
+# một danh sách, heap chỉ chứa các khoá khác nhau thay vì từng phần tử.
+import heapq
+
+
+class BucketQueue:
+    """Hàng đợi ưu tiên số nguyên.
+
+    push/pop O(1) khi độ ưu tiên đã có xô; heap chỉ được đụng tới khi xuất
+    hiện một độ ưu tiên mới, nên với chi phí địa hình nhỏ (1, 5, 10) số thao
+    tác heap rất ít. Trong cùng một xô lấy theo LIFO (ưu tiên nút vừa sinh,
+    giúp A* đi sâu khi f bằng nhau).
+    """
+
+    __slots__ = ("_buckets", "_keys", "_size")
+
+    def __init__(self):
+        self._buckets = {}
+        self._keys = []
+        self._size = 0
+
+    def push(self, priority, item):
+        bucket = self._buckets.get(priority)
+        if bucket is None:
+            bucket = self._buckets[priority] = []
+            heapq.heappush(self._keys, priority)
+        bucket.append(item)
+        self._size += 1
+
+    def pop(self):
+        """Lấy (priority, item) có priority nhỏ nhất"""
+        priority = self._keys[0]
+        bucket = self._buckets[priority]
+        item = bucket.pop()
+        if not bucket:
+            del self._buckets[priority]
+            heapq.heappop(self._keys)
+        self._size -= 1
+        return priority, item
+
+    def min_priority(self):
+        return self._keys[0]
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
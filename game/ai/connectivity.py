@@ -0,0 +1,209 @@
+# game/ai/connectivity.py
+# Nhãn thành phần liên thông (ndarray) của các ô đi được, dựng một lần cho mỗi
+# mê cung và cập nhật tăng dần khi chế độ Edit bật/tắt tường. Dùng để biết lối
+# ra có bị chặn không và vùng nào người chơi không tới được mà không phải BFS
+# lại toàn bản đồ sau mỗi lần sửa.
+import threading
+import weakref
+from collections import deque
+import numpy as np
+from game.maze.tilemap import TileMapRef, as_tilemap
+
+NO_COMPONENT = -1
+
+
+class ConnectivityIndex:
+    """labels[y, x] = nhãn thành phần chứa (x, y), NO_COMPONENT nếu là tường.
+
+    - Mở một ô: gộp các thành phần kề ô đó (thành phần nhỏ nhận nhãn của thành
+      phần lớn nhất).
+    - Đóng một ô: BFS song song từ các hàng xóm của nó, nhóm nào gặp nhau thì
+      gộp; dừng khi chỉ còn một nhóm chưa duyệt xong. Các nhóm đã xong là phần
+      bị tách ra và nhận nhãn mới, nên chi phí tỉ lệ với phần nhỏ.
+    """
+
+    tiles = TileMapRef()
+
+    def __init__(self, tiles):
+        self.tiles = tiles
+        self.width, self.height = self.tiles.width, self.tiles.height
+        self._lock = threading.Lock()
+        self.rebuild()
+
+    def rebuild(self):
+        w, h = self.width, self.height
+        self.version = self.tiles.version
+        self.passable = self.tiles.passable_mask().ravel().tolist()
+        self.sizes = {}  # nhãn -> số ô
+        self._next_label = 0
+        comp = [NO_COMPONENT] * (w * h)
+        for s, ok in enumerate(self.passable):
+            if not ok or comp[s] != NO_COMPONENT:
+                continue
+            label = self._new_label()
+            comp[s] = label
+            queue, size = deque([s]), 0
+            while queue:
+                u = queue.popleft()
+                size += 1
+                for n in self._neighbors(u):
+                    if self.passable[n] and comp[n] == NO_COMPONENT:
+                        comp[n] = label
+                        queue.append(n)
+            self.sizes[label] = size
+        self.labels = np.array(comp, dtype=np.int32).reshape(h, w)
+
+    def _new_label(self):
+        label = self._next_label
+        self._next_label += 1
+        return label
+
+    def _neighbors(self, v):
+        w = self.width
+        y, x = divmod(v, w)
+        result = []
+        if y < self.height - 1:
+            result.append(v + w)
+        if y > 0:
+            result.append(v - w)
+        if x < w - 1:
+            result.append(v + 1)
+        if x > 0:
+            result.append(v - 1)
+        return result
+
+    # --- Cập nhật tăng dần ---
+    def sync(self):
+        """Áp các lần sửa bản đồ kể từ lần đồng bộ trước"""
+        with self._lock:
+            if self.version == self.tiles.version:
+                return
+            version = self.tiles.version
+            edits = self.tiles.changes_since(self.version)
+            if edits is None:
+                self.rebuild()
+                return
+            self.version = version
+            for x, y in edits:
+                v = y * self.width + x
+                now = self.tiles.is_passable(x, y)
+                if now == self.passable[v]:
+                    continue
+                self.passable[v] = now
+                if now:
+                    self._open(v)
+                else:
+                    self._close(v)
+
+    def _open(self, v):
+        flat = self.labels.ravel()
+        found = {int(flat[n]) for n in self._neighbors(v) if self.passable[n]}
+        if not found:
+            label = self._new_label()
+            self.sizes[label] = 0
+        else:
+            label = max(found, key=self.sizes.__getitem__)
+            for other in found - {label}:
+                flat[flat == other] = label  # Đổi nhãn vector hoá
+                self.sizes[label] += self.sizes.pop(other)
+        flat[v] = label
+        self.sizes[label] += 1
+
+    def _close(self, v):
+        flat, passable = self.labels.ravel(), self.passable
+        label = int(flat[v])
+        flat[v] = NO_COMPONENT
+        self.sizes[label] -= 1
+        starts = [n for n in self._neighbors(v) if passable[n]]
+        if not starts:
+            del self.sizes[label]
+            return
+        if len(starts) == 1:
+            return
+        # BFS song song từ từng hàng xóm; root[i] là nhóm mà tìm kiếm i đã gộp vào
+        k = len(starts)
+        root = list(range(k))
+        owner = {s: i for i, s in enumerate(starts)}
+        cells = [[s] for s in starts]
+        queues = [deque([s]) for s in starts]
+
+        def find(i):
+            while root[i] != i:
+                i = root[i]
+            return i
+
+        while True:
+            active = [i for i in range(k) if root[i] == i and queues[i]]
+            if len(active) <= 1:
+                break
+            for i in active:
+                if root[i] != i or not queues[i]:
+                    continue
+                u = queues[i].popleft()
+                for n in self._neighbors(u):
+                    if not passable[n]:
+                        continue
+                    j = owner.get(n)
+                    if j is None:
+                        owner[n] = i
+                        cells[i].append(n)
+                        queues[i].append(n)
+                        continue
+                    j = find(j)
+                    if j != i:
+                        # Hai nhóm gặp nhau: cùng một thành phần
+                        root[j] = i
+                        cells[i].extend(cells[j])
+                        queues[i].extend(queues[j])
+                        cells[j], queues[j] = [], deque()
+
+        groups = [i for i in range(k) if root[i] == i]
+        if len(groups) == 1:
+            return
+        # Nhóm còn đang duyệt (hoặc nhóm lớn nhất nếu tất cả đã xong) giữ nhãn cũ
+        keep = next((i for i in groups if queues[i]), None)
+        if keep is None:
+            keep = max(groups, key=lambda i: len(cells[i]))
+        for i in groups:
+            if i == keep:
+                continue
+            new = self._new_label()
+            flat[np.fromiter(cells[i], dtype=np.intp, count=len(cells[i]))] = new
+            self.sizes[new] = len(cells[i])
+            self.sizes[label] -= len(cells[i])
+
+    # --- Truy vấn ---
+    def label(self, pos):
+        x, y = pos
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return NO_COMPONENT
+        return int(self.labels[y, x])
+
+    def connected(self, a, b):
+        la = self.label(a)
+        return la != NO_COMPONENT and la == self.label(b)
+
+    def component_count(self):
+        return len(self.sizes)
+
+    def unreachable_from(self, pos):
+        """Mảng (N, 2) toạ độ (x, y) các ô đi được không cùng thành phần với pos"""
+        mask = self.labels != self.label(pos)
+        mask &= self.labels != NO_COMPONENT
+        ys, xs = np.nonzero(mask)
+        return np.column_stack((xs, ys))
+
+
+_indexes = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def get_connectivity(tiles):
+    """Chỉ mục liên thông của bản đồ (dựng nếu chưa có), đã đồng bộ"""
+    tiles = as_tilemap(tiles)
+    with _indexes_lock:
+        index = _indexes.get(tiles)
+        if index is None:
+            index = _indexes[tiles] = ConnectivityIndex(tiles)
+    index.sync()
+    return index
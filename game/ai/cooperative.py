@@ -0,0 +1,103 @@
+# game/ai/cooperative.py
+# Tìm đường hợp tác cho nhiều guard kiểu WHCA* (Windowed Hierarchical
+# Cooperative A*): mỗi guard tìm trong không gian (ô, nhịp) có hành động đứng
+# chờ, tránh các (ô, nhịp) mà guard ưu tiên hơn đã đặt chỗ, trong một cửa sổ
+# `window` nhịp. Ngoài cửa sổ chỉ ước lượng bằng khoảng cách thật (trường
+# khoảng cách ngược từ đích, game/ai/distance_field.py) nên chi phí bị chặn.
+from game.ai.bucket_queue import BucketQueue
+
+INF = float("inf")
+
+
+class ReservationTable:
+    """Bảng băm đặt chỗ dùng chung: (ô, nhịp) -> chủ và (u, v, nhịp) -> chủ.
+
+    Nhịp 0 là lúc lập kế hoạch; một nhịp là một bước sang ô kề (hoặc một lần
+    đứng chờ). Cạnh (u, v, t) nghĩa là đi u -> v trong nhịp t -> t+1, dùng để
+    cấm hai guard đổi chỗ cho nhau trên cùng một cạnh.
+    """
+
+    def __init__(self):
+        self.cells = {}
+        self.edges = {}
+
+    def clear(self):
+        self.cells.clear()
+        self.edges.clear()
+
+    def is_free(self, v, t, owner=None):
+        holder = self.cells.get((v, t))
+        return holder is None or holder == owner
+
+    def can_move(self, u, v, t, owner=None):
+        """Đi u -> v trong nhịp t có đụng ai đi ngược v -> u cùng nhịp không"""
+        holder = self.edges.get((v, u, t))
+        return holder is None or holder == owner
+
+    def reserve_path(self, owner, ids, until=0, skip=None):
+        """Đặt chỗ ids[t] ở nhịp t; đứng ở ô cuối tới hết nhịp `until`. Bỏ qua ô `skip`."""
+        for t, v in enumerate(ids):
+            if v != skip:
+                self.cells[(v, t)] = owner
+            if t and ids[t - 1] != v:
+                self.edges[(ids[t - 1], v, t - 1)] = owner
+        last = ids[-1]
+        if last != skip:
+            for t in range(len(ids), until + 1):
+                self.cells[(last, t)] = owner
+
+
+def windowed_astar(graph, s, goal, heuristic, table, owner=None, window=16, free_goal=False):
+    """A* trong không gian (ô, nhịp) giới hạn `window` nhịp.
+
+    heuristic(v) là chi phí thật còn lại từ v tới goal khi bỏ qua guard khác
+    (None = không tới được); chi phí đi vào ô là graph.cost, đứng chờ tốn 1.
+    Dừng ở trạng thái đầu tiên tới goal (và giữ được goal tới hết cửa sổ) hoặc
+    chạm nhịp cuối cửa sổ. free_goal=True: không kiểm tra đặt chỗ ở goal (các
+    guard cùng đuổi người chơi được phép dồn vào một ô).
+    Trả về danh sách id theo từng nhịp (có lặp lại khi đứng chờ), hoặc None.
+    """
+    h0 = heuristic(s)
+    if h0 is None:
+        return None
+    n = graph.size
+    indptr, indices, cost = graph.indptr, graph.indices, graph.cost
+    g_score = {s: 0}
+    came_from = {s: -1}
+    closed = set()
+    open_set = BucketQueue()
+    open_set.push(h0, s)
+
+    while open_set:
+        _, state = open_set.pop()
+        if state in closed:
+            continue
+        closed.add(state)
+        dt, v = divmod(state, n)
+        if dt == window or (v == goal and (free_goal or all(
+                table.is_free(goal, t, owner) for t in range(dt + 1, window + 1)))):
+            ids = []
+            while state != -1:
+                ids.append(state % n)
+                state = came_from[state]
+            return ids[::-1]
+
+        g = g_score[state]
+        nt = dt + 1
+        # Hành động: đứng chờ tại v, hoặc bước sang một ô kề
+        moves = [(v, 1)] + [(indices[j], cost[indices[j]]) for j in range(indptr[v], indptr[v + 1])]
+        for u, step in moves:
+            if not (free_goal and u == goal) and not table.is_free(u, nt, owner):
+                continue
+            if u != v and not table.can_move(v, u, dt, owner):
+                continue
+            h = heuristic(u)
+            if h is None:
+                continue
+            nxt = nt * n + u
+            new_g = g + step
+            if new_g < g_score.get(nxt, INF):
+                g_score[nxt] = new_g
+                came_from[nxt] = state
+                open_set.push(new_g + h, nxt)
+    return None
@@ -0,0 +1,101 @@
+# game/ai/danger.py
+# Trường "nguy hiểm" quanh lính gác: dựng một lần cho mỗi truy vấn/tick rồi
+# vòng lặp tìm kiếm chỉ cần tra cost[id] thay vì lặp qua từng guard.
+import itertools
+import threading
+from collections import namedtuple
+import numpy as np
+
+# ring_costs[d] = chi phí cộng thêm khi ô cách guard đúng d ô (Manhattan)
+# next_tile_cost = chi phí cộng thêm cho ô guard sắp bước tới
+DangerProfile = namedtuple("DangerProfile", ["name", "ring_costs", "next_tile_cost"])
+
+# Profile của A* người chơi (game/ai/pathfinding.py)
+PLAYER_DANGER = DangerProfile("player", (1000, 50, 20, 5), 0)
+# Profile né guard của game/ai/astar.py
+GUARD_AVOID = DangerProfile("guard_avoid", (100000, 50000, 5000), 200000)
+
+_versions = itertools.count(1)
+
+
+def _ring_kernel(ring_costs):
+    """Các offset (dx, dy) trong hình thoi bán kính len(ring_costs)-1 và chi phí tương ứng"""
+    r = len(ring_costs) - 1
+    dy, dx = np.mgrid[-r:r + 1, -r:r + 1]
+    dist = np.abs(dx) + np.abs(dy)
+    inside = dist <= r
+    return dx[inside], dy[inside], np.asarray(ring_costs, dtype=np.int64)[dist[inside]]
+
+
+def guard_signature(guards):
+    """(vị trí hiện tại, ô tiếp theo dự đoán) của từng guard"""
+    sig = []
+    for guard in guards:
+        nxt = None
+        if guard.path and guard.path_index < len(guard.path):
+            nxt = tuple(guard.path[guard.path_index])
+        sig.append((guard.tile_x, guard.tile_y, nxt))
+    return tuple(sig)
+
+
+class DangerField:
+    """Lưới chi phí nguy hiểm (width x height) dựng bằng stamping vector hoá.
+
+    `costs` là dict thưa {node_id: chi phí} cho vòng lặp tìm kiếm (chỉ các ô
+    quanh guard khác 0); `grid` là mảng NumPy đầy đủ cho xử lý hàng loạt.
+    """
+
+    def __init__(self, width, height, signature, profile):
+        self.width, self.height = width, height
+        self.signature = signature
+        self.profile = profile
+        self.version = next(_versions)
+
+        positions = np.array([(x, y) for x, y, _ in signature], dtype=np.int64).reshape(-1, 2)
+        kdx, kdy, kcost = _ring_kernel(profile.ring_costs)
+        xs = (positions[:, :1] + kdx).ravel()
+        ys = (positions[:, 1:] + kdy).ravel()
+        values = np.broadcast_to(kcost, (len(positions), len(kcost))).ravel()
+
+        if profile.next_tile_cost:
+            nexts = np.array([nxt for _, _, nxt in signature if nxt], dtype=np.int64).reshape(-1, 2)
+            xs = np.concatenate((xs, nexts[:, 0]))
+            ys = np.concatenate((ys, nexts[:, 1]))
+            values = np.concatenate((values, np.full(len(nexts), profile.next_tile_cost, dtype=np.int64)))
+
+        inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        ids = ys[inside] * width + xs[inside]
+        values = values[inside]
+        unique_ids, inverse = np.unique(ids, return_inverse=True)
+        totals = np.bincount(inverse, weights=values, minlength=len(unique_ids)).astype(np.int64)
+        self.costs = dict(zip(unique_ids.tolist(), totals.tolist()))
+        self._grid = None
+
+    @property
+    def grid(self):
+        if self._grid is None:
+            grid = np.zeros(self.width * self.height, dtype=np.int64)
+            if self.costs:
+                grid[list(self.costs)] = list(self.costs.values())
+            self._grid = grid.reshape(self.height, self.width)
+        return self._grid
+
+    def cost_at(self, pos):
+        return self.costs.get(pos[1] * self.width + pos[0], 0)
+
+    # --- Cache dùng chung trong cùng một tick ---
+    _cache = {}
+    _cache_lock = threading.Lock()
+
+    @classmethod
+    def for_guards(cls, width, height, guards, profile=PLAYER_DANGER):
+        """Lấy trường nguy hiểm cho danh sách guard; nếu guard chưa di chuyển kể
+           từ lần gọi trước (cùng tick) thì dùng lại trường cũ"""
+        signature = guard_signature(guards)
+        key = (profile.name, width, height)
+        with cls._cache_lock:
+            field = cls._cache.get(key)
+            if field is None or field.signature != signature or field.profile != profile:
+                field = cls(width, height, signature, profile)
+                cls._cache[key] = field
+            return field
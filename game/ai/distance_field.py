@@ -0,0 +1,105 @@
+# game/ai/distance_field.py
+# Trường khoảng cách (flow field) gốc tại ô người chơi: một BFS ngược dùng
+# chung cho mọi guard đang đuổi, mỗi guard chỉ cần đi xuôi theo gradient.
+from collections import deque
+from game.ai.graph import get_graph
+from game.ai.bucket_queue import BucketQueue
+
+
+class DistanceField:
+    """Khoảng cách BFS từ mọi ô tới `root`, mở rộng lười.
+
+    BFS chỉ chạy tiếp khi có ô được hỏi mà chưa có nhãn, nên chi phí tối đa
+    là tới guard xa nhất chứ không phải cả bản đồ. `max_nodes` giới hạn số ô
+    được gắn nhãn (vượt quá thì coi như không tới được, nơi gọi tự tìm đường).
+    Bản đồ có địa hình (graph.uniform = False) thì dùng Dijkstra trên BucketQueue,
+    nhãn chỉ chốt khi ô được lấy ra khỏi hàng đợi.
+    """
+
+    def __init__(self, tiles, root, max_nodes=None):
+        self.graph = graph = get_graph(tiles)
+        self.version = graph.version
+        self.root = tuple(root)
+        self.max_nodes = max_nodes
+        r = graph.node_id(root)
+        # Ô gốc là tường thì không có cạnh nào đi vào nó
+        has_root = r is not None and graph.passable[r]
+        if graph.uniform:
+            self.dist = {} if r is None else {r: 0}
+            self._queue = deque([r]) if has_root else deque()
+        else:
+            self.dist = {}
+            self._tentative = {r: 0} if has_root else {}
+            self._queue = BucketQueue()
+            if has_root:
+                self._queue.push(0, r)
+
+    def _expand_until(self, v):
+        if not self.graph.uniform:
+            self._settle_until(v)
+            return
+        dist, queue = self.dist, self._queue
+        indptr, indices = self.graph.indptr, self.graph.indices
+        limit = self.max_nodes
+        while v not in dist and queue:
+            if limit and len(dist) >= limit:
+                break
+            u = queue.popleft()
+            du = dist[u] + 1
+            for j in range(indptr[u], indptr[u + 1]):
+                n = indices[j]
+                if n not in dist:
+                    dist[n] = du
+                    queue.append(n)
+
+    def _settle_until(self, v):
+        # Dijkstra ngược: chi phí cạnh u -> n bằng chi phí đi vào u
+        dist, tentative, queue = self.dist, self._tentative, self._queue
+        indptr, indices, terrain = self.graph.indptr, self.graph.indices, self.graph.cost
+        limit = self.max_nodes
+        while v not in dist and queue:
+            if limit and len(dist) >= limit:
+                break
+            du, u = queue.pop()
+            if u in dist:
+                continue
+            dist[u] = du
+            step = du + terrain[u]
+            for j in range(indptr[u], indptr[u + 1]):
+                n = indices[j]
+                if n not in dist and step < tentative.get(n, step + 1):
+                    tentative[n] = step
+                    queue.push(step, n)
+
+    def distance(self, pos):
+        """Chi phí từ pos tới root (số bước nếu không có địa hình), hoặc None nếu không tới được"""
+        v = self.graph.node_id(pos)
+        if v is None:
+            return None
+        return self.node_distance(v)
+
+    def node_distance(self, v):
+        """Như distance() nhưng nhận id nút (dùng làm heuristic trong vòng lặp tìm kiếm)"""
+        if v not in self.dist:
+            self._expand_until(v)
+        return self.dist.get(v)
+
+    def path_from(self, pos):
+        """Đường đi ngắn nhất pos -> root bằng cách đi xuống theo gradient"""
+        if self.distance(pos) is None:
+            return None
+        graph, dist = self.graph, self.dist
+        v = graph.node_id(pos)
+        path = [graph.coords(v)]
+        while dist[v] > 0:
+            # Bước tiếp theo n thoả dist[n] + chi phí đi vào n == dist[v]
+            for n in graph.neighbors(v):
+                d = dist.get(n)
+                if d is not None and d + graph.cost[n] == dist[v]:
+                    v = n
+                    break
+            path.append(graph.coords(v))
+        return path
+
+    def is_stale(self, tiles, root):
+        return self.version != tiles.version or self.root != tuple(root)
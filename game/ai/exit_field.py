@@ -0,0 +1,217 @@
+# game/ai/exit_field.py
+# Bảng khoảng cách tới lối ra (ndarray) dựng một lần cho mỗi mê cung, cập nhật
+# tăng dần khi chế độ Edit bật/tắt tường. Dùng làm heuristic hoàn hảo cho A*,
+# làm "la bàn" bước tiếp theo cho AI người chơi và để phát hiện lối ra bị chặn.
+import heapq
+import threading
+import weakref
+from collections import deque
+import numpy as np
+from game.maze.tilemap import TileMap, TileMapRef, as_tilemap
+
+UNREACHABLE = -1
+
+
+class ExitDistanceField:
+    """dist[y, x] = số bước ngắn nhất từ (x, y) tới goal, UNREACHABLE nếu không tới được.
+
+    - Mở một ô: khoảng cách chỉ có thể giảm -> lan truyền BFS từ ô đó.
+    - Đóng một ô: tìm các ô mà mọi "ô đỡ" (hàng xóm có dist nhỏ hơn 1) đều bị
+      ảnh hưởng, xoá nhãn của chúng rồi tính lại bằng Dijkstra từ biên vùng đó.
+    """
+
+    tiles = TileMapRef()
+
+    def __init__(self, tiles, goal, dist=None):
+        self.tiles = tiles
+        self.width, self.height = self.tiles.width, self.tiles.height
+        self.goal = tuple(goal)
+        self._goal_id = self.goal[1] * self.width + self.goal[0]
+        self._lock = threading.Lock()
+        if dist is not None and np.shape(dist) == (self.height, self.width):
+            # Bảng đã tính sẵn cho đúng bản đồ này (ví dụ nạp từ file mê cung): khỏi BFS lại
+            self.version = self.tiles.version
+            self.passable = self.tiles.passable_mask().ravel().tolist()
+            self.dist = np.array(dist, dtype=np.int32)
+            self._heuristic = None
+        else:
+            self.rebuild()
+
+    def rebuild(self):
+        w, h = self.width, self.height
+        self.version = self.tiles.version
+        self.passable = self.tiles.passable_mask().ravel().tolist()
+        self.dist = np.full((h, w), UNREACHABLE, dtype=np.int32)
+        self._heuristic = None
+        flat = self.dist.ravel()
+        passable = np.asarray(self.passable, dtype=bool)
+        g = self._goal_id
+        if not passable[g]:
+            return
+        # BFS vector hoá theo từng tầng
+        flat[g] = 0
+        frontier, d = np.array([g]), 0
+        while frontier.size:
+            d += 1
+            ys, xs = np.divmod(frontier, w)
+            cand = np.unique(np.concatenate((frontier[ys < h - 1] + w, frontier[ys > 0] - w,
+                                             frontier[xs < w - 1] + 1, frontier[xs > 0] - 1)))
+            cand = cand[passable[cand] & (flat[cand] == UNREACHABLE)]
+            flat[cand] = d
+            frontier = cand
+
+    def _neighbors(self, v):
+        w = self.width
+        y, x = divmod(v, w)
+        result = []
+        if y < self.height - 1:
+            result.append(v + w)
+        if y > 0:
+            result.append(v - w)
+        if x < w - 1:
+            result.append(v + 1)
+        if x > 0:
+            result.append(v - 1)
+        return result
+
+    # --- Cập nhật tăng dần ---
+    def sync(self):
+        """Áp các lần sửa bản đồ kể từ lần đồng bộ trước"""
+        with self._lock:
+            if self.version == self.tiles.version:
+                return
+            version = self.tiles.version
+            edits = self.tiles.changes_since(self.version)
+            if edits is None:
+                self.rebuild()
+                return
+            self.version = version
+            for x, y in edits:
+                v = y * self.width + x
+                now = self.tiles.is_passable(x, y)
+                if now == self.passable[v]:
+                    continue
+                if v == self._goal_id:
+                    self.rebuild()
+                    return
+                self.passable[v] = now
+                if now:
+                    self._open(v)
+                else:
+                    self._close(v)
+            self._heuristic = None
+
+    def _open(self, v):
+        flat, passable = self.dist.ravel(), self.passable
+        known = [flat[n] for n in self._neighbors(v) if flat[n] >= 0]
+        if not known:
+            return
+        flat[v] = min(known) + 1
+        queue = deque([v])
+        while queue:
+            u = queue.popleft()
+            du = flat[u] + 1
+            for n in self._neighbors(u):
+                if passable[n] and (flat[n] < 0 or flat[n] > du):
+                    flat[n] = du
+                    queue.append(n)
+
+    def _close(self, v):
+        flat, passable = self.dist.ravel(), self.passable
+        old = int(flat[v])
+        flat[v] = UNREACHABLE
+        if old < 0:
+            return
+        # 1. Vùng bị ảnh hưởng, duyệt theo tầng dist tăng dần
+        affected = {v}
+        level, d = [v], old
+        while level:
+            nxt = []
+            for u in level:
+                for n in self._neighbors(u):
+                    if n in affected or flat[n] != d + 1:
+                        continue
+                    supported = any(m not in affected and flat[m] == d for m in self._neighbors(n))
+                    if not supported:
+                        affected.add(n)
+                        nxt.append(n)
+            level, d = nxt, d + 1
+        affected.discard(v)
+        for a in affected:
+            flat[a] = UNREACHABLE
+        # 2. Tính lại vùng đó từ các ô biên còn nhãn
+        heap = []
+        for a in affected:
+            known = [flat[m] for m in self._neighbors(a) if flat[m] >= 0]
+            if known:
+                heap.append((min(known) + 1, a))
+        heapq.heapify(heap)
+        while heap:
+            da, a = heapq.heappop(heap)
+            if 0 <= flat[a] <= da:
+                continue
+            flat[a] = da
+            for n in self._neighbors(a):
+                if passable[n] and (flat[n] < 0 or flat[n] > da + 1):
+                    heapq.heappush(heap, (da + 1, n))
+
+    # --- Truy vấn ---
+    def distance(self, pos):
+        x, y = pos
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        d = int(self.dist[y, x])
+        return d if d >= 0 else None
+
+    def next_step(self, pos):
+        """Ô kề gần lối ra hơn đúng 1 bước (thứ tự hướng như các thuật toán khác)"""
+        d = self.distance(pos)
+        if not d:
+            return None
+        for dx, dy in ((0, 1), (0, -1), (1, 0), (-1, 0)):
+            n = (pos[0] + dx, pos[1] + dy)
+            if self.distance(n) == d - 1 and self.tiles.is_passable(*n):
+                return n
+        return None
+
+    def path_from(self, pos):
+        if self.distance(pos) is None:
+            return None
+        path = [tuple(pos)]
+        while path[-1] != self.goal:
+            path.append(self.next_step(path[-1]))
+        return path
+
+    def heuristic(self):
+        """dist dạng list phẳng theo id (tra nhanh trong vòng lặp A*), cache theo version"""
+        if self._heuristic is None:
+            self._heuristic = self.dist.ravel().tolist()
+        return self._heuristic
+
+
+_fields = weakref.WeakKeyDictionary()
+_fields_lock = threading.Lock()
+
+
+def get_exit_field(tiles, goal):
+    """Trường khoảng cách tới goal của bản đồ (dựng nếu chưa có), đã đồng bộ"""
+    tiles = as_tilemap(tiles)
+    with _fields_lock:
+        per_map = _fields.setdefault(tiles, {})
+        field = per_map.get(tuple(goal))
+        if field is None:
+            field = per_map[tuple(goal)] = ExitDistanceField(tiles, goal)
+    field.sync()
+    return field
+
+
+def find_exit_field(tiles, goal):
+    """Như get_exit_field nhưng không dựng mới: None nếu chưa ai đăng ký goal này"""
+    if not isinstance(tiles, TileMap):
+        return None
+    with _fields_lock:
+        per_map = _fields.get(tiles)
+        field = per_map.get(tuple(goal)) if per_map else None
+    if field is not None:
+        field.sync()
+    return field
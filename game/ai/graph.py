@@ -0,0 +1,122 @@
+# game/ai/graph.py
+# Nhân đồ thị dùng chung cho các thuật toán tìm đường: mỗi ô là một số nguyên
+# id = y * width + x, hàng xóm lưu dạng CSR (indptr/indices) dựng một lần.
+import threading
+import weakref
+from contextlib import contextmanager
+import numpy as np
+from game import config
+from game.maze.tilemap import as_tilemap
+
+INF = float("inf")
+
+# Thứ tự hướng giữ nguyên như các thuật toán cũ: (0,1), (0,-1), (1,0), (-1,0)
+DIRECTIONS = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+
+
+class SearchBuffers:
+    """Mảng g/parent cấp phát sẵn, dùng lại giữa các lần tìm kiếm.
+
+    Thay vì xoá mảng sau mỗi truy vấn, mỗi ô được đánh dấu `stamp`: giá trị
+    g/parent chỉ hợp lệ khi stamp[v] == query hiện tại.
+    """
+
+    def __init__(self, n):
+        self.g = [INF] * n
+        self.parent = [-1] * n
+        self.stamp = [0] * n
+        self.query = 0
+
+    def next_query(self):
+        self.query += 1
+        return self.query
+
+
+def terrain_lut():
+    """Bảng tra chi phí đi vào ô theo loại ô (mặc định 1), từ config.TERRAIN_COSTS"""
+    lut = np.ones(256, dtype=np.int64)
+    for tile_type, cost in config.TERRAIN_COSTS.items():
+        lut[tile_type] = cost
+    return lut
+
+
+class GridGraph:
+    """Đồ thị lưới 4 hướng dạng CSR, dựng vector hoá từ một phiên bản TileMap.
+
+    `cost[v]` là chi phí đi vào ô v theo config.TERRAIN_COSTS; `uniform` = True
+    khi mọi ô đi được đều có chi phí 1 (BFS/JPS cho kết quả tối ưu).
+    """
+
+    def __init__(self, tiles):
+        tiles = as_tilemap(tiles)
+        self.width, self.height = w, h = tiles.width, tiles.height
+        self.version = tiles.version
+        n = self.size = w * h
+
+        passable = tiles.passable_mask().ravel()
+        ids = np.arange(n)
+        ys, xs = np.divmod(ids, w)
+        candidates = np.stack([ids + w, ids - w, ids + 1, ids - 1], axis=1)
+        valid = np.stack([ys < h - 1, ys > 0, xs < w - 1, xs > 0], axis=1)
+        # Chỉ cần ô đích đi được (ô xuất phát có thể là tường, giống bản cũ)
+        valid[valid] = passable[candidates[valid]]
+
+        self.indptr = np.concatenate(([0], np.cumsum(valid.sum(axis=1)))).tolist()
+        self.indices = candidates[valid].tolist()
+        self.passable = passable.tolist()
+        cost = terrain_lut()[tiles.data.ravel()]
+        self.cost = cost.tolist()
+        self.uniform = bool((cost[passable] == 1).all())
+        self.xs = xs.tolist()
+        self.ys = ys.tolist()
+        self._free_buffers = []
+        self._lock = threading.Lock()
+
+    # --- Chuyển đổi toạ độ <-> id ---
+    def node_id(self, pos):
+        x, y = pos
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return y * self.width + x
+        return None
+
+    def coords(self, v):
+        return (self.xs[v], self.ys[v])
+
+    def neighbors(self, v):
+        return self.indices[self.indptr[v]:self.indptr[v + 1]]
+
+    def path_to(self, parent, v):
+        """Dựng lại đường đi (list toạ độ) từ mảng parent"""
+        xs, ys = self.xs, self.ys
+        path = []
+        while v != -1:
+            path.append((xs[v], ys[v]))
+            v = parent[v]
+        return path[::-1]
+
+    # --- Bộ đệm tìm kiếm ---
+    @contextmanager
+    def buffers(self):
+        """Mượn một bộ SearchBuffers (an toàn khi nhiều truy vấn chạy song song)"""
+        with self._lock:
+            buf = self._free_buffers.pop() if self._free_buffers else SearchBuffers(self.size)
+        try:
+            yield buf
+        finally:
+            with self._lock:
+                self._free_buffers.append(buf)
+
+
+_graphs = weakref.WeakKeyDictionary()
+_graphs_lock = threading.Lock()
+
+
+def get_graph(tiles):
+    """Lấy GridGraph của TileMap, chỉ dựng lại khi tiles.version thay đổi"""
+    tiles = as_tilemap(tiles)
+    with _graphs_lock:
+        graph = _graphs.get(tiles)
+        if graph is None or graph.version != tiles.version:
+            graph = GridGraph(tiles)
+            _graphs[tiles] = graph
+        return graph
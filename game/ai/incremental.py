@@ -0,0 +1,212 @@
+# game/ai/incremental.py
+# Lập kế hoạch tăng dần (D* Lite) cho AI người chơi: giữ lại cây tìm kiếm
+# giữa các lần gọi và chỉ sửa phần bị ảnh hưởng khi bản đồ/nguy hiểm đổi.
+import heapq
+import threading
+from collections import OrderedDict
+from game.ai.danger import DangerField, PLAYER_DANGER
+from game.ai.graph import terrain_lut
+from game.maze.tilemap import TileMapRef, as_tilemap
+
+INF = float("inf")
+MAX_PLANNERS = 4  # Số planner (theo bản đồ + đích) được giữ lại
+
+
+class DStarLite:
+    """D* Lite (Koenig & Likhachev) trên lưới 4 hướng.
+
+    Tìm kiếm ngược từ đích; chi phí đi vào ô v = địa hình(v) + nguy hiểm(v) (tường = vô cùng).
+    Khi ô đổi trạng thái hoặc chi phí nguy hiểm đổi, chỉ các ô kề ô đó được
+    cập nhật lại rồi tìm kiếm tiếp từ hàng đợi cũ.
+    """
+
+    tiles = TileMapRef()
+
+    def __init__(self, tiles, goal):
+        self.tiles = tiles
+        self.width, self.height = self.tiles.width, self.tiles.height
+        self.goal = goal[1] * self.width + goal[0]
+        # km / last_start thuộc về chuỗi lời gọi plan(), không phải về hàng đợi:
+        # _reset() giữa chừng (nhật ký sửa bị tràn) không được xoá chúng, nếu
+        # không lần plan() sau sẽ quên cộng h(last_start, start) vào km
+        self.km = 0
+        self.last_start = None
+        self._reset()
+
+    def _reset(self):
+        n = self.width * self.height
+        self.version = self.tiles.version
+        self._lut = terrain_lut()
+        data = self.tiles.data.ravel()
+        # Chi phí địa hình đi vào từng ô; tường = INF
+        self.terrain = [INF if not ok else c for ok, c in
+                        zip(self.tiles.passable_mask().ravel().tolist(), self._lut[data].tolist())]
+        self.danger = {}
+        self.g = [INF] * n
+        self.rhs = [INF] * n
+        self.rhs[self.goal] = 0
+        self.open = []
+        self.open_key = {}
+        self.generated = 0
+        self._push(self.goal, (self._h(self.goal, self.goal), 0))
+
+    # --- Hàm tiện ích trên id ---
+    def _neighbors(self, v):
+        w = self.width
+        y, x = divmod(v, w)
+        result = []
+        if y < self.height - 1:
+            result.append(v + w)
+        if y > 0:
+            result.append(v - w)
+        if x < w - 1:
+            result.append(v + 1)
+        if x > 0:
+            result.append(v - 1)
+        return result
+
+    def _cost(self, v):
+        return self.terrain[v] + self.danger.get(v, 0)
+
+    def _h(self, a, b):
+        ay, ax = divmod(a, self.width)
+        by, bx = divmod(b, self.width)
+        return abs(ax - bx) + abs(ay - by)
+
+    def _key(self, v):
+        m = min(self.g[v], self.rhs[v])
+        return (m + self._h(self.start, v) + self.km, m)
+
+    def _push(self, v, key):
+        self.open_key[v] = key
+        heapq.heappush(self.open, (key[0], key[1], v))
+        self.generated += 1
+
+    def _update_vertex(self, v):
+        if self.g[v] != self.rhs[v]:
+            self._push(v, self._key(v))
+        else:
+            self.open_key.pop(v, None)
+
+    def _update_rhs(self, v):
+        if v != self.goal:
+            g, cost = self.g, self._cost
+            self.rhs[v] = min((cost(s) + g[s] for s in self._neighbors(v)), default=INF)
+        self._update_vertex(v)
+
+    # --- Đồng bộ thay đổi ---
+    def _sync(self, danger_costs):
+        changed = set()
+        version = self.tiles.version
+        edits = self.tiles.changes_since(self.version)
+        if edits is None:
+            self._reset()
+            edits = []
+        self.version = version
+        for x, y in edits:
+            v = y * self.width + x
+            now = int(self._lut[self.tiles.get(x, y)]) if self.tiles.is_passable(x, y) else INF
+            if now != self.terrain[v]:
+                self.terrain[v] = now
+                changed.add(v)
+        old = self.danger
+        for v in old.keys() | danger_costs.keys():
+            if old.get(v, 0) != danger_costs.get(v, 0):
+                changed.add(v)
+        self.danger = danger_costs
+        # Đổi chi phí đi vào v -> chỉ rhs của các ô kề v bị ảnh hưởng
+        for v in changed:
+            for u in self._neighbors(v):
+                self._update_rhs(u)
+        return len(changed)
+
+    def _compute_shortest_path(self):
+        expanded = 0
+        g, rhs, open_heap, open_key = self.g, self.rhs, self.open, self.open_key
+        start = self.start
+        while open_heap:
+            k1, k2, u = open_heap[0]
+            if open_key.get(u) != (k1, k2):
+                heapq.heappop(open_heap)  # Mục cũ (đã bị cập nhật hoặc xoá)
+                continue
+            if (k1, k2) >= self._key(start) and rhs[start] == g[start]:
+                break
+            heapq.heappop(open_heap)
+            del open_key[u]
+            k_new = self._key(u)
+            if (k1, k2) < k_new:
+                self._push(u, k_new)
+                continue
+            expanded += 1
+            if g[u] > rhs[u]:
+                g[u] = rhs[u]
+                for s in self._neighbors(u):
+                    self._update_rhs(s)
+            else:
+                g[u] = INF
+                self._update_rhs(u)
+                for s in self._neighbors(u):
+                    self._update_rhs(s)
+        return expanded
+
+    def _extract_path(self):
+        v = self.start
+        if self.g[v] == INF and self.rhs[v] == INF:
+            return None
+        w = self.width
+        path = [(v % w, v // w)]
+        for _ in range(self.width * self.height):
+            if v == self.goal:
+                return path
+            best, best_cost = None, INF
+            for s in self._neighbors(v):
+                c = self._cost(s) + self.g[s]
+                if c < best_cost:
+                    best, best_cost = s, c
+            if best is None:
+                return None
+            v = best
+            path.append((v % w, v // w))
+        return None
+
+    def plan(self, start, danger_costs=None):
+        """Trả về (path, nodes_expanded, nodes_generated) từ start tới đích"""
+        self.start = start[1] * self.width + start[0]
+        if self.last_start is not None:
+            self.km += self._h(self.last_start, self.start)
+        self.last_start = self.start
+        self.generated = 0
+        self._sync(danger_costs or {})
+        expanded = self._compute_shortest_path()
+        return self._extract_path(), expanded, self.generated
+
+
+_planners = OrderedDict()
+_planners_lock = threading.Lock()
+
+
+def get_planner(tiles, goal):
+    """Planner dùng lại được cho (bản đồ, đích); giữ tối đa MAX_PLANNERS cái gần nhất"""
+    key = (tiles.uid, tuple(goal))
+    with _planners_lock:
+        # Planner của bản đồ đã bị giải phóng (giữ bằng weakref) thì bỏ luôn
+        for dead in [k for k, p in _planners.items() if p.tiles is None]:
+            del _planners[dead]
+        planner = _planners.get(key)
+        if planner is None:
+            planner = DStarLite(tiles, goal)
+            _planners[key] = planner
+            while len(_planners) > MAX_PLANNERS:
+                _planners.popitem(last=False)
+        _planners.move_to_end(key)
+        return planner
+
+
+def dstar_lite_path(tiles, start, goal, guards=None):
+    tiles = as_tilemap(tiles)
+    if not (tiles.in_bounds(*start) and tiles.in_bounds(*goal)):
+        return None, 0, 0
+    danger = DangerField.for_guards(tiles.width, tiles.height, guards, PLAYER_DANGER) if guards else None
+    planner = get_planner(tiles, goal)
+    with _planners_lock:
+        return planner.plan(start, danger.costs if danger else None)
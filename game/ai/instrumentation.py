@@ -0,0 +1,183 @@
+# game/ai/instrumentation.py
+# Đo đạc các lần tìm đường: thời gian perf_counter_ns, kích thước open set lớn
+# nhất, số lần "mở lại" một ô (tìm được g tốt hơn), bộ nhớ đỉnh (tracemalloc,
+# tuỳ chọn). Kết quả đẩy vào một "sink" cắm được; không có sink thì gần như
+# không tốn gì (một phép so sánh None cho mỗi lần gọi / mỗi lần mở rộng).
+import threading
+import time
+import tracemalloc
+from collections import deque, namedtuple
+
+import numpy as np
+
+# Nơi gọi (caller) chuẩn, dùng làm một nửa khoá của histogram
+CALLER_PLAYER = "player"
+CALLER_GUARD_CHASE = "guard_chase"
+CALLER_GUARD_PATROL = "guard_patrol"
+
+SearchSample = namedtuple("SearchSample", [
+    "caller", "algorithm", "time_ns", "nodes_expanded", "nodes_generated",
+    "path_length", "peak_open", "reopens", "peak_bytes",
+])
+
+SAMPLE_METRICS = ("time_ns", "nodes_expanded", "nodes_generated", "path_length",
+                  "peak_open", "reopens", "peak_bytes")
+
+
+class SearchProbe:
+    """Bộ đếm cho một lần tìm kiếm; thuật toán lấy qua current_probe().
+
+    Vòng lặp chỉ cần `if probe:` trước khi gọi, nên khi tắt đo đạc chi phí
+    là một phép kiểm tra biến cục bộ. `expanded` chỉ được đếm bởi các hàm chỉ
+    trả về path (game/ai/astar.py); các hàm khác tự trả về số nút đã mở rộng.
+    """
+
+    __slots__ = ("peak_open", "reopens", "expanded")
+
+    def __init__(self):
+        self.peak_open = 0
+        self.reopens = 0
+        self.expanded = 0
+
+    def open_size(self, size):
+        if size > self.peak_open:
+            self.peak_open = size
+
+
+_sink = None
+_local = threading.local()
+# tracemalloc bật/tắt cho cả process: các lần đo bộ nhớ (ví dụ từ nhiều worker
+# thread của PathService) phải chạy lần lượt, không thì lần này tắt giữa chừng
+# phiên của lần khác. RLock để lần đo lồng trong cùng thread không tự khoá.
+_trace_lock = threading.RLock()
+
+
+def set_sink(sink):
+    """Gắn sink (đối tượng có record(sample), tuỳ chọn thuộc tính trace_memory); None để tắt"""
+    global _sink
+    _sink = sink
+
+
+def get_sink():
+    return _sink
+
+
+def current_probe():
+    """Probe của lần tìm kiếm đang đo trên thread này, None nếu không đo"""
+    return getattr(_local, "probe", None)
+
+
+def run_search(caller, algorithm, func, *args, **kwargs):
+    """Gọi func(*args, **kwargs) và ghi một SearchSample vào sink nếu có.
+
+    Trả về đúng kết quả của func: (path, expanded, generated) như các hàm
+    trong pathfinding.py, hoặc chỉ path như game/ai/astar.py.
+    """
+    sink = _sink
+    if sink is None:
+        return func(*args, **kwargs)
+
+    if getattr(sink, "trace_memory", False):
+        with _trace_lock:
+            # Chỉ bật tracemalloc nếu chưa ai bật (không phá phiên đo bên ngoài)
+            return _measure(sink, caller, algorithm, func, args, kwargs, not tracemalloc.is_tracing())
+    return _measure(sink, caller, algorithm, func, args, kwargs, False)
+
+
+def _measure(sink, caller, algorithm, func, args, kwargs, trace):
+    probe = SearchProbe()
+    outer = getattr(_local, "probe", None)
+    _local.probe = probe
+    if trace:
+        tracemalloc.start()
+    t0 = time.perf_counter_ns()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        elapsed = time.perf_counter_ns() - t0
+        peak_bytes = None
+        if trace:
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        _local.probe = outer
+
+    if isinstance(result, tuple):
+        path, nodes_expanded, nodes_generated = result
+    else:
+        path, nodes_expanded, nodes_generated = result, probe.expanded or None, None
+    sink.record(SearchSample(caller, algorithm, elapsed, nodes_expanded, nodes_generated,
+                             len(path) if path else 0, probe.peak_open, probe.reopens, peak_bytes))
+    return result
+
+
+class HistogramSink:
+    """Giữ `window` mẫu gần nhất cho mỗi (thuật toán, caller) và tính phân phối.
+
+    trace_memory=True -> mỗi lần đo chạy dưới tracemalloc (chậm hơn nhiều,
+    chỉ nên bật khi cần số liệu bộ nhớ); các lần đo khi đó chạy lần lượt kể
+    cả từ nhiều thread.
+    """
+
+    def __init__(self, window=256, trace_memory=False):
+        self.window = window
+        self.trace_memory = trace_memory
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, sample):
+        key = (sample.algorithm, sample.caller)
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(sample)
+
+    def keys(self):
+        with self._lock:
+            return sorted(self._samples)
+
+    def values(self, key, metric):
+        with self._lock:
+            samples = list(self._samples.get(key, ()))
+        return np.array([getattr(s, metric) for s in samples if getattr(s, metric) is not None],
+                        dtype=np.float64)
+
+    def histogram(self, key, metric="time_ns", bins=10):
+        """(counts, bin_edges) của metric trong cửa sổ hiện tại"""
+        values = self.values(key, metric)
+        if not values.size:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        return np.histogram(values, bins=bins)
+
+    def summary(self, percentiles=(50, 90, 99)):
+        """{(thuật toán, caller): {metric: {"mean", "p50", ...}}} cho các metric có dữ liệu"""
+        result = {}
+        for key in self.keys():
+            stats = {}
+            for metric in SAMPLE_METRICS:
+                values = self.values(key, metric)
+                if values.size:
+                    entry = {"count": int(values.size), "mean": float(values.mean())}
+                    for p, v in zip(percentiles, np.percentile(values, percentiles)):
+                        entry[f"p{p}"] = float(v)
+                    stats[metric] = entry
+            result[key] = stats
+        return result
+
+    def report_lines(self):
+        """Bảng tóm tắt dạng text (p50/p90 thời gian, open set, số lần mở lại)"""
+        lines = []
+        for (algorithm, caller), stats in self.summary().items():
+            t = stats["time_ns"]
+            line = (f"{algorithm:<28} {caller:<13} n={t['count']:<4} "
+                    f"p50={t['p50'] / 1e6:.3f}ms p90={t['p90'] / 1e6:.3f}ms")
+            if "peak_open" in stats:
+                line += f" open_p90={stats['peak_open']['p90']:.0f} reopens_p90={stats['reopens']['p90']:.0f}"
+            if "peak_bytes" in stats:
+                line += f" mem_p90={stats['peak_bytes']['p90'] / 1024:.1f}KB"
+            lines.append(line)
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
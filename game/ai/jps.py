@@ -0,0 +1,107 @@
+# game/ai/jps.py
+# Jump Point Search 4 hướng cho lưới chi phí đều: thay vì đẩy từng ô hành
+# lang vào hàng đợi, ta "nhảy" thẳng tới ô rẽ nhánh (jump point) kế tiếp.
+import heapq
+
+
+def _sign(v):
+    return (v > 0) - (v < 0)
+
+
+def jps_search(graph, s, t):
+    """A* trên các jump point của GridGraph (mọi bước có chi phí 1).
+
+    Trả về (path, nodes_expanded, nodes_generated); path là đầy đủ từng ô,
+    độ dài bằng UCS/BFS. Luật cắt tỉa theo biến thể "không đi chéo":
+    - đi ngang: dừng khi ô trên/dưới mở ra (ô phía sau bên đó là tường);
+    - đi dọc: dừng như trên theo trục x, hoặc khi nhánh ngang có jump point.
+    """
+    w, h = graph.width, graph.height
+    passable = graph.passable
+    gx, gy = t % w, t // w
+
+    def walkable(x, y):
+        return 0 <= x < w and 0 <= y < h and passable[y * w + x]
+
+    def jump_horizontal(x, y, dx):
+        while True:
+            x += dx
+            if not walkable(x, y):
+                return None
+            if x == gx and y == gy:
+                return (x, y)
+            if (walkable(x, y - 1) and not walkable(x - dx, y - 1)) or \
+               (walkable(x, y + 1) and not walkable(x - dx, y + 1)):
+                return (x, y)
+
+    def jump_vertical(x, y, dy):
+        while True:
+            y += dy
+            if not walkable(x, y):
+                return None
+            if x == gx and y == gy:
+                return (x, y)
+            if (walkable(x - 1, y) and not walkable(x - 1, y - dy)) or \
+               (walkable(x + 1, y) and not walkable(x + 1, y - dy)):
+                return (x, y)
+            if jump_horizontal(x, y, 1) or jump_horizontal(x, y, -1):
+                return (x, y)
+
+    def successors(v, parent):
+        x, y = v % w, v // w
+        if parent == -1:
+            dirs = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+        else:
+            dx, dy = _sign(x - parent % w), _sign(y - parent // w)
+            if dx:
+                dirs = [(0, -1), (0, 1), (dx, 0)]
+            else:
+                dirs = [(-1, 0), (1, 0), (0, dy)]
+        result = []
+        for dx, dy in dirs:
+            if not walkable(x + dx, y + dy):
+                continue
+            point = jump_horizontal(x, y, dx) if dx else jump_vertical(x, y, dy)
+            if point:
+                result.append(point)
+        return result
+
+    with graph.buffers() as buf:
+        g_score, came_from, stamp = buf.g, buf.parent, buf.stamp
+        q = buf.next_query()
+        g_score[s], came_from[s], stamp[s] = 0, -1, q
+        open_set = [(abs(s % w - gx) + abs(s // w - gy), s)]
+        nodes_expanded = 0
+        nodes_generated = 1
+        while open_set:
+            f, current = heapq.heappop(open_set)
+            cx, cy = current % w, current // w
+            if g_score[current] < f - (abs(cx - gx) + abs(cy - gy)):
+                continue
+            nodes_expanded += 1
+            if current == t:
+                return _expand(graph, came_from, current), nodes_expanded, nodes_generated
+            for jx, jy in successors(current, came_from[current]):
+                neighbor = jy * w + jx
+                # Jump point luôn nằm thẳng hàng với ô hiện tại
+                tentative_g_score = g_score[current] + abs(jx - cx) + abs(jy - cy)
+                if stamp[neighbor] != q or tentative_g_score < g_score[neighbor]:
+                    stamp[neighbor] = q
+                    g_score[neighbor] = tentative_g_score
+                    came_from[neighbor] = current
+                    heapq.heappush(open_set, (tentative_g_score + abs(jx - gx) + abs(jy - gy), neighbor))
+                    nodes_generated += 1
+    return None, nodes_expanded, nodes_generated
+
+
+def _expand(graph, came_from, v):
+    """Nối các jump point thành đường đi từng ô"""
+    points = graph.path_to(came_from, v)
+    path = [points[0]]
+    for x, y in points[1:]:
+        px, py = path[-1]
+        dx, dy = _sign(x - px), _sign(y - py)
+        while (px, py) != (x, y):
+            px, py = px + dx, py + dy
+            path.append((px, py))
+    return path
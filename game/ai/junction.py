@@ -0,0 +1,255 @@
+# game/ai/junction.py
+# Đồ thị nút giao cho mê cung: mê cung sinh ra phần lớn là hành lang rộng 1 ô
+# nối giữa ít ngã rẽ, nên chỉ giữ các ô có số hàng xóm khác 2 (ngã rẽ, ngõ
+# cụt) làm nút, mỗi hành lang thành một cạnh có chi phí. Tìm kiếm chạy trên đồ
+# thị nhỏ này; đường đi từng ô chỉ được dò lại theo hành lang khi xuất kết quả.
+import heapq
+import threading
+import weakref
+from game.ai.graph import terrain_lut
+from game.maze.tilemap import TileMapRef, as_tilemap
+
+
+class JunctionGraph:
+    """Đồ thị nút giao trên một TileMap.
+
+    - Nút: ô đi được có số hàng xóm đi được khác 2, cộng một ô "ghim" cho mỗi
+      vòng hành lang không chứa nút nào.
+    - `adj[a][step] = (b, back, inner, hops)`: hành lang rời a qua ô kề `step`
+      tới nút b, vào b từ ô `back`; `inner` là tổng chi phí các ô ở giữa nên
+      chi phí a -> b là inner + cost[b]. Các ô bên trong không được lưu.
+    Sửa một ô chỉ gỡ rồi dò lại các hành lang đi qua ô đó và bốn ô kề.
+    """
+
+    tiles = TileMapRef()
+
+    def __init__(self, tiles):
+        self.tiles = tiles
+        self.width, self.height = self.tiles.width, self.tiles.height
+        self._lut = terrain_lut()
+        self._lock = threading.Lock()
+        self.rebuild()
+
+    def rebuild(self):
+        self.version = self.tiles.version
+        self.passable = self.tiles.passable_mask().ravel().tolist()
+        self.cost = self._lut[self.tiles.data.ravel()].tolist()
+        self.pinned = set()
+        self.adj = {}
+        for v, ok in enumerate(self.passable):
+            if ok and self._degree(v) != 2:
+                self.adj[v] = {}
+        covered = bytearray(len(self.passable))
+        for a in list(self.adj):
+            self._link_all(a, covered)
+        # Vòng hành lang không có nút nào: ghim một ô của nó làm nút
+        for v, ok in enumerate(self.passable):
+            if ok and v not in self.adj and not covered[v]:
+                self._pin(v, covered)
+
+    def _neighbors(self, v):
+        w = self.width
+        y, x = divmod(v, w)
+        result = []
+        if y < self.height - 1:
+            result.append(v + w)
+        if y > 0:
+            result.append(v - w)
+        if x < w - 1:
+            result.append(v + 1)
+        if x > 0:
+            result.append(v - 1)
+        return result
+
+    def _degree(self, v):
+        passable = self.passable
+        return sum(1 for n in self._neighbors(v) if passable[n])
+
+    def _is_node(self, v):
+        return self.passable[v] and (v in self.pinned or self._degree(v) != 2)
+
+    # --- Hành lang ---
+    def _walk(self, a, step, stop=-1, trail=None):
+        """Đi dọc hành lang từ a qua step tới nút kế tiếp (hoặc ô stop, hoặc quay
+           lại a); trả về (ô cuối, ô ngay trước nó, chi phí các ô ở giữa, số bước)"""
+        passable, cost, adj = self.passable, self.cost, self.adj
+        prev, cur, inner, hops = a, step, 0, 1
+        while cur != stop and cur != a and cur not in adj:
+            if trail is not None:
+                trail[cur] = 1
+            inner += cost[cur]
+            prev, cur = cur, next(n for n in self._neighbors(cur) if passable[n] and n != prev)
+            hops += 1
+        return cur, prev, inner, hops
+
+    def _trace(self, a, step, end):
+        """Các ô từ step tới end (gồm end) dọc hành lang rời a qua step"""
+        passable = self.passable
+        ids, prev, cur = [step], a, step
+        while cur != end:
+            prev, cur = cur, next(n for n in self._neighbors(cur) if passable[n] and n != prev)
+            ids.append(cur)
+        return ids
+
+    def _link_all(self, a, trail=None):
+        for step in self._neighbors(a):
+            if self.passable[step] and step not in self.adj[a]:
+                b, back, inner, hops = self._walk(a, step, trail=trail)
+                self.adj[a][step] = (b, back, inner, hops)
+                self.adj[b][back] = (a, step, inner, hops)
+
+    def _unlink(self, a, step):
+        entry = self.adj[a].pop(step, None)
+        if entry is None:
+            return ()
+        b, back = entry[0], entry[1]
+        self.adj[b].pop(back, None)
+        return a, b
+
+    def _pin(self, v, trail=None):
+        self.pinned.add(v)
+        self.adj[v] = {}
+        self._link_all(v, trail)
+
+    # --- Đồng bộ với các lần sửa bản đồ ---
+    def _sync(self):
+        version = self.tiles.version
+        edits = self.tiles.changes_since(self.version)
+        if edits is None:
+            self.rebuild()
+            return
+        self.version = version
+        for x, y in edits:
+            v = y * self.width + x
+            now = self.tiles.is_passable(x, y)
+            cost = int(self._lut[self.tiles.get(x, y)])
+            if now != self.passable[v] or cost != self.cost[v]:
+                self._patch(v, now, cost)
+
+    def _patch(self, v, passable_now, cost_now):
+        area = [v] + self._neighbors(v)
+        # 1. Gỡ mọi hành lang đi qua / kết thúc ở vùng bị ảnh hưởng (trạng thái cũ)
+        ends = set()
+        for u in area:
+            if not self.passable[u]:
+                continue
+            if u in self.adj:
+                for step in list(self.adj[u]):
+                    ends.update(self._unlink(u, step))
+            else:
+                step = next(n for n in self._neighbors(u) if self.passable[n])
+                b, back, _, _ = self._walk(u, step)
+                ends.update(self._unlink(b, back))
+        # 2. Áp thay đổi, cập nhật tập nút quanh ô vừa sửa
+        self.passable[v], self.cost[v] = passable_now, cost_now
+        for u in area:
+            if u in self.pinned and (not self.passable[u] or self._degree(u) != 2):
+                self.pinned.discard(u)  # Đã là nút thật (hoặc thành tường): bỏ ghim
+            if self._is_node(u):
+                if u not in self.adj:
+                    self.adj[u] = {}
+                ends.add(u)
+            else:
+                self.adj.pop(u, None)
+        # 3. Dò lại các hành lang còn thiếu từ các nút liên quan
+        for a in ends:
+            if a in self.adj:
+                self._link_all(a)
+        for u in area:
+            if self.passable[u] and u not in self.adj:
+                step = next(n for n in self._neighbors(u) if self.passable[n])
+                if self._walk(u, step)[0] == u:
+                    self._pin(u)  # Vừa khép thành một vòng không có nút
+
+    # --- Truy vấn ---
+    def node_count(self):
+        return len(self.adj)
+
+    def find_path(self, start, goal):
+        """Trả về (path, nodes_expanded, nodes_generated); path tối ưu theo chi phí địa hình"""
+        with self._lock:
+            if self.version != self.tiles.version:
+                self._sync()
+            return self._find_path(start, goal)
+
+    def _find_path(self, start, goal):
+        if not (self.tiles.in_bounds(*start) and self.tiles.in_bounds(*goal)):
+            return None, 0, 0
+        w, passable, cost, adj = self.width, self.passable, self.cost, self.adj
+        s, t = start[1] * w + start[0], goal[1] * w + goal[0]
+        if s == t:
+            return [tuple(start)], 1, 1
+        if not passable[s] or not passable[t]:
+            return None, 0, 1
+
+        # Gắn tạm start/goal nằm giữa hành lang vào hai nút ở hai đầu
+        start_edges = []
+        if s not in adj:
+            for step in self._neighbors(s):
+                if passable[step]:
+                    b, _, inner, _ = self._walk(s, step, stop=t)
+                    start_edges.append((b, step, inner + cost[b]))
+        goal_edges = {}
+        if t not in adj:
+            for step in self._neighbors(t):
+                if passable[step]:
+                    a, back, inner, _ = self._walk(t, step, stop=s)
+                    if a == s and s not in adj:
+                        continue  # Cùng hành lang với start: đã có cạnh thẳng trong start_edges
+                    if a not in goal_edges or inner + cost[t] < goal_edges[a][1]:
+                        goal_edges[a] = (back, inner + cost[t])
+
+        tx, ty = goal
+        g, parent = {s: 0}, {s: None}
+        open_set = [(abs(start[0] - tx) + abs(start[1] - ty), 0, s)]
+        nodes_expanded = 0
+        nodes_generated = 1
+        while open_set:
+            _, gu, u = heapq.heappop(open_set)
+            if gu != g[u]:
+                continue
+            nodes_expanded += 1
+            if u == t:
+                break
+            if u in adj:
+                edges = [(b, step, inner + cost[b]) for step, (b, _, inner, _) in adj[u].items()]
+            else:
+                edges = start_edges
+            if u in goal_edges:
+                step, c = goal_edges[u]
+                edges = edges + [(t, step, c)]
+            for v, step, c in edges:
+                new_g = gu + c
+                if new_g < g.get(v, new_g + 1):
+                    g[v], parent[v] = new_g, (u, step)
+                    y, x = divmod(v, w)
+                    heapq.heappush(open_set, (new_g + abs(x - tx) + abs(y - ty), new_g, v))
+                    nodes_generated += 1
+        if t not in g:
+            return None, nodes_expanded, nodes_generated
+
+        # Mở rộng lười: chỉ dò lại các hành lang nằm trên đường tìm được
+        hops = []
+        v = t
+        while parent[v] is not None:
+            u, step = parent[v]
+            hops.append((u, step, v))
+            v = u
+        ids = [s]
+        for u, step, v in reversed(hops):
+            ids += self._trace(u, step, v)
+        return [(v % w, v // w) for v in ids], nodes_expanded, nodes_generated
+
+
+_junction_graphs = weakref.WeakKeyDictionary()
+_junction_graphs_lock = threading.Lock()
+
+
+def get_junction_graph(tiles):
+    """JunctionGraph dùng chung cho mỗi TileMap (tự cập nhật theo nhật ký sửa)"""
+    tiles = as_tilemap(tiles)
+    with _junction_graphs_lock:
+        graph = _junction_graphs.get(tiles)
+        if graph is None:
+            graph = _junction_graphs[tiles] = JunctionGraph(tiles)
+        return graph
@@ -0,0 +1,200 @@
+# game/ai/landmarks.py
+# Heuristic ALT (A*, Landmarks, bất đẳng thức Tam giác) cho A*: chọn K ô
+# landmark xa nhau trong mê cung, lưu khoảng cách BFS từ mỗi landmark tới mọi
+# ô. Với mọi goal, |d(L, goal) - d(L, v)| là cận dưới của khoảng cách v -> goal,
+# chặt hơn Manhattan nhiều khi mê cung bắt đi vòng qua các ngõ cụt.
+import threading
+import weakref
+from collections import deque
+import numpy as np
+from game import config
+from game.ai.exit_field import ExitDistanceField
+from game.ai.graph import get_graph
+from game.maze.tilemap import TileMap, TileMapRef, as_tilemap
+
+LAYER_PREFIX = "landmark"  # Tên layer trong file mê cung: landmark0, landmark1, ...
+GOAL_CACHE_SIZE = 16       # Số bảng heuristic (theo goal) giữ lại cho mỗi version bản đồ
+
+
+class LandmarkTable:
+    """Các bảng khoảng cách từ landmark, mỗi bảng là một ExitDistanceField.
+
+    Landmark được chọn kiểu "điểm xa nhất": landmark đầu là ô xa nhất tính từ ô
+    đi được đầu tiên, mỗi landmark sau là ô xa nhất tính từ các landmark đã có.
+    Khoảng cách đếm theo số bước nên vẫn là cận dưới khi có địa hình (mỗi bước
+    tốn >= 1). Sau khi sửa bản đồ, các bảng chỉ được đồng bộ tăng dần ở lần
+    truy vấn kế tiếp chứ không phải sau từng lần sửa.
+    """
+
+    tiles = TileMapRef()
+
+    def __init__(self, tiles, count=config.ALT_LANDMARKS, fields=None):
+        self.tiles = tiles
+        self.width, self.height = self.tiles.width, self.tiles.height
+        self._lock = threading.Lock()
+        self.fields = fields if fields is not None else self._select(count)
+        ys, xs = np.divmod(np.arange(self.width * self.height, dtype=np.int32), self.width)
+        self._xs, self._ys = xs, ys
+        self._matrix = None    # (K, N) int32, dựng lại khi version đổi
+        self._version = None
+        self._goals = {}       # goal -> bảng heuristic (list phẳng theo id)
+
+    def _select(self, count):
+        free = self.tiles.free_tiles()
+        if not free or count <= 0:
+            return []
+        graph = get_graph(self.tiles)
+        score = _bfs(graph, graph.node_id(free[0]))
+        fields = []
+        for i in range(count):
+            best = int(np.argmax(score))
+            if i and score[best] <= 0:
+                break  # Mọi ô đều đã là landmark (hoặc không tới được)
+            dist = _bfs(graph, best)
+            fields.append(ExitDistanceField(self.tiles, graph.coords(best), dist.reshape(self.tiles.shape)))
+            # Khoảng cách tới landmark gần nhất; ô không tới được giữ -1
+            score = dist if i == 0 else np.minimum(score, dist)
+        return fields
+
+    @property
+    def landmarks(self):
+        return [field.goal for field in self.fields]
+
+    def _sync(self):
+        version = self.tiles.version
+        for field in self.fields:
+            field.sync()
+        if self._version != version or self._matrix is None:
+            self._version = version
+            self._matrix = np.stack([field.dist.ravel() for field in self.fields]) if self.fields else None
+            self._goals.clear()
+
+    # --- Truy vấn ---
+    def heuristic(self, goal):
+        """h[v] = max(Manhattan, max_L |d(L, goal) - d(L, v)|) dạng list phẳng theo id;
+           -1 nếu v chắc chắn không tới được goal. None nếu goal nằm ngoài bản đồ"""
+        gx, gy = goal
+        if not (0 <= gx < self.width and 0 <= gy < self.height):
+            return None
+        with self._lock:
+            self._sync()
+            goal = (gx, gy)
+            h = self._goals.get(goal)
+            if h is None:
+                h = self._goals[goal] = self._compute(gy * self.width + gx, gx, gy)
+                if len(self._goals) > GOAL_CACHE_SIZE:
+                    del self._goals[next(iter(self._goals))]
+            return h
+
+    def distances(self):
+        """Ma trận khoảng cách (K, N) int32 đã đồng bộ, None nếu không có landmark.
+           Trả về cùng một object cho tới khi bản đồ đổi version (dùng làm khoá cache)"""
+        with self._lock:
+            self._sync()
+            return self._matrix
+
+    def _compute(self, t, gx, gy):
+        h = np.abs(self._xs - gx)
+        h += np.abs(self._ys - gy)
+        if self._matrix is not None:
+            d = self._matrix
+            goal_known = d[:, t] >= 0
+            rows, dt = d[goal_known], d[goal_known, t]
+            if rows.size:
+                # Ô có d = -1 cho ra giá trị rác ở đây nhưng bị gán -1 ngay bên dưới
+                np.maximum(h, np.abs(rows - dt[:, None]).max(axis=0), out=h)
+                cut = rows.min(axis=0) < 0
+            else:
+                cut = np.zeros(h.shape, dtype=bool)
+            # Landmark tới được đúng một trong hai ô -> v và goal khác thành phần
+            if not goal_known.all():
+                cut |= (d[~goal_known] >= 0).any(axis=0)
+            h[cut] = -1
+        return h.tolist()
+
+    def layers(self):
+        """{tên layer: bảng int32 (height, width)} để ghi kèm file mê cung (save_maze)"""
+        with self._lock:
+            self._sync()
+            return {f"{LAYER_PREFIX}{i}": field.dist for i, field in enumerate(self.fields)}
+
+
+def _bfs(graph, source):
+    """Khoảng cách BFS từ source tới mọi ô (mảng phẳng int32, -1 = không tới được).
+
+    Duyệt deque trên CSR thay vì BFS vector hoá theo tầng: mê cung có đường kính
+    rất dài, mỗi tầng chỉ vài ô nên chi phí mỗi lượt numpy lấn át công việc thật.
+    """
+    indptr, indices = graph.indptr, graph.indices
+    dist = [-1] * graph.size
+    dist[source] = 0
+    queue = deque([source])
+    while queue:
+        u = queue.popleft()
+        du = dist[u] + 1
+        for j in range(indptr[u], indptr[u + 1]):
+            v = indices[j]
+            if dist[v] < 0:
+                dist[v] = du
+                queue.append(v)
+    return np.array(dist, dtype=np.int32)
+
+
+_tables = weakref.WeakKeyDictionary()
+_tables_lock = threading.Lock()
+
+
+def get_landmarks(tiles):
+    """LandmarkTable của bản đồ (chọn landmark và BFS nếu chưa có)"""
+    tiles = as_tilemap(tiles)
+    with _tables_lock:
+        table = _tables.get(tiles)
+        if table is None:
+            table = _tables[tiles] = LandmarkTable(tiles)
+        return table
+
+
+def find_landmarks(tiles):
+    """Như get_landmarks nhưng không dựng mới: None nếu chưa có"""
+    if not isinstance(tiles, TileMap):
+        return None
+    with _tables_lock:
+        return _tables.get(tiles)
+
+
+def attach_landmarks(tiles, layers):
+    """Gắn bảng landmark đã tính sẵn (các layer nạp từ file mê cung) vào tiles;
+       None nếu không có layer landmark nào khớp kích thước"""
+    tiles = as_tilemap(tiles)
+    fields = []
+    for i in range(len(layers)):
+        dist = layers.get(f"{LAYER_PREFIX}{i}")
+        if dist is None or np.shape(dist) != tiles.shape:
+            break
+        zero = np.flatnonzero(np.asarray(dist).ravel() == 0)
+        if zero.size != 1:
+            break  # Không xác định được ô landmark
+        fields.append(ExitDistanceField(tiles, divmod(int(zero[0]), tiles.width)[::-1], dist))
+    if not fields:
+        return None
+    table = LandmarkTable(tiles, fields=fields)
+    with _tables_lock:
+        _tables[tiles] = table
+    return table
+
+
+def copy_with_landmarks(tiles):
+    """tiles.copy() kèm bảng landmark của bản gốc nếu có (copy() chỉ chép dữ liệu
+       ô, không mang theo các cấu trúc gắn với bản đồ)"""
+    tiles = as_tilemap(tiles)
+    copy = tiles.copy()
+    table = find_landmarks(tiles)
+    if table is not None:
+        attach_landmarks(copy, table.layers())
+    return copy
+
+
+def landmark_layers(tiles, count=config.ALT_LANDMARKS):
+    """Chọn landmark cho tiles và trả về các layer (hàm top-level để MazePool chạy
+       được ở worker, kể cả process)"""
+    return LandmarkTable(tiles, count).layers()
@@ -0,0 +1,82 @@
+# game/ai/path_cache.py
+# Bộ nhớ đệm LRU cho kết quả tìm đường, khoá theo phiên bản bản đồ
+import threading
+from collections import OrderedDict
+from game import config
+
+
+class PathCache:
+    """LRU cache: (tiles.uid, tiles.version, start, goal, thuật toán, danger.version) -> kết quả.
+
+    Vì khoá chứa version của TileMap nên mọi lần sửa bản đồ tự động làm cũ
+    các mục trước đó; invalidate(tiles) dọn chúng ra khỏi bộ nhớ ngay.
+    """
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(tiles, start, goal, algorithm, danger=None):
+        return (tiles.uid, tiles.version, tuple(start), tuple(goal), algorithm,
+                danger.version if danger is not None else 0)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Trả về đường đi đã cache (bản sao) hoặc gọi compute() rồi lưu lại"""
+        path = self.get(key)
+        if path is None:
+            path = compute()
+            self.put(key, path)
+        return list(path) if path else path
+
+    def invalidate(self, tiles=None):
+        """Xoá các mục của phiên bản cũ của tiles (tiles=None: xoá hết)"""
+        with self._lock:
+            if tiles is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                stale = [k for k in self._entries if k[0] == tiles.uid and k[1] != tiles.version]
+                for k in stale:
+                    del self._entries[k]
+                dropped = len(stale)
+        return dropped
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Cache dùng chung cho người chơi và lính gác
+PATH_CACHE = PathCache(maxsize=config.PATH_CACHE_SIZE)
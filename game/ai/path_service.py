@@ -0,0 +1,298 @@
+# game/ai/path_service.py
+# Dịch vụ tìm đường chạy nền: nơi gọi gửi yêu cầu (gắn version bản đồ và chủ
+# yêu cầu), worker (thread hoặc process) tìm trên bản đồ, kết quả được giao
+# qua hàng đợi mà main đọc đúng một lần mỗi khung hình (poll()).
+# Kết quả tính trên bản đồ đã bị sửa sau lúc gửi thì bị bỏ; yêu cầu trùng đang
+# chạy được gộp làm một.
+import queue
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from game import config
+from game.ai.instrumentation import CALLER_PLAYER, run_search
+from game.maze.tilemap import TileMap, as_tilemap
+
+# Bản chụp guard tối thiểu (pickle được, dùng làm khoá): đủ cho DangerField,
+# vốn chỉ đọc vị trí hiện tại và ô tiếp theo của guard
+GuardSnapshot = namedtuple("GuardSnapshot", ["tile_x", "tile_y", "path", "path_index"])
+
+
+def snapshot_guards(guards):
+    if not guards:
+        return None
+    snapshots = []
+    for guard in guards:
+        nxt = ()
+        if guard.path and guard.path_index < len(guard.path):
+            nxt = (tuple(guard.path[guard.path_index]),)
+        snapshots.append(GuardSnapshot(guard.tile_x, guard.tile_y, nxt, 0))
+    return tuple(snapshots)
+
+
+# --- Bản đồ dùng chung giữa các process ---
+HEADER_BYTES = 8  # int64 version đứng trước dữ liệu uint8
+
+
+class SharedTileBlock:
+    """Bản đồ trong shared memory: [version int64][rows x cols uint8].
+
+    Ghi kiểu seqlock: version = -1 trong lúc chép, worker đọc version trước
+    và sau khi chép; lệch nhau hoặc khác version được yêu cầu -> bỏ.
+    """
+
+    def __init__(self, tiles):
+        self.shape = tiles.shape
+        self.shm = shared_memory.SharedMemory(create=True, size=HEADER_BYTES + tiles.width * tiles.height)
+        self._header = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf)
+        self._cells = np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=HEADER_BYTES)
+        self.version = None
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def publish(self, tiles):
+        if self.version != tiles.version:
+            self._header[0] = -1
+            self._cells[:] = tiles.data
+            self._header[0] = tiles.version
+            self.version = tiles.version
+        return self.name, self.shape
+
+    def close(self):
+        del self._header, self._cells  # shm.close() không chạy được khi còn view numpy
+        self.shm.close()
+        self.shm.unlink()
+
+
+_worker_maps = {}  # Trong process worker: tên block -> TileMap đã chép ra
+
+
+def _attach_tiles(name, shape, version):
+    tiles = _worker_maps.get(name)
+    if tiles is not None and tiles.version == version:
+        return tiles
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return None  # Block đã bị dọn (ván mới / tắt game)
+    try:
+        header = np.ndarray((1,), dtype=np.int64, buffer=shm.buf)
+        before = int(header[0])
+        data = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=HEADER_BYTES).copy()
+        after = int(header[0])
+        del header
+    finally:
+        shm.close()
+    if not before == after == version:
+        return None
+    tiles = TileMap(data)
+    tiles.version = version  # Bản chụp mang version của bản gốc (khoá cache đồ thị)
+    _worker_maps[name] = tiles
+    return tiles
+
+
+def run_job(source, version, func, start, goal, caller, kwargs):
+    """Chạy trong worker; trả về (path, stats), hoặc None nếu bản đồ không còn
+       đúng version (hàm top-level để chạy được trong process pool)"""
+    tiles = source if isinstance(source, TileMap) else _attach_tiles(*source, version)
+    if tiles is None or tiles.version != version:
+        return None
+    t0 = time.perf_counter_ns()
+    result = run_search(caller, func.__name__, func, tiles, start, goal, **kwargs)
+    elapsed = time.perf_counter_ns() - t0
+    if isinstance(result, tuple):
+        path, nodes_expanded, nodes_generated = result
+    else:
+        path, nodes_expanded, nodes_generated = result, 0, 0
+    return path, {
+        "time": elapsed / 1e9,
+        "time_ns": elapsed,
+        "path_length": len(path) if path else 0,
+        "nodes_expanded": nodes_expanded,
+        "nodes_generated": nodes_generated,
+        "cache_hit": False,
+    }
+
+
+class _Job:
+    __slots__ = ("tiles", "future", "waiters")
+
+    def __init__(self, tiles, future):
+        self.tiles = tiles
+        self.future = future
+        self.waiters = {}  # chủ -> callback(path, stats)
+
+
+class PathService:
+    """Hàng đợi yêu cầu tìm đường chạy trên thread pool hoặc process pool.
+
+    request() gửi một yêu cầu cho `owner` (mỗi chủ chờ tối đa một yêu cầu; gửi
+    mới thì bỏ cái cũ). Khoá yêu cầu gồm tiles.uid, tiles.version, start, goal,
+    hàm và tham số, nên hai chủ hỏi cùng một đường chỉ tốn một lần tìm.
+    poll() chạy trên luồng chính: gọi callback(path, stats) cho kết quả còn
+    đúng version; kết quả cũ bị bỏ và chủ của nó được coi như hết chờ. Tìm
+    kiếm ném lỗi trong worker thì lỗi được in ra (mỗi loại lỗi của mỗi hàm một
+    lần), tính vào `discarded` và các chủ nhận callback(None, None).
+    Chế độ "thread": worker tìm thẳng trên TileMap đang chơi, nên dùng chung
+    các cấu trúc gắn với bản đồ (đồ thị, D* Lite, nút giao, landmark, trường
+    lối ra); các cấu trúc đó tự khoá và tự đồng bộ theo nhật ký sửa. Chế độ
+    "process": bản đồ được chép vào shared memory một lần cho mỗi version;
+    worker không có các cấu trúc trên (xem live_maps).
+    """
+
+    def __init__(self, mode="thread", workers=2):
+        self.mode = mode
+        self.workers = workers
+        self._executor = None
+        self._jobs = {}        # khoá -> _Job đang chạy
+        self._owners = {}      # chủ -> khoá đang chờ
+        self._done = queue.SimpleQueue()  # (khoá, future) đã xong, do worker đẩy vào
+        self._blocks = {}      # tiles.uid -> SharedTileBlock (chỉ chế độ process)
+        self.submitted = 0
+        self.coalesced = 0
+        self.delivered = 0
+        self.discarded = 0
+        self._reported = set()  # (tên hàm, loại lỗi) đã in cảnh báo
+
+    @property
+    def enabled(self):
+        return bool(self.mode)
+
+    def start(self):
+        """Khởi động pool trước (ở menu) để yêu cầu đầu tiên trong ván không phải chờ tạo worker"""
+        if self._executor is None and self.enabled:
+            executor_cls = ProcessPoolExecutor if self.mode == "process" else ThreadPoolExecutor
+            self._executor = executor_cls(max_workers=self.workers)
+            for _ in range(self.workers):
+                self._executor.submit(int)
+        return self._executor
+
+    @property
+    def live_maps(self):
+        """Worker tìm trên chính TileMap của nơi gọi (thấy các cache gắn với bản đồ)"""
+        return self.mode == "thread"
+
+    def _source(self, tiles):
+        if self.live_maps:
+            return tiles
+        block = self._blocks.get(tiles.uid)
+        if block is None:
+            block = self._blocks[tiles.uid] = SharedTileBlock(tiles)
+        return block.publish(tiles)
+
+    # --- Gửi / huỷ ---
+    def request(self, owner, tiles, start, goal, func, callback, caller=CALLER_PLAYER, **kwargs):
+        """Gửi yêu cầu tìm đường; False nếu owner đang chờ đúng yêu cầu này rồi"""
+        tiles = as_tilemap(tiles)
+        key = (tiles.uid, tiles.version, tuple(start), tuple(goal), func, caller, tuple(sorted(kwargs.items())))
+        if self._owners.get(owner) == key:
+            return False
+        self.cancel(owner)
+        job = self._jobs.get(key)
+        if job is None:
+            future = self.start().submit(run_job, self._source(tiles), tiles.version, func,
+                                                 tuple(start), tuple(goal), caller, kwargs)
+            job = self._jobs[key] = _Job(tiles, future)
+            future.add_done_callback(lambda f, key=key: self._done.put((key, f)))
+            self.submitted += 1
+        else:
+            self.coalesced += 1
+        job.waiters[owner] = callback
+        self._owners[owner] = key
+        return True
+
+    def pending(self, owner):
+        return owner in self._owners
+
+    def cancel(self, owner):
+        key = self._owners.pop(owner, None)
+        job = self._jobs.get(key)
+        if job is not None:
+            job.waiters.pop(owner, None)
+            if not job.waiters and job.future.cancel():
+                del self._jobs[key]
+
+    def invalidate(self, tiles):
+        """Huỷ các yêu cầu chưa chạy của version cũ (kết quả của chúng chắc chắn bị bỏ)"""
+        for key, job in list(self._jobs.items()):
+            if key[0] == tiles.uid and key[1] != tiles.version and job.future.cancel():
+                del self._jobs[key]
+                for owner in job.waiters:
+                    if self._owners.get(owner) == key:
+                        del self._owners[owner]
+
+    # --- Giao kết quả (luồng chính, một lần mỗi khung hình) ---
+    def poll(self):
+        delivered = 0
+        while True:
+            try:
+                key, future = self._done.get_nowait()
+            except queue.Empty:
+                break
+            job = self._jobs.get(key)
+            if job is None or job.future is not future:
+                continue  # Đã bị huỷ / thay bằng yêu cầu mới cùng khoá
+            del self._jobs[key]
+            for owner in job.waiters:
+                if self._owners.get(owner) == key:
+                    del self._owners[owner]
+            try:
+                result = future.result()
+            except Exception as e:
+                # Không để lỗi của một lần tìm làm sập vòng lặp khung hình
+                self._report(key[4], e)
+                self.discarded += 1
+                for callback in job.waiters.values():
+                    callback(None, None)
+                continue
+            if result is None or job.tiles.version != key[1]:
+                self.discarded += 1
+                continue
+            path, stats = result
+            for callback in job.waiters.values():
+                callback(list(path) if path else path, dict(stats))
+                delivered += 1
+        self.delivered += delivered
+        return delivered
+
+    def _report(self, func, error):
+        name = getattr(func, "__name__", repr(func))
+        if (name, type(error)) not in self._reported:
+            self._reported.add((name, type(error)))
+            print(f"Tìm đường ở nền thất bại ({name}: {error!r}), bỏ kết quả")
+
+    # --- Dọn dẹp ---
+    def clear(self):
+        """Bỏ mọi yêu cầu đang chờ (ván mới)"""
+        for job in self._jobs.values():
+            job.future.cancel()
+        self._jobs.clear()
+        self._owners.clear()
+        for block in self._blocks.values():
+            block.close()
+        self._blocks.clear()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self.clear()
+
+    def stats(self):
+        return {
+            "pending": len(self._owners),
+            "in_flight": len(self._jobs),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "delivered": self.delivered,
+            "discarded": self.discarded,
+        }
+
+
+# Dịch vụ dùng chung; main gọi poll() mỗi khung hình và shutdown() khi thoát
+PATH_SERVICE = PathService(config.PATH_SERVICE_MODE, config.PATH_SERVICE_WORKERS)
@@ -2,11 +2,26 @@ import heapq
 from collections import deque
 import time
 import random
+from game.ai.graph import get_graph
+from game.ai.bucket_queue import BucketQueue
+from game.ai.danger import DangerField, PLAYER_DANGER
+from game.ai.path_cache import PATH_CACHE
+from game.ai.incremental import dstar_lite_path
+from game.ai.jps import jps_search
+from game.ai.bidirectional import bidirectional_bfs, bidirectional_best_first
+from game.ai.junction import get_junction_graph
+from game.ai.exit_field import find_exit_field
+from game.ai.landmarks import get_landmarks
+from game.ai.instrumentation import CALLER_PLAYER, current_probe, run_search
+from game.maze.tilemap import as_tilemap
 # --- HÀM HEURISTIC (Dùng chung) ---
 def manhattan_distance(a, b):
     return abs(a[0] - b[0]) + abs(a[1] - b[1])
 
 # --- HÀM TIỆN ÍCH ---
+def _no_danger(node, default=0):
+    return default
+
 def reconstruct_path(came_from, current):
     path = []
     while current is not None:
@@ -15,14 +30,35 @@ def reconstruct_path(came_from, current):
     return path[::-1]
 
 # --- HÀM WRAPPER ĐỂ ĐO THỜI GIAN VÀ STATS ---
-def find_path(tiles, start, goal, algorithm_func, guards=None):
-
-    start_time = time.time()
+def lookup_cached_path(tiles, start, goal, algorithm_func, guards=None, cache=PATH_CACHE):
+    """(khoá cache, (path, stats) đã cache hoặc None); khoá None nếu thuật toán không được cache"""
+    if cache is None or algorithm_func in NON_DETERMINISTIC_ALGORITHMS:
+        return None, None
+    # Khoá gồm version bản đồ và version trường nguy hiểm
+    danger = None
+    if guards and algorithm_func in DANGER_AWARE_ALGORITHMS:
+        danger = DangerField.for_guards(tiles.width, tiles.height, guards, PLAYER_DANGER)
+    key = cache.make_key(tiles, start, goal, algorithm_func.__name__, danger)
+    cached = cache.get(key)
+    if cached is None:
+        return key, None
+    path, stats = cached
+    return key, ((list(path) if path else path), dict(stats, cache_hit=True))
+
+def find_path(tiles, start, goal, algorithm_func, guards=None, cache=PATH_CACHE, caller=CALLER_PLAYER):
+
+    start_time = time.perf_counter_ns()
+    tiles = as_tilemap(tiles)
+
+    key, cached = lookup_cached_path(tiles, start, goal, algorithm_func, guards, cache)
+    if cached is not None:
+        return cached
     
     # Hàm thuật toán giờ sẽ trả về path, nodes_expanded, và nodes_generated
-    result = algorithm_func(tiles, start, goal, guards=guards)
+    # Có sink đo đạc (game/ai/instrumentation.py) thì ghi thêm một mẫu theo caller
+    result = run_search(caller, algorithm_func.__name__, algorithm_func, tiles, start, goal, guards=guards)
     
-    end_time = time.time()
+    end_time = time.perf_counter_ns()
 
     if result:
         path, nodes_expanded, nodes_generated = result
@@ -32,274 +68,403 @@ def find_path(tiles, start, goal, algorithm_func, guards=None):
     time_taken = end_time - start_time
     
     stats = {
-        "time": time_taken,
+        "time": time_taken / 1e9,
+        "time_ns": time_taken,
         "path_length": len(path) if path else 0,
         "nodes_expanded": nodes_expanded,
         "nodes_generated": nodes_generated,
+        "cache_hit": False,
     }
+    if key is not None:
+        cache.put(key, (list(path) if path else path, stats))
     
     return path, stats
 
 # --- CÁC THUẬT TOÁN TÌM ĐƯỜNG ---
-
-
-def astar_path(tiles, start, goal, guards=None):
-    rows, cols = len(tiles), len(tiles[0])
-    open_set = [(0, start)]
-    g_score = {start: 0}
-    came_from = {start: None}
-    nodes_expanded = 0
-    nodes_generated = 1
-    while open_set:
-        f, current = heapq.heappop(open_set)
-        if g_score[current] < (f - manhattan_distance(current, goal)):
-            continue
-        nodes_expanded += 1
-        if current == goal:
-            return reconstruct_path(came_from, current), nodes_expanded, nodes_generated
-        x, y = current
-        for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-            neighbor = (x + dx, y + dy)
-            nx, ny = neighbor
-            if not (0 <= ny < rows and 0 <= nx < cols and tiles[ny][nx] == 0):
+# Tất cả chạy trên GridGraph (id số nguyên + CSR); toạ độ (x, y) chỉ dùng ở
+# đầu vào/đầu ra nên API dạng tuple bên ngoài không đổi.
+
+
+def astar_path(tiles, start, goal, guards=None, danger=None, heuristic=None):
+    graph = get_graph(tiles)
+    s, t = graph.node_id(start), graph.node_id(goal)
+    if s is None or t is None:
+        return None, 0, 0
+    indptr, indices, xs, ys = graph.indptr, graph.indices, graph.xs, graph.ys
+    gx, gy = goal
+    # "Chi phí nguy hiểm" quanh lính gác: dựng một lần, tra O(1) cho mỗi ô
+    if danger is None and guards:
+        danger = DangerField.for_guards(graph.width, graph.height, guards, PLAYER_DANGER)
+    danger_cost = danger.costs.get if danger else _no_danger
+    # Có bảng khoảng cách tới goal (game/ai/exit_field.py) thì dùng làm heuristic
+    # hoàn hảo: vẫn chấp nhận được khi có chi phí nguy hiểm (mọi bước >= 1).
+    # Không thì dùng bảng `heuristic` truyền vào nếu có (cùng quy ước -1 = không tới được goal)
+    field = find_exit_field(tiles, goal)
+    exact = field.heuristic() if field is not None else heuristic
+    terrain = graph.cost
+    probe = current_probe()
+    with graph.buffers() as buf:
+        g_score, came_from, stamp = buf.g, buf.parent, buf.stamp
+        q = buf.next_query()
+        g_score[s], came_from[s], stamp[s] = 0, -1, q
+        # Chi phí đều là số nguyên nhỏ -> hàng đợi dạng xô thay cho heapq
+        open_set = BucketQueue()
+        open_set.push(0, s)
+        nodes_expanded = 0
+        nodes_generated = 1
+        while open_set:
+            f, current = open_set.pop()
+            if probe:
+                probe.open_size(len(open_set) + 1)
+            # max(.., 0): ô xuất phát có thể là tường (không có nhãn trong bảng)
+            h_current = max(exact[current], 0) if exact else abs(xs[current] - gx) + abs(ys[current] - gy)
+            if g_score[current] < f - h_current:
                 continue
-            # 1. Chi phí di chuyển cơ bản là 1
-            movement_cost = 1
-            # 2. Tính toán "chi phí nguy hiểm"
-            danger_cost = 0
-            if guards:
-                for guard in guards:
-                    dist = manhattan_distance(neighbor, (guard.tile_x, guard.tile_y))
-                    if dist == 0: danger_cost += 1000 # Rất nguy hiểm: Đè lên lính gác
-                    elif dist == 1: danger_cost += 50   # Nguy hiểm: Ngay cạnh lính gác
-                    elif dist == 2: danger_cost += 20   # Cẩn trọng: Gần lính gác
-                    elif dist == 3: danger_cost += 5    # Hơi gần
-            # 3. Tổng chi phí để đi đến ô hàng xóm
-            tentative_g_score = g_score.get(current, float('inf')) + movement_cost + danger_cost
-            if tentative_g_score < g_score.get(neighbor, float('inf')):
-                g_score[neighbor] = tentative_g_score
-                came_from[neighbor] = current
-                f_score = tentative_g_score + manhattan_distance(neighbor, goal)
-                heapq.heappush(open_set, (f_score, neighbor))
-                nodes_generated += 1
+            nodes_expanded += 1
+            if current == t:
+                return graph.path_to(came_from, current), nodes_expanded, nodes_generated
+            for j in range(indptr[current], indptr[current + 1]):
+                neighbor = indices[j]
+                if exact:
+                    h_score = exact[neighbor]
+                    if h_score < 0:
+                        continue  # Ô này không còn đường tới goal
+                else:
+                    h_score = abs(xs[neighbor] - gx) + abs(ys[neighbor] - gy)
+                # Chi phí địa hình của ô hàng xóm + chi phí nguy hiểm
+                tentative_g_score = g_score[current] + terrain[neighbor] + danger_cost(neighbor, 0)
+                if stamp[neighbor] != q or tentative_g_score < g_score[neighbor]:
+                    if probe and stamp[neighbor] == q:
+                        probe.reopens += 1  # Đã sinh rồi, nay tìm được g tốt hơn
+                    stamp[neighbor] = q
+                    g_score[neighbor] = tentative_g_score
+                    came_from[neighbor] = current
+                    open_set.push(tentative_g_score + h_score, neighbor)
+                    nodes_generated += 1
     return None, nodes_expanded, nodes_generated
 
+def alt_astar_path(tiles, start, goal, guards=None, danger=None):
+    # A* với heuristic ALT (game/ai/landmarks.py): cận dưới qua bất đẳng thức tam
+    # giác với các landmark, chặt hơn Manhattan nhiều trong mê cung nhiều ngõ cụt
+    tiles = as_tilemap(tiles)
+    return astar_path(tiles, start, goal, guards, danger, heuristic=get_landmarks(tiles).heuristic(goal))
+
 def UCS_path(tiles, start, goal, guards=None):
-    rows, cols = len(tiles), len(tiles[0])
-    open_set = [(0, start)]
-    g_score = {start: 0}
-    came_from = {start: None}
-    nodes_expanded = 0
-    nodes_generated = 1
-
-    while open_set:
-        cost, current = heapq.heappop(open_set)
-        nodes_expanded += 1
-
-        if current == goal:
-            return reconstruct_path(came_from, current), nodes_expanded, nodes_generated
-
-        x, y = current
-        for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-            neighbor = (x + dx, y + dy)
-            nx, ny = neighbor
-            if not (0 <= ny < rows and 0 <= nx < cols and tiles[ny][nx] == 0):
-                continue
+    graph = get_graph(tiles)
+    s, t = graph.node_id(start), graph.node_id(goal)
+    if s is None or t is None:
+        return None, 0, 0
+    indptr, indices, terrain = graph.indptr, graph.indices, graph.cost
+    probe = current_probe()
+    with graph.buffers() as buf:
+        g_score, came_from, stamp = buf.g, buf.parent, buf.stamp
+        q = buf.next_query()
+        g_score[s], came_from[s], stamp[s] = 0, -1, q
+        open_set = BucketQueue()
+        open_set.push(0, s)
+        nodes_expanded = 0
+        nodes_generated = 1
+
+        while open_set:
+            cost, current = open_set.pop()
+            if probe:
+                probe.open_size(len(open_set) + 1)
+            if cost > g_score[current]:
+                continue  # Mục cũ: ô đã được lấy ra với chi phí nhỏ hơn
+            nodes_expanded += 1
 
-            new_cost = g_score.get(current, float('inf')) + 1
-            if new_cost < g_score.get(neighbor, float('inf')):
-                g_score[neighbor] = new_cost
-                came_from[neighbor] = current
-                heapq.heappush(open_set, (new_cost, neighbor))
-                nodes_generated += 1
+            if current == t:
+                return graph.path_to(came_from, current), nodes_expanded, nodes_generated
+
+            for j in range(indptr[current], indptr[current + 1]):
+                neighbor = indices[j]
+                new_cost = cost + terrain[neighbor]
+                if stamp[neighbor] != q or new_cost < g_score[neighbor]:
+                    if probe and stamp[neighbor] == q:
+                        probe.reopens += 1  # Đã sinh rồi, nay tìm được g tốt hơn
+                    stamp[neighbor] = q
+                    g_score[neighbor] = new_cost
+                    came_from[neighbor] = current
+                    open_set.push(new_cost, neighbor)
+                    nodes_generated += 1
                 
     return None, nodes_expanded, nodes_generated
 
 def greedy_bfs_path(tiles, start, goal, guards=None):
-    rows, cols = len(tiles), len(tiles[0])
-    open_set = [(manhattan_distance(start, goal), start)]
-    came_from = {start: None}
-    visited = {start}
-    nodes_expanded = 0
-    nodes_generated = 1
-
-    while open_set:
-        _, current = heapq.heappop(open_set)
-        nodes_expanded += 1
-        
-        if current == goal:
-            return reconstruct_path(came_from, current), nodes_expanded, nodes_generated
-
-        x, y = current
-        # Sắp xếp neighbor không cần thiết nếu dùng priority queue, nhưng giữ lại để logic không đổi
-        neighbors = [(x+dx, y+dy) for dx, dy in [(0,1), (0,-1), (1,0), (-1,0)]]
-
-        for neighbor in neighbors:
-            nx, ny = neighbor
-            if not (0 <= ny < rows and 0 <= nx < cols and tiles[ny][nx] == 0):
-                continue
-            if neighbor not in visited:
-                visited.add(neighbor)
-                came_from[neighbor] = current
-                priority = manhattan_distance(neighbor, goal)
-                heapq.heappush(open_set, (priority, neighbor))
-                nodes_generated += 1
+    graph = get_graph(tiles)
+    s, t = graph.node_id(start), graph.node_id(goal)
+    if s is None or t is None:
+        return None, 0, 0
+    indptr, indices, xs, ys = graph.indptr, graph.indices, graph.xs, graph.ys
+    gx, gy = goal
+    probe = current_probe()
+    with graph.buffers() as buf:
+        came_from, visited = buf.parent, buf.stamp  # stamp == q nghĩa là đã thăm
+        q = buf.next_query()
+        came_from[s], visited[s] = -1, q
+        open_set = [(manhattan_distance(start, goal), s)]
+        nodes_expanded = 0
+        nodes_generated = 1
+
+        while open_set:
+            _, current = heapq.heappop(open_set)
+            if probe:
+                probe.open_size(len(open_set) + 1)
+            nodes_expanded += 1
+            
+            if current == t:
+                return graph.path_to(came_from, current), nodes_expanded, nodes_generated
+
+            for j in range(indptr[current], indptr[current + 1]):
+                neighbor = indices[j]
+                if visited[neighbor] != q:
+                    visited[neighbor] = q
+                    came_from[neighbor] = current
+                    priority = abs(xs[neighbor] - gx) + abs(ys[neighbor] - gy)
+                    heapq.heappush(open_set, (priority, neighbor))
+                    nodes_generated += 1
                 
     return None, nodes_expanded, nodes_generated
 
 def bfs_path(tiles, start, goal, guards=None):
-    rows, cols = len(tiles), len(tiles[0])
-    queue = deque([start])
-    visited = {start}
-    came_from = {start: None}
-    nodes_expanded = 0
-    nodes_generated = 1
-
-    while queue:
-        current = queue.popleft()
-        nodes_expanded += 1
-        
-        if current == goal:
-            return reconstruct_path(came_from, current), nodes_expanded, nodes_generated
-
-        x, y = current
-        for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-            neighbor = (x + dx, y + dy)
-            nx, ny = neighbor
-            if not (0 <= ny < rows and 0 <= nx < cols and tiles[ny][nx] == 0):
-                continue
-            if neighbor not in visited:
-                visited.add(neighbor)
-                came_from[neighbor] = current
-                queue.append(neighbor)
-                nodes_generated += 1
+    graph = get_graph(tiles)
+    s, t = graph.node_id(start), graph.node_id(goal)
+    if s is None or t is None:
+        return None, 0, 0
+    indptr, indices = graph.indptr, graph.indices
+    probe = current_probe()
+    with graph.buffers() as buf:
+        came_from, visited = buf.parent, buf.stamp
+        q = buf.next_query()
+        came_from[s], visited[s] = -1, q
+        queue = deque([s])
+        nodes_expanded = 0
+        nodes_generated = 1
+
+        while queue:
+            current = queue.popleft()
+            if probe:
+                probe.open_size(len(queue) + 1)
+            nodes_expanded += 1
+            
+            if current == t:
+                return graph.path_to(came_from, current), nodes_expanded, nodes_generated
+
+            for j in range(indptr[current], indptr[current + 1]):
+                neighbor = indices[j]
+                if visited[neighbor] != q:
+                    visited[neighbor] = q
+                    came_from[neighbor] = current
+                    queue.append(neighbor)
+                    nodes_generated += 1
                 
     return None, nodes_expanded, nodes_generated
 
 def dfs_path(tiles, start, goal, guards=None):
-    rows, cols = len(tiles), len(tiles[0])
-    stack = [start]
-    visited = {start}
-    came_from = {start: None}
-    nodes_expanded = 0
-    nodes_generated = 1
-
-    while stack:
-        current = stack.pop()
-        nodes_expanded += 1
-
-        if current == goal:
-            return reconstruct_path(came_from, current), nodes_expanded, nodes_generated
-
-        x, y = current
-        for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-            neighbor = (x + dx, y + dy)
-            nx, ny = neighbor
-            if not (0 <= ny < rows and 0 <= nx < cols and tiles[ny][nx] == 0):
-                continue
-            if neighbor not in visited:
-                visited.add(neighbor)
-                came_from[neighbor] = current
-                stack.append(neighbor)
-                nodes_generated += 1
+    graph = get_graph(tiles)
+    s, t = graph.node_id(start), graph.node_id(goal)
+    if s is None or t is None:
+        return None, 0, 0
+    indptr, indices = graph.indptr, graph.indices
+    probe = current_probe()
+    with graph.buffers() as buf:
+        came_from, visited = buf.parent, buf.stamp
+        q = buf.next_query()
+        came_from[s], visited[s] = -1, q
+        stack = [s]
+        nodes_expanded = 0
+        nodes_generated = 1
+
+        while stack:
+            current = stack.pop()
+            if probe:
+                probe.open_size(len(stack) + 1)
+            nodes_expanded += 1
+
+            if current == t:
+                return graph.path_to(came_from, current), nodes_expanded, nodes_generated
+
+            for j in range(indptr[current], indptr[current + 1]):
+                neighbor = indices[j]
+                if visited[neighbor] != q:
+                    visited[neighbor] = q
+                    came_from[neighbor] = current
+                    stack.append(neighbor)
+                    nodes_generated += 1
                 
     return None, nodes_expanded, nodes_generated
 
 
 def hill_climbing_path(tiles, start, goal, guards=None):
-    rows, cols = len(tiles), len(tiles[0])
-    current = start
-    path = [current]
-    visited = {current}
-    nodes_expanded = 0
-    nodes_generated = 1
-    max_steps = rows * cols * 2 # Tăng giới hạn số bước
-    restart_count = 0
-
-    for _ in range(max_steps):
-        if current == goal:
-            return path, nodes_expanded, nodes_generated
-
-        nodes_expanded += 1
-        x, y = current
-        
-        neighbors = []
-        for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-            neighbor = (x + dx, y + dy)
-            if (0 <= neighbor[1] < rows and 0 <= neighbor[0] < cols and 
-                tiles[neighbor[1]][neighbor[0]] == 0 and neighbor not in visited):
-                neighbors.append(neighbor)
-                nodes_generated += 1
-        if not neighbors: # Bị kẹt
-            if restart_count < 5 and len(path) > 1: # Giới hạn số lần restart
-                restart_count += 1
-                current = random.choice(path[:-1]) # Quay lại 1 điểm ngẫu nhiên
-                continue
-            else:
-                return None, nodes_expanded, nodes_generated
-        best_neighbor = min(neighbors, key=lambda n: manhattan_distance(n, goal))
-
-        if manhattan_distance(best_neighbor, goal) >= manhattan_distance(current, goal):
-             # Bị kẹt ở local minimum
-            if restart_count < 5 and len(path) > 1:
-                restart_count += 1
-                current = random.choice(path[:-1])
-                continue
-            else:
-                return None, nodes_expanded, nodes_generated
-        current = best_neighbor
-        path.append(current)
-        visited.add(current)
+    graph = get_graph(tiles)
+    s, t = graph.node_id(start), graph.node_id(goal)
+    if s is None or t is None:
+        return None, 0, 0
+    indptr, indices, xs, ys = graph.indptr, graph.indices, graph.xs, graph.ys
+    gx, gy = goal
+    with graph.buffers() as buf:
+        visited = buf.stamp
+        q = buf.next_query()
+        current = s
+        path = [current]
+        visited[current] = q
+        nodes_expanded = 0
+        nodes_generated = 1
+        max_steps = graph.size * 2 # Tăng giới hạn số bước
+        restart_count = 0
+
+        for _ in range(max_steps):
+            if current == t:
+                return [(xs[v], ys[v]) for v in path], nodes_expanded, nodes_generated
+
+            nodes_expanded += 1
+            
+            neighbors = []
+            for j in range(indptr[current], indptr[current + 1]):
+                neighbor = indices[j]
+                if visited[neighbor] != q:
+                    neighbors.append(neighbor)
+                    nodes_generated += 1
+            if not neighbors: # Bị kẹt
+                if restart_count < 5 and len(path) > 1: # Giới hạn số lần restart
+                    restart_count += 1
+                    current = random.choice(path[:-1]) # Quay lại 1 điểm ngẫu nhiên
+                    continue
+                else:
+                    return None, nodes_expanded, nodes_generated
+            best_neighbor = min(neighbors, key=lambda n: abs(xs[n] - gx) + abs(ys[n] - gy))
+
+            if abs(xs[best_neighbor] - gx) + abs(ys[best_neighbor] - gy) >= abs(xs[current] - gx) + abs(ys[current] - gy):
+                 # Bị kẹt ở local minimum
+                if restart_count < 5 and len(path) > 1:
+                    restart_count += 1
+                    current = random.choice(path[:-1])
+                    continue
+                else:
+                    return None, nodes_expanded, nodes_generated
+            current = best_neighbor
+            path.append(current)
+            visited[current] = q
     return None, nodes_expanded, nodes_generated
 
 def beam_search_path(tiles, start, goal, guards=None):
     BEAM_WIDTH = 3
-    rows, cols = len(tiles), len(tiles[0])
+    graph = get_graph(tiles)
+    s, t = graph.node_id(start), graph.node_id(goal)
+    if s is None or t is None:
+        return None, 0, 0
+    indptr, indices, xs, ys = graph.indptr, graph.indices, graph.xs, graph.ys
+    gx, gy = goal
     
-    # Sử dụng hàng đợi ưu tiên để luôn lấy nút tốt nhất từ chùm tia
-    open_set = [(manhattan_distance(start, goal), start)]
-    came_from = {start: None}
-
-    nodes_expanded = 0
-    nodes_generated = 1
-
-    while open_set:
-        # Tập hợp các nút sẽ được xét ở bước tiếp theo
-        successors = []
-        
-        # Mở rộng tất cả các nút trong chùm tia hiện tại
-        for _ in range(len(open_set)):
-            _, current = heapq.heappop(open_set)
-            nodes_expanded += 1
+    with graph.buffers() as buf:
+        came_from, seen = buf.parent, buf.stamp
+        q = buf.next_query()
+        came_from[s], seen[s] = -1, q
+        # Sử dụng hàng đợi ưu tiên để luôn lấy nút tốt nhất từ chùm tia
+        open_set = [(manhattan_distance(start, goal), s)]
+
+        nodes_expanded = 0
+        nodes_generated = 1
+
+        while open_set:
+            # Tập hợp các nút sẽ được xét ở bước tiếp theo
+            successors = []
+            
+            # Mở rộng tất cả các nút trong chùm tia hiện tại
+            for _ in range(len(open_set)):
+                _, current = heapq.heappop(open_set)
+                nodes_expanded += 1
 
-            if current == goal:
-                return reconstruct_path(came_from, current), nodes_expanded, nodes_generated
+                if current == t:
+                    return graph.path_to(came_from, current), nodes_expanded, nodes_generated
+                
+                for j in range(indptr[current], indptr[current + 1]):
+                    neighbor = indices[j]
+                    if seen[neighbor] != q:
+                        seen[neighbor] = q
+                        came_from[neighbor] = current # Ghi lại đường đi
+                        priority = abs(xs[neighbor] - gx) + abs(ys[neighbor] - gy)
+                        heapq.heappush(successors, (priority, neighbor))
+                        nodes_generated += 1
             
-            x, y = current
-            for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-                neighbor = (x + dx, y + dy)
-                if (0 <= neighbor[1] < rows and 0 <= neighbor[0] < cols and
-                    tiles[neighbor[1]][neighbor[0]] == 0 and neighbor not in came_from):
-                    
-                    came_from[neighbor] = current # Ghi lại đường đi
-                    priority = manhattan_distance(neighbor, goal)
-                    heapq.heappush(successors, (priority, neighbor))
-                    nodes_generated += 1
-        
-        # Cắt tỉa: chỉ giữ lại BEAM_WIDTH nút tốt nhất từ tất cả các successors
-        open_set = heapq.nsmallest(BEAM_WIDTH, successors)
-        if not open_set:
-            break # Không còn đường để đi
+            # Cắt tỉa: chỉ giữ lại BEAM_WIDTH nút tốt nhất từ tất cả các successors
+            open_set = heapq.nsmallest(BEAM_WIDTH, successors)
+            if not open_set:
+                break # Không còn đường để đi
 
     return None, nodes_expanded, nodes_generated
 
+def jps_path(tiles, start, goal, guards=None):
+    # Jump Point Search: chỉ đúng trên lưới chi phí đều nên bỏ qua guards (như BFS);
+    # bản đồ có địa hình thì quay về A* thường (vẫn tối ưu theo chi phí)
+    graph = get_graph(tiles)
+    s, t = graph.node_id(start), graph.node_id(goal)
+    if s is None or t is None:
+        return None, 0, 0
+    if not graph.uniform:
+        return astar_path(tiles, start, goal)
+    return jps_search(graph, s, t)
+
+# --- TÌM KIẾM HAI CHIỀU (game/ai/bidirectional.py) ---
+def bidirectional_bfs_path(tiles, start, goal, guards=None):
+    graph = get_graph(tiles)
+    s, t = graph.node_id(start), graph.node_id(goal)
+    if s is None or t is None:
+        return None, 0, 0
+    return bidirectional_bfs(graph, s, t)
+
+def bidirectional_ucs_path(tiles, start, goal, guards=None):
+    graph = get_graph(tiles)
+    s, t = graph.node_id(start), graph.node_id(goal)
+    if s is None or t is None:
+        return None, 0, 0
+    return bidirectional_best_first(graph, s, t, use_heuristic=False)
+
+def bidirectional_astar_path(tiles, start, goal, guards=None, danger=None):
+    graph = get_graph(tiles)
+    s, t = graph.node_id(start), graph.node_id(goal)
+    if s is None or t is None:
+        return None, 0, 0
+    # Cùng chi phí nguy hiểm với astar_path nên vẫn "an toàn"
+    if danger is None and guards:
+        danger = DangerField.for_guards(graph.width, graph.height, guards, PLAYER_DANGER)
+    return bidirectional_best_first(graph, s, t, danger.costs if danger else None)
+
+# --- TÌM TRÊN ĐỒ THỊ NÚT GIAO (game/ai/junction.py) ---
+def junction_path(tiles, start, goal, guards=None):
+    # Chi phí mỗi hành lang tính sẵn nên bỏ qua guards (như JPS); ô xuất phát là
+    # tường (không thuộc hành lang nào) thì quay về A* thường
+    tiles = as_tilemap(tiles)
+    if not tiles.is_passable(*start):
+        return astar_path(tiles, start, goal)
+    return get_junction_graph(tiles).find_path(start, goal)
+
+# Thuật toán dùng chi phí nguy hiểm (khoá cache phải chứa version DangerField)
+DANGER_AWARE_ALGORITHMS = {astar_path, alt_astar_path, dstar_lite_path, bidirectional_astar_path}
+# Thuật toán luôn trả về đường ngắn nhất khi không có guard (dùng được "la bàn" exit_field)
+SHORTEST_PATH_ALGORITHMS = {astar_path, alt_astar_path, UCS_path, bfs_path, dstar_lite_path, jps_path,
+                            bidirectional_bfs_path, bidirectional_ucs_path, bidirectional_astar_path,
+                            junction_path}
+# Thuật toán có yếu tố ngẫu nhiên -> không cache
+NON_DETERMINISTIC_ALGORITHMS = {hill_climbing_path}
+# Thuật toán dựa vào cấu trúc dữ liệu gắn với chính TileMap và cập nhật tăng dần
+# (D* Lite, đồ thị nút giao, bảng landmark): tìm trên bản chép thì phải dựng lại
+MAP_CACHED_ALGORITHMS = {dstar_lite_path, junction_path, alt_astar_path}
+
 # --- DICTIONARY TRUY CẬP CÁC THUẬT TOÁN ---
 PATHFINDING_ALGORITHMS = {
     "A* (An toàn)": astar_path,
+    "A* (ALT Landmarks)": alt_astar_path,
     "Uniform Cost Search (UCS)": UCS_path,
     "Greedy Best-First": greedy_bfs_path,
     "Breadth-First (BFS)": bfs_path,
     "Depth-First (DFS)": dfs_path,
     "Hill Climbing": hill_climbing_path,
     "Beam Search": beam_search_path,
+    "D* Lite (Incremental)": dstar_lite_path,
+    "Jump Point Search (JPS)": jps_path,
+    "Bidirectional BFS": bidirectional_bfs_path,
+    "Bidirectional UCS": bidirectional_ucs_path,
+    "Bidirectional A*": bidirectional_astar_path,
+    "Junction Graph A*": junction_path,
 }
\ No newline at end of file
@@ -0,0 +1,189 @@
+# game/ai/resumable.py
+# Tìm kiếm chạy dở được: mỗi khung hình chỉ được chạy trong một ngân sách
+# micro-giây do FrameScheduler chia, phần còn lại để khung hình sau. Trong lúc
+# chờ, nơi gọi dùng đường tới "nút tốt nhất đến giờ" (gần đích nhất theo h).
+import time
+from collections import OrderedDict
+from game import config
+from game.ai.bucket_queue import BucketQueue
+from game.ai.graph import get_graph
+from game.ai.pathfinding import astar_path, UCS_path
+
+# Hàm tìm đường nào có bản chạy dở -> có dùng heuristic hay không
+RESUMABLE_ALGORITHMS = {
+    astar_path: True,
+    UCS_path: False,
+}
+
+CHECK_EVERY = 64  # Số nút mở rộng giữa hai lần xem đồng hồ
+
+
+class ResumableSearch:
+    """A*/UCS trên GridGraph giữ trạng thái giữa các lần advance().
+
+    Dùng dict thay cho bộ đệm dùng chung của graph vì trạng thái phải sống qua
+    nhiều khung hình. Bản đồ bị sửa giữa chừng -> kết thúc với stale=True.
+    """
+
+    def __init__(self, tiles, start, goal, use_heuristic=True, node_costs=None):
+        self.tiles = tiles
+        self.graph = graph = get_graph(tiles)
+        self.version = graph.version
+        self.start, self.goal = tuple(start), tuple(goal)
+        self.use_heuristic = use_heuristic
+        self.extra = (node_costs or {}).get
+        self.path = None
+        self.done = False
+        self.stale = False
+        self.nodes_expanded = 0
+        self.nodes_generated = 1
+        self.elapsed_ns = 0
+        self.slices = 0
+        s, self._t = graph.node_id(start), graph.node_id(goal)
+        if s is None or self._t is None:
+            self.done = True
+            self.best = None
+            return
+        self._g = {s: 0}
+        self._parent = {s: -1}
+        self._open = BucketQueue()
+        self._open.push(self._h(s), s)
+        self.best, self._best_h = s, self._h(s)
+
+    def _h(self, v):
+        if not self.use_heuristic:
+            return 0
+        gx, gy = self.goal
+        return abs(self.graph.xs[v] - gx) + abs(self.graph.ys[v] - gy)
+
+    def advance(self, deadline_ns):
+        """Chạy tới deadline (theo perf_counter_ns); trả về True nếu đã xong"""
+        if self.done:
+            return True
+        t0 = time.perf_counter_ns()
+        if self.tiles.version != self.version:
+            self.done = self.stale = True
+            return True
+        graph, g_score, parent, open_set = self.graph, self._g, self._parent, self._open
+        indptr, indices, terrain, extra = graph.indptr, graph.indices, graph.cost, self.extra
+        t, h = self._t, self._h
+        count = 0
+        while open_set:
+            f, current = open_set.pop()
+            h_current = h(current)
+            if g_score[current] < f - h_current:
+                continue  # Mục cũ trong hàng đợi
+            self.nodes_expanded += 1
+            if current == t:
+                self.path = graph.path_to(parent, current)
+                self.done = True
+                break
+            if h_current < self._best_h:
+                self.best, self._best_h = current, h_current
+            g = g_score[current]
+            for j in range(indptr[current], indptr[current + 1]):
+                neighbor = indices[j]
+                new_g = g + terrain[neighbor] + extra(neighbor, 0)
+                if new_g < g_score.get(neighbor, new_g + 1):
+                    g_score[neighbor] = new_g
+                    parent[neighbor] = current
+                    open_set.push(new_g + h(neighbor), neighbor)
+                    self.nodes_generated += 1
+            count += 1
+            if count % CHECK_EVERY == 0 and time.perf_counter_ns() >= deadline_ns:
+                break
+        else:
+            self.done = True  # Hết hàng đợi: không có đường
+        self.elapsed_ns += time.perf_counter_ns() - t0
+        self.slices += 1
+        return self.done
+
+    def partial_path(self):
+        """Đường từ start tới nút tốt nhất đến giờ (đường đầy đủ nếu đã xong)"""
+        if self.path is not None:
+            return self.path
+        if self.best is None or self.stale:
+            return None
+        return self.graph.path_to(self._parent, self.best)
+
+    def path_from(self, pos):
+        """Phần của đường (đầy đủ hoặc tạm) bắt đầu từ pos, None nếu pos không nằm trên đó"""
+        path = self.partial_path()
+        if not path:
+            return None
+        pos = tuple(pos)
+        for i, p in enumerate(path):
+            if p == pos:
+                return path[i:]
+        return None
+
+    def stats(self):
+        """Stats cùng dạng với find_path (time = tổng thời gian tính, không tính thời gian chờ)"""
+        return {
+            "time": self.elapsed_ns / 1e9,
+            "time_ns": self.elapsed_ns,
+            "path_length": len(self.path) if self.path else 0,
+            "nodes_expanded": self.nodes_expanded,
+            "nodes_generated": self.nodes_generated,
+            "cache_hit": False,
+            "frames": self.slices,
+        }
+
+
+class FrameScheduler:
+    """Chia ngân sách micro-giây mỗi khung hình cho các tìm kiếm đang chạy dở.
+
+    Mỗi chủ (guard, người chơi,...) có tối đa một tìm kiếm; gửi tìm kiếm mới thì
+    bỏ tìm kiếm cũ. run() được gọi đúng một lần mỗi khung hình; thứ tự xoay vòng
+    để không tìm kiếm nào bị đói.
+    """
+
+    def __init__(self, budget_us):
+        self.budget_ns = budget_us * 1000
+        self._tasks = OrderedDict()
+        self.last_frame_ns = 0
+
+    def submit(self, owner, task):
+        self._tasks.pop(owner, None)
+        self._tasks[owner] = task
+        return task
+
+    def cancel(self, owner):
+        self._tasks.pop(owner, None)
+
+    def pending(self, owner):
+        return self._tasks.get(owner)
+
+    def clear(self):
+        self._tasks.clear()
+
+    def run(self):
+        if not self._tasks:
+            self.last_frame_ns = 0
+            return
+        start = time.perf_counter_ns()
+        deadline = start + self.budget_ns
+        items = list(self._tasks.items())
+        for i, (owner, task) in enumerate(items):
+            now = time.perf_counter_ns()
+            if now >= deadline:
+                break
+            # Chia đều phần ngân sách còn lại cho các tìm kiếm chưa chạy trong khung này
+            share = (deadline - now) // (len(items) - i)
+            if task.advance(now + share):
+                self._tasks.pop(owner, None)
+            else:
+                self._tasks.move_to_end(owner)
+        self.last_frame_ns = time.perf_counter_ns() - start
+
+    def __len__(self):
+        return len(self._tasks)
+
+
+# Bộ lập lịch dùng chung, main gọi run() mỗi khung hình
+SEARCH_SCHEDULER = FrameScheduler(config.SEARCH_FRAME_BUDGET_US)
+
+
+def is_budgeted(tiles):
+    """Bản đồ đủ lớn để tìm kiếm dài bị chia qua nhiều khung hình"""
+    return config.SEARCH_FRAME_BUDGET_US > 0 and tiles.width * tiles.height >= config.BUDGETED_SEARCH_MIN_TILES
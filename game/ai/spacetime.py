@@ -0,0 +1,193 @@
+# game/ai/spacetime.py
+# A* trong không gian (ô, nhịp) cho AI người chơi: dự đoán vị trí từng guard
+# theo đường đi còn lại của nó, cho phép đứng chờ, và tìm một kế hoạch duy nhất
+# vừa tới lối ra vừa tránh guard (thay cho việc luân phiên "tìm đường ra" và
+# "chạy né" như trước).
+import math
+from game import config
+from game.ai.bucket_queue import BucketQueue
+from game.ai.danger import PLAYER_DANGER
+from game.ai.exit_field import find_exit_field
+from game.ai.graph import get_graph
+from game.ai.instrumentation import CALLER_PLAYER, run_search
+
+INF = float("inf")
+DANGER_MEMO_LIMIT = 200000  # Số (ô, nhịp) tối đa được nhớ chi phí nguy hiểm
+
+
+def predict_guards(guards, horizon, player_frames, guard_frames):
+    """positions[k] = vị trí dự đoán của các guard sau k nhịp của người chơi.
+
+    Guard đi theo path còn lại (ô lặp lại = đứng chờ), mỗi ô mất guard_frames(guard)
+    khung hình; hết đường thì đứng yên ở ô cuối.
+    """
+    tracks = []
+    for guard in guards:
+        remaining = list(guard.path[guard.path_index:]) if guard.path else []
+        tracks.append(([(guard.tile_x, guard.tile_y)] + remaining, guard_frames(guard)))
+    positions = []
+    for k in range(horizon + 1):
+        frame = k * player_frames
+        positions.append([track[min(frame // per_step, len(track) - 1)] for track, per_step in tracks])
+    return positions
+
+
+def spacetime_astar(graph, s, t, heuristic, danger, horizon):
+    """A* trên trạng thái (ô, nhịp) với hành động đứng chờ, giới hạn `horizon` nhịp.
+
+    Chi phí: đi vào ô u tốn graph.cost[u], đứng chờ tốn 1, cộng danger(u, k)
+    cho ô u ở nhịp k. Nhịp bị chặn ở `horizon`: sau đó guard coi như đứng yên
+    ở vị trí dự đoán cuối và lớp cuối là A* thường, nên không thể "hoãn" nguy
+    hiểm ra ngoài horizon bằng cách đứng chờ mãi.
+    Trả về (ids theo từng nhịp tới t, nodes_expanded, nodes_generated).
+    """
+    n = graph.size
+    indptr, indices, cost = graph.indptr, graph.indices, graph.cost
+    g_score = {s: 0}
+    came_from = {s: -1}
+    closed = set()
+    open_set = BucketQueue()
+    open_set.push(heuristic(s), s)
+    nodes_expanded = 0
+    nodes_generated = 1
+
+    while open_set:
+        _, state = open_set.pop()
+        if state in closed:
+            continue
+        closed.add(state)
+        nodes_expanded += 1
+        k, v = divmod(state, n)
+        if v == t:
+            ids = []
+            while state != -1:
+                ids.append(state % n)
+                state = came_from[state]
+            return ids[::-1], nodes_expanded, nodes_generated
+
+        g = g_score[state]
+        nk = min(k + 1, horizon)
+        for u, step in [(v, 1)] + [(indices[j], cost[indices[j]]) for j in range(indptr[v], indptr[v + 1])]:
+            h = heuristic(u)
+            if h is None:
+                continue
+            nxt = nk * n + u
+            new_g = g + step + danger(u, nk)
+            if new_g < g_score.get(nxt, INF):
+                g_score[nxt] = new_g
+                came_from[nxt] = state
+                open_set.push(new_g + h, nxt)
+                nodes_generated += 1
+    return None, nodes_expanded, nodes_generated
+
+
+class SpaceTimePlanner:
+    """Kế hoạch né guard của người chơi, giữ lại giữa các nhịp.
+
+    Mỗi nhịp kế hoạch cũ được kiểm tra lại với dự đoán mới; còn an toàn và
+    chưa đi quá nửa horizon thì dùng tiếp, không tìm lại. Chi phí nguy hiểm
+    của (ô, nhịp tuyệt đối) được nhớ lại giữa các lần tìm chừng nào quỹ đạo
+    dự đoán của guard không đổi.
+    """
+
+    def __init__(self, horizon=None, player_frames=None, profile=PLAYER_DANGER):
+        self.horizon = horizon or config.SPACETIME_HORIZON
+        # Số khung hình cho một bước của người chơi (AI đi mỗi AI_MOVE_DELAY ms)
+        self.player_frames = player_frames or max(1, math.ceil(config.AI_MOVE_DELAY * config.FPS / 1000))
+        self.ring_costs = profile.ring_costs
+        self.tick = 0            # Nhịp tuyệt đối: tăng mỗi lần next_step() được gọi
+        self.plan = []           # plan[i] = ô ở nhịp plan_tick + i
+        self.plan_tick = 0
+        self.plan_version = None
+        self._tracks = None      # Quỹ đạo dự đoán (theo nhịp tuyệt đối) của lần nhớ gần nhất
+        self._danger_memo = {}
+        self.last_stats = None
+
+    def reset(self):
+        self.plan = []
+
+    @staticmethod
+    def _guard_frames(guard):
+        return max(1, math.ceil(guard.size / max(guard.speed, 1)))
+
+    def _danger_fn(self, graph, positions):
+        """danger(v, k): tổng ring_costs theo khoảng cách tới từng guard dự đoán ở nhịp k"""
+        ring = self.ring_costs
+        radius = len(ring)
+        xs, ys = graph.xs, graph.ys
+        if len(self._danger_memo) > DANGER_MEMO_LIMIT:
+            self._danger_memo = {}
+        memo, base = self._danger_memo, self.tick
+
+        def danger(v, k):
+            key = (v, base + k)
+            cost = memo.get(key)
+            if cost is None:
+                cost = 0
+                x, y = xs[v], ys[v]
+                for gx, gy in positions[k]:
+                    d = abs(x - gx) + abs(y - gy)
+                    if d < radius:
+                        cost += ring[d]
+                memo[key] = cost
+            return cost
+
+        return danger
+
+    def _update_predictions(self, guards):
+        positions = predict_guards(guards, self.horizon, self.player_frames, self._guard_frames)
+        # Chuẩn hoá theo nhịp tuyệt đối để so với lần trước: nếu quỹ đạo ở các nhịp
+        # chung không đổi thì chi phí đã nhớ vẫn đúng
+        tracks = {self.tick + k: tuple(p) for k, p in enumerate(positions)}
+        previous = self._tracks
+        if previous is None or any(previous.get(k, p) != p for k, p in tracks.items()):
+            self._danger_memo = {}
+        self._tracks = tracks
+        return positions
+
+    def _plan_is_valid(self, graph, current, danger):
+        i = self.tick - self.plan_tick
+        if not self.plan or self.plan_version != graph.version or i >= len(self.plan):
+            return False
+        if self.plan[i] != current or i > self.horizon // 2:
+            return False
+        # Kế hoạch cũ đã được chọn khi không có nguy hiểm: giữ nếu vẫn không có
+        for k, pos in enumerate(self.plan[i:i + self.horizon + 1]):
+            if danger(graph.node_id(pos), k):
+                return False
+        return True
+
+    def next_step(self, tiles, current, goal, guards):
+        """Ô tiếp theo (có thể là chính current = đứng chờ), hoặc None nếu không có kế hoạch"""
+        graph = get_graph(tiles)
+        positions = self._update_predictions(guards)
+        danger = self._danger_fn(graph, positions)
+        if not self._plan_is_valid(graph, current, danger):
+            self.plan = self._search(tiles, graph, current, goal, danger)
+            self.plan_tick, self.plan_version = self.tick, graph.version
+        i = self.tick - self.plan_tick
+        self.tick += 1
+        if not self.plan or i + 1 >= len(self.plan):
+            return None
+        return self.plan[i + 1]
+
+    def _search(self, tiles, graph, start, goal, danger):
+        s, t = graph.node_id(start), graph.node_id(goal)
+        if s is None or t is None:
+            return []
+        field = find_exit_field(tiles, goal)
+        xs, ys, (gx, gy) = graph.xs, graph.ys, goal
+        exact = field.heuristic() if field is not None else None
+
+        def heuristic(v):
+            # Bảng khoảng cách tới lối ra nếu có (None = ô không còn đường ra), không thì Manhattan
+            if exact:
+                return exact[v] if exact[v] >= 0 else None
+            return abs(xs[v] - gx) + abs(ys[v] - gy)
+
+        if heuristic(s) is None:
+            return []
+        ids, expanded, generated = run_search(CALLER_PLAYER, "spacetime", spacetime_astar,
+                                             graph, s, t, heuristic, danger, self.horizon)
+        self.last_stats = {"nodes_expanded": expanded, "nodes_generated": generated}
+        return [graph.coords(v) for v in ids] if ids else []
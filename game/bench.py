@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+# game/bench.py
+# Benchmark không giao diện: chạy mọi thuật toán trong PATHFINDING_ALGORITHMS
+# trên một bộ mê cung có seed, có/không có guard giả, rồi ghi báo cáo CSV/JSON.
+#
+#   python -m game.bench --sizes 20x11,40x22 --mazes 10 --guards 3 --out bench
+import argparse
+import csv
+import glob
+import json
+import os
+import random
+import time
+import tracemalloc
+import zlib
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from game import config
+from game.ai.pathfinding import PATHFINDING_ALGORITHMS
+from game.maze.pool import build_maze_tiles
+from game.maze.serializers import load_maze, save_maze
+from game.maze.tilemap import TileMap
+
+METRICS = ("time_ms", "nodes_expanded", "nodes_generated", "path_length", "peak_kb")
+PERCENTILES = (50, 90, 99)
+
+
+class BenchGuard:
+    """Guard giả đứng yên: chỉ có các thuộc tính mà DangerField đọc"""
+
+    def __init__(self, tile_x, tile_y):
+        self.tile_x, self.tile_y = tile_x, tile_y
+        self.path = []
+        self.path_index = 0
+
+
+def parse_sizes(text):
+    """"20x11,40x22" -> [(20, 11), (40, 22)] (số ô cols x rows như config.MAZE_COLS/ROWS)"""
+    sizes = []
+    for part in text.split(","):
+        cols, rows = part.lower().split("x")
+        sizes.append((int(cols), int(rows)))
+    return sizes
+
+
+# --- Bộ mê cung ---
+def build_corpus(sizes, mazes, seed, terrain_prob=0.0, corpus_dir=None):
+    """Danh sách (tên, đường dẫn hoặc None, cols, rows, seed).
+
+    Có corpus_dir chứa sẵn file .bin -> nạp lại đúng các file đó; thư mục rỗng
+    -> sinh mới và ghi ra để lần chạy sau so sánh trên cùng bộ mê cung.
+    """
+    if corpus_dir:
+        files = sorted(glob.glob(os.path.join(corpus_dir, "*.bin")))
+        if files:
+            return [(os.path.splitext(os.path.basename(p))[0], p, None, None, None) for p in files]
+    rng = random.Random(seed)
+    corpus = []
+    for cols, rows in sizes:
+        for _ in range(mazes):
+            maze_seed = rng.getrandbits(31)
+            name = f"maze_{cols}x{rows}_{maze_seed}"
+            path = None
+            if corpus_dir:
+                os.makedirs(corpus_dir, exist_ok=True)
+                path = os.path.join(corpus_dir, name + ".bin")
+                save_maze(path, build_maze_tiles(cols, rows, maze_seed, terrain_prob=terrain_prob),
+                          seed=maze_seed)
+            corpus.append((name, path, cols, rows, maze_seed))
+    return corpus
+
+
+def _load_tiles(entry, terrain_prob):
+    name, path, cols, rows, seed = entry
+    if path:
+        return load_maze(path)[0]
+    return TileMap(build_maze_tiles(cols, rows, seed, terrain_prob=terrain_prob))
+
+
+def _endpoints(tiles):
+    # Ô xuất phát (1, 1) và ô lối ra ở mép dưới, giống main.py
+    return (1, 1), (tiles.width - 3, tiles.height - 1)
+
+
+def _synthetic_guards(tiles, count, seed, start, goal):
+    if not count:
+        return None
+    rng = random.Random(seed)
+    free = [p for p in tiles.free_tiles() if p not in (start, goal)]
+    return [BenchGuard(x, y) for x, y in rng.sample(free, min(count, len(free)))]
+
+
+# --- Chạy một ca (top-level để chạy được trong process pool) ---
+def run_case(task):
+    entry, algorithms, guard_counts, repeats, terrain_prob, measure_memory = task
+    base = _load_tiles(entry, terrain_prob)
+    start, goal = _endpoints(base)
+    size = f"{base.width}x{base.height}"
+    rows = []
+    for guard_count in guard_counts:
+        guards = _synthetic_guards(base, guard_count, zlib.crc32(entry[0].encode()), start, goal)
+        for name in algorithms:
+            func = PATHFINDING_ALGORITHMS[name]
+            for repeat in range(repeats):
+                # Bản sao mới mỗi lần: không để graph/planner/cache của lần trước làm "ấm" lần sau
+                tiles = base.copy()
+                t0 = time.perf_counter_ns()
+                path, nodes_expanded, nodes_generated = func(tiles, start, goal, guards=guards)
+                elapsed = time.perf_counter_ns() - t0
+                rows.append({
+                    "maze": entry[0],
+                    "size": size,
+                    "algorithm": name,
+                    "guards": guard_count,
+                    "repeat": repeat,
+                    "found": bool(path),
+                    "time_ms": elapsed / 1e6,
+                    "nodes_expanded": nodes_expanded,
+                    "nodes_generated": nodes_generated,
+                    "path_length": len(path) if path else None,
+                    "peak_kb": None,
+                })
+            if measure_memory:
+                # tracemalloc làm chậm vài lần nên đo bộ nhớ ở một lượt riêng, không tính giờ
+                tiles = base.copy()
+                tracemalloc.start()
+                try:
+                    func(tiles, start, goal, guards=guards)
+                    rows[-repeats]["peak_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+                finally:
+                    tracemalloc.stop()
+    return rows
+
+
+# --- Tổng hợp ---
+def summarize(runs):
+    """Gom theo (thuật toán, kích thước, số guard) -> mean và các phân vị cho từng metric"""
+    groups = defaultdict(list)
+    for run in runs:
+        groups[(run["algorithm"], run["size"], run["guards"])].append(run)
+    summary = []
+    for (name, size, guards), items in sorted(groups.items()):
+        row = {"algorithm": name, "size": size, "guards": guards, "runs": len(items),
+               "found_rate": sum(r["found"] for r in items) / len(items)}
+        for metric in METRICS:
+            values = np.array([r[metric] for r in items if r[metric] is not None], dtype=np.float64)
+            row[f"{metric}_mean"] = float(values.mean()) if values.size else None
+            for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES) if values.size
+                                else [None] * len(PERCENTILES)):
+                row[f"{metric}_p{p}"] = None if value is None else float(value)
+        summary.append(row)
+    return summary
+
+
+def write_reports(prefix, summary, runs, settings):
+    csv_path, json_path = prefix + ".csv", prefix + ".json"
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(summary[0]) if summary else ["algorithm"])
+        writer.writeheader()
+        writer.writerows(summary)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump({"settings": settings, "summary": summary, "runs": runs}, f, ensure_ascii=False, indent=1)
+    return csv_path, json_path
+
+
+def run_benchmark(corpus, algorithms=None, guard_counts=(0,), repeats=1, workers=None,
+                  terrain_prob=0.0, measure_memory=True):
+    """Chạy cả bộ và trả về danh sách kết quả thô (mỗi mê cung là một task của pool)"""
+    algorithms = list(algorithms or PATHFINDING_ALGORITHMS)
+    tasks = [(entry, algorithms, tuple(guard_counts), repeats, terrain_prob, measure_memory)
+             for entry in corpus]
+    runs = []
+    if workers == 1:
+        for task in tasks:
+            runs.extend(run_case(task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for rows in executor.map(run_case, tasks):
+                runs.extend(rows)
+    return runs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m game.bench",
+                                     description="Benchmark các thuật toán tìm đường trên bộ mê cung có seed")
+    parser.add_argument("--sizes", default=f"{config.MAZE_COLS}x{config.MAZE_ROWS}",
+                        help="danh sách kích thước colsxrows, cách nhau bởi dấu phẩy")
+    parser.add_argument("--mazes", type=int, default=10, help="số mê cung cho mỗi kích thước")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corpus", help="thư mục .bin: nạp nếu đã có, không thì sinh và ghi vào")
+    parser.add_argument("--guards", type=int, default=3,
+                        help="số guard giả (luôn chạy thêm một lượt không có guard); 0 để tắt")
+    parser.add_argument("--algorithms", help="lọc theo tên, cách nhau bởi dấu phẩy (mặc định: tất cả)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None, help="số process (1 = chạy tuần tự)")
+    parser.add_argument("--terrain", type=float, default=0.0, help="tỉ lệ ô bùn/nước khi sinh mê cung")
+    parser.add_argument("--no-memory", action="store_true", help="bỏ đo tracemalloc (nhanh hơn, time chính xác hơn)")
+    parser.add_argument("--out", default="bench", help="tiền tố file báo cáo (.csv và .json)")
+    args = parser.parse_args(argv)
+
+    algorithms = list(PATHFINDING_ALGORITHMS)
+    if args.algorithms:
+        wanted = [a.strip() for a in args.algorithms.split(",")]
+        unknown = [a for a in wanted if a not in PATHFINDING_ALGORITHMS]
+        if unknown:
+            parser.error(f"không có thuật toán: {', '.join(unknown)}")
+        algorithms = wanted
+    guard_counts = (0, args.guards) if args.guards else (0,)
+
+    corpus = build_corpus(parse_sizes(args.sizes), args.mazes, args.seed, args.terrain, args.corpus)
+    t0 = time.perf_counter()
+    runs = run_benchmark(corpus, algorithms, guard_counts, args.repeats, args.workers,
+                         args.terrain, not args.no_memory)
+    summary = summarize(runs)
+    settings = dict(vars(args), mazes_in_corpus=len(corpus), seconds=round(time.perf_counter() - t0, 3))
+    csv_path, json_path = write_reports(args.out, summary, runs, settings)
+
+    for row in summary:
+        print(f"{row['algorithm']:<28} {row['size']:>8} guards={row['guards']:<2} "
+              f"p50={row['time_ms_p50']:.3f}ms p90={row['time_ms_p90']:.3f}ms "
+              f"expanded_p50={row['nodes_expanded_p50']:.0f} generated_p50={row['nodes_generated_p50']:.0f} "
+              f"found={row['found_rate']:.0%}")
+    print(f"Đã ghi {csv_path} và {json_path} ({len(runs)} lần chạy, {settings['seconds']}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,14 +9,60 @@ FPS = 60
 # Tên phải khớp với tên file ảnh (ví dụ: wooden.png, bg_wooden.png)
 MAP_THEMES = ["wooden", "wall", "ice", "tree_wooden"]
 
+# --- CẤU HÌNH SINH MÊ CUNG NỀN (game/maze/pool.py) ---
+MAZE_POOL_DEPTH = 2           # Số mê cung sinh sẵn cho mỗi kích thước
+MAZE_POOL_PROCESSES = False   # True = sinh bằng process pool (hữu ích với map rất lớn)
+MAZE_SPILL_DIR = None         # Thư mục lưu mê cung chưa dùng khi thoát (None = không lưu)
+
+# --- CẤU HÌNH CACHE ĐƯỜNG ĐI (game/ai/path_cache.py) ---
+PATH_CACHE_SIZE = 512         # Số kết quả tìm đường tối đa giữ lại (LRU)
+
+# --- CẤU HÌNH TÌM ĐƯỜNG PHÂN CẤP HPA* (game/ai/hierarchical.py) ---
+HPA_CLUSTER_SIZE = 16         # Cạnh mỗi cụm (tính bằng ô)
+HPA_MIN_TILES = 150 * 150     # Bản đồ có từ chừng này ô trở lên thì guard dùng HPA*
+
+# --- CẤU HÌNH HEURISTIC LANDMARK ALT (game/ai/landmarks.py) ---
+ALT_LANDMARKS = 8             # Số landmark mỗi mê cung (mỗi landmark là một bảng khoảng cách int32)
+ALT_PRECOMPUTE = True         # MazePool tính sẵn bảng landmark ở worker và lưu kèm file spill
+
+# --- CẤU HÌNH TRƯỜNG KHOẢNG CÁCH ĐUỔI BẮT (game/ai/distance_field.py) ---
+FLOW_FIELD_MAX_NODES = 50000  # Số ô tối đa BFS từ người chơi được phủ trước khi guard tự tìm đường
+
+# --- CẤU HÌNH AI NGƯỜI CHƠI (game/entities/player.py, game/ai/spacetime.py) ---
+AI_MOVE_DELAY = 80            # ms giữa hai bước của AI người chơi
+SPACETIME_HORIZON = 12        # Số nhịp dự đoán guard khi lập kế hoạch né (A* không gian-thời gian)
+GUARD_NEARBY_DISTANCE = 7     # Guard gần hơn chừng này ô (Manhattan) thì lập kế hoạch né guard
+
+# --- CẤU HÌNH TÌM KIẾM CHIA KHUNG HÌNH (game/ai/resumable.py) ---
+SEARCH_FRAME_BUDGET_US = 2000            # Micro-giây mỗi khung hình cho các tìm kiếm chạy dở (0 = tắt)
+BUDGETED_SEARCH_MIN_TILES = 100 * 100    # Bản đồ từ chừng này ô trở lên thì tìm kiếm dài được chia khung hình
+
+# --- CẤU HÌNH DỊCH VỤ TÌM ĐƯỜNG CHẠY NỀN (game/ai/path_service.py) ---
+PATH_SERVICE_MODE = "thread"  # "thread", "process" (bản đồ dùng chung qua shared memory) hoặc None = tìm ngay trong khung hình
+PATH_SERVICE_WORKERS = 2      # Số worker của pool
+
+# --- CẤU HÌNH LẬP KẾ HOẠCH HỢP TÁC CHO GUARD (game/ai/cooperative.py) ---
+COOPERATIVE_GUARDS = True     # Lập kế hoạch chung kiểu WHCA* để các guard không dồn vào một hành lang
+COOP_WINDOW = 16              # Số nhịp (bước đi) được đặt chỗ trong mỗi lần lập kế hoạch
+
+# --- CẤU HÌNH ĐO ĐẠC TÌM ĐƯỜNG (game/ai/instrumentation.py) ---
+SEARCH_INSTRUMENTATION = False        # Bật để ghi histogram theo thuật toán / nơi gọi, in ra khi thoát
+INSTRUMENTATION_WINDOW = 256          # Số mẫu gần nhất giữ lại cho mỗi (thuật toán, caller)
+INSTRUMENTATION_TRACE_MEMORY = False  # Đo bộ nhớ đỉnh bằng tracemalloc (chậm đi nhiều)
+
 # --- CẤU HÌNH ĐỊA HÌNH VÀ CHI PHÍ DI CHUYỂN ---
+# Chi phí đi vào ô theo loại ô: 0 = đường, 2 = bùn (MUD), 3 = nước (WATER)
 TERRAIN_COSTS = {
     0: 1,
     2: 5,
     3: 10,
 }
+TERRAIN_PROB = 0.05           # Tỉ lệ ô đường được rải bùn/nước khi sinh mê cung
 
 # --- CẤU HÌNH ĐỘ KHÓ CỦA GUARD ---
+# ALGORITHM_MODE (game/ai/astar.py): "UCS", "A_STAR", "JPS" (Jump Point Search,
+# tự quay về A* khi có chi phí né guard) hoặc bản hai chiều "BIDIRECTIONAL_BFS",
+# "BIDIRECTIONAL_UCS", "BIDIRECTIONAL_A_STAR"
 DIFFICULTY_SETTINGS = {
     "EASY": {
         "DISPLAY_NAME": "EASY (1 Guard)",
@@ -1,18 +1,34 @@
 # game/controllers/guard_manager.py
 import random 
 import pygame
+import numpy as np
 from game.entities.guard import Guard
-from game.config import CELL_SIZE, DIFFICULTY_SETTINGS
+from game.config import (CELL_SIZE, DIFFICULTY_SETTINGS, HPA_MIN_TILES, FLOW_FIELD_MAX_NODES,
+                         COOPERATIVE_GUARDS, COOP_WINDOW)
 from game.ai.astar import astar_path
+from game.ai.path_cache import PATH_CACHE
+from game.ai.path_service import PATH_SERVICE
+from game.ai.hierarchical import hpa_path
+from game.ai.distance_field import DistanceField
+from game.ai.cooperative import ReservationTable, windowed_astar
+from game.ai.graph import get_graph
+from game.ai.instrumentation import CALLER_GUARD_CHASE, CALLER_GUARD_PATROL, run_search
+from game.maze.tilemap import as_tilemap
 
 class GuardManager:
     def __init__(self, tiles, difficulty="NORMAL"): 
-        self.tiles = tiles
+        self.tiles = as_tilemap(tiles)
         self.guards = []
         self.difficulty = difficulty
         self.settings = DIFFICULTY_SETTINGS[difficulty]
         self.algorithm_mode = self.settings["ALGORITHM_MODE"]
         self.guard_count = self.settings["GUARD_COUNT"]
+        self.chase_field = None  # Trường khoảng cách tới người chơi, dùng chung cho mọi guard đuổi
+        # Lập kế hoạch hợp tác (WHCA*): bảng đặt chỗ (ô, nhịp) dùng chung cho mọi guard
+        self.reservations = ReservationTable() if COOPERATIVE_GUARDS else None
+        self.window = COOP_WINDOW
+        self.goal_fields = {}    # đích tuần tra -> DistanceField (heuristic khoảng cách thật)
+        self._plan_key = None    # (version bản đồ, ô người chơi) của lần lập kế hoạch gần nhất
 
     def add_guard(self, x, y):
         patrol_speed = self.settings["CHASE_SPEED"] - 1 
@@ -23,7 +39,8 @@ class GuardManager:
                       patrol_speed=patrol_speed, 
                       chase_speed=chase_speed, 
                       detect_radius=detect_radius,
-                      algorithm_mode=self.algorithm_mode) 
+                      algorithm_mode=self.algorithm_mode,
+                      cooperative=self.reservations is not None) 
         self.guards.append(guard)
         return guard
 
@@ -37,23 +54,17 @@ class GuardManager:
         MIN_SPAWN_DISTANCE = 8
         player_start_pos = (1, 1) # Vị trí bắt đầu của người chơi
 
-        # 2. Lấy tất cả các ô có thể đi được như cũ
-        free_tiles = [
-            (x, y)
-            for y in range(len(self.tiles))
-            for x in range(len(self.tiles[0]))
-            if self.tiles[y][x] == 0 
-        ]
+        # 2. Lấy tất cả các ô có thể đi được (vector hoá trên mảng tiles)
+        ys, xs = np.nonzero(self.tiles.passable_mask())
+        free_tiles = list(zip(xs.tolist(), ys.tolist()))
         
         # 3. Lọc ra danh sách các vị trí spawn "an toàn"
         #    Chỉ giữ lại những ô có khoảng cách (Manhattan distance) >= khoảng cách tối thiểu
-        safe_spawn_locations = [
-            tile for tile in free_tiles
-            if (abs(tile[0] - player_start_pos[0]) + abs(tile[1] - player_start_pos[1])) >= MIN_SPAWN_DISTANCE
-        ]
-        
-        mid_column = len(self.tiles[0]) // 2
-        safe_spawn_locations = [tile for tile in safe_spawn_locations if tile[0] >= mid_column]
+        #    và nằm ở nửa bên phải bản đồ
+        mid_column = self.tiles.width // 2
+        dist = np.abs(xs - player_start_pos[0]) + np.abs(ys - player_start_pos[1])
+        safe_mask = (dist >= MIN_SPAWN_DISTANCE) & (xs >= mid_column)
+        safe_spawn_locations = list(zip(xs[safe_mask].tolist(), ys[safe_mask].tolist()))
         # 4. Xác định số lượng guard cần spawn
         spawn_count = self.guard_count
 
@@ -81,8 +92,8 @@ class GuardManager:
             self.add_guard(pos[0], pos[1])
 
     def compute_player_tile(self, player):
-        cols = len(self.tiles[0])
-        rows = len(self.tiles)
+        cols = self.tiles.width
+        rows = self.tiles.height
         
         px, py = player.get_tile_position() 
         
@@ -93,6 +104,13 @@ class GuardManager:
         ty = max(0, min(rows - 1, ty))
         return (tx, ty)
 
+    def get_chase_field(self, player_tile):
+        """Trường khoảng cách gốc tại player_tile; chỉ dựng lại khi người chơi
+           đổi ô hoặc bản đồ bị sửa"""
+        if self.chase_field is None or self.chase_field.is_stale(self.tiles, player_tile):
+            self.chase_field = DistanceField(self.tiles, player_tile, max_nodes=FLOW_FIELD_MAX_NODES)
+        return self.chase_field
+
     def update(self, player, always_recompute=True, debug=False):
         player_tile = self.compute_player_tile(player)
         
@@ -101,22 +119,149 @@ class GuardManager:
 
             if dist <= guard.detect_radius:
                 # CHASE
+                if not guard.chasing:
+                    guard.cancel_search()  # Bỏ tìm đường tuần tra đang chờ
                 guard.chasing = True
                 guard.speed = self.settings["CHASE_SPEED"]
                 
-                path = astar_path(self.tiles, (guard.tile_x, guard.tile_y), player_tile)
-                if path: guard.set_path(path)
+                if self.reservations is None:
+                    path = self.chase_path((guard.tile_x, guard.tile_y), player_tile, owner=guard)
+                    if path: guard.set_path(path)
                 
             elif dist > guard.detect_radius + 2:
                 # PATROL
                 guard.chasing = False
                 guard.speed = self.settings["CHASE_SPEED"] - 1 
                 
-                if not guard.path or guard.path_index >= len(guard.path):
+                if (not guard.path or guard.path_index >= len(guard.path)) and not guard.is_searching():
                     guard.random_patrol()
-            
+
+        if self.reservations is not None:
+            self.plan_cooperative(player_tile)
+
+        for guard in self.guards:
             guard.update_movement()
 
+    def chase_path(self, start, player_tile, owner=None):
+        """Đường đuổi độc lập của một guard (không tính guard khác).
+
+        Có owner và PathService đang bật: phần tự tìm đường được gửi cho worker,
+        trả về None ngay và đường đi được giao cho owner ở khung hình sau.
+        """
+        # Đi xuôi theo trường khoảng cách chung; chỉ tự tìm đường khi guard
+        # nằm ngoài vùng trường đã phủ (hoặc đang đứng trên tường)
+        path = self.get_chase_field(player_tile).path_from(start)
+        if path is not None:
+            return path
+        if owner is not None and PATH_SERVICE.enabled:
+            self.request_chase_path(owner, start, player_tile)
+            return None
+        if self.tiles.width * self.tiles.height >= HPA_MIN_TILES:
+            # Bản đồ lớn: HPA* (tìm trên cụm rồi tinh chỉnh), dự phòng A* nếu không thấy
+            key = PATH_CACHE.make_key(self.tiles, start, player_tile, "guard_chase:hpa")
+            path = PATH_CACHE.get_or_compute(key, lambda: run_search(
+                CALLER_GUARD_CHASE, "hpa",
+                lambda: hpa_path(self.tiles, start, player_tile) or astar_path(self.tiles, start, player_tile)))
+        else:
+            key = PATH_CACHE.make_key(self.tiles, start, player_tile, "guard_chase:" + self.algorithm_mode)
+            path = PATH_CACHE.get_or_compute(key, lambda: run_search(
+                CALLER_GUARD_CHASE, self.algorithm_mode, astar_path, self.tiles, start, player_tile,
+                algorithm_mode=self.algorithm_mode))
+        return path
+
+    def request_chase_path(self, guard, start, player_tile):
+        """Gửi tìm đường đuổi cho PathService (HPA* trên bản đồ lớn, không thì A* theo mode của độ khó)"""
+        if self.tiles.width * self.tiles.height >= HPA_MIN_TILES:
+            func, kwargs, label = hpa_path, {}, "hpa"
+        else:
+            func, kwargs, label = astar_path, {"algorithm_mode": self.algorithm_mode}, self.algorithm_mode
+        key = PATH_CACHE.make_key(self.tiles, start, player_tile, "guard_chase:" + label)
+        path = PATH_CACHE.get(key)
+        if path:
+            guard.set_path(list(path))
+            return
+
+        def deliver(path, stats):
+            PATH_CACHE.put(key, path)
+            if path and guard.chasing and tuple(path[0]) == (guard.tile_x, guard.tile_y):
+                guard.set_path(path)
+
+        PATH_SERVICE.request(guard, self.tiles, start, player_tile, func, deliver,
+                             caller=CALLER_GUARD_CHASE, **kwargs)
+
+    # --- Lập kế hoạch hợp tác (WHCA*) ---
+    def goal_field(self, goal):
+        field = self.goal_fields.get(goal)
+        if field is None or field.is_stale(self.tiles, goal):
+            field = self.goal_fields[goal] = DistanceField(self.tiles, goal, max_nodes=FLOW_FIELD_MAX_NODES)
+        return field
+
+    def needs_replan(self, guard):
+        return not guard.path or guard.path_index >= min(guard.replan_at, len(guard.path))
+
+    def plan_cooperative(self, player_tile):
+        """Lập kế hoạch cho mọi guard trong một lượt, theo thứ tự ưu tiên.
+
+        Chỉ chạy khi bản đồ đổi, người chơi đổi ô (nếu có guard đang đuổi) hoặc
+        có guard đã đi hết nửa cửa sổ của kế hoạch trước. Khi đó bảng đặt chỗ
+        được làm lại từ đầu: guard đuổi gần người chơi nhất chọn trước, guard
+        tuần tra chọn sau, mỗi guard né các (ô, nhịp) đã bị đặt.
+        """
+        chasers = [g for g in self.guards if g.chasing]
+        key = (self.tiles.version, player_tile if chasers else None)
+        if key == self._plan_key and not any(self.needs_replan(g) for g in self.guards):
+            return
+        self._plan_key = key
+        table = self.reservations
+        table.clear()
+        graph = get_graph(self.tiles)
+        px, py = player_tile
+        order = sorted(enumerate(self.guards), key=lambda item: (
+            not item[1].chasing, abs(item[1].tile_x - px) + abs(item[1].tile_y - py)))
+        live_targets = set()
+
+        for owner, guard in order:
+            origin, moving = guard.plan_origin()
+            if guard.chasing:
+                goal, field = player_tile, self.get_chase_field(player_tile)
+            else:
+                if guard.patrol_target is None or guard.patrol_target == origin:
+                    guard.random_patrol()
+                goal = guard.patrol_target
+                if goal is None:
+                    continue
+                live_targets.add(goal)
+                field = self.goal_field(goal)
+
+            ids = None
+            s, t = graph.node_id(origin), graph.node_id(goal)
+            if s is not None and t is not None:
+                ids = run_search(CALLER_GUARD_CHASE if guard.chasing else CALLER_GUARD_PATROL, "whca",
+                                 windowed_astar, graph, s, t, field.node_distance, table, owner,
+                                 self.window, free_goal=guard.chasing)
+            if ids is None:
+                # Không có kế hoạch trong cửa sổ (đích ngoài vùng trường phủ, bị chặn,...):
+                # quay về tìm đường độc lập như trước, cũng từ origin như follow_plan cần
+                if guard.chasing:
+                    path = self.chase_path(origin, player_tile)
+                else:
+                    path = guard.plan_patrol_path(goal, origin)
+                if path:
+                    guard.follow_plan(path, moving, len(path))
+                continue
+
+            table.reserve_path(owner, ids, until=self.window, skip=t if guard.chasing else None)
+            path = [graph.coords(v) for v in ids]
+            if ids[-1] != t:
+                # Ngoài cửa sổ: đi tiếp theo gradient của trường khoảng cách (chưa đặt chỗ)
+                path += field.path_from(path[-1])[1:]
+            guard.follow_plan(path, moving, self.window // 2)
+
+        # Bỏ trường của các đích tuần tra không còn ai dùng
+        for goal in list(self.goal_fields):
+            if goal not in live_targets:
+                del self.goal_fields[goal]
+
     def draw(self, screen):
         for g in self.guards:
             g.draw(screen)
\ No newline at end of file
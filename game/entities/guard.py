@@ -2,11 +2,18 @@
 import pygame, random, math
 from game import config
 from game.ai.astar import astar_path # Sử dụng astar_path cho tuần tra
+from game.ai.path_cache import PATH_CACHE
+from game.ai.hierarchical import hpa_path
+from game.ai.instrumentation import CALLER_GUARD_PATROL, run_search
+from game.ai.resumable import SEARCH_SCHEDULER, ResumableSearch, is_budgeted
+from game.ai.path_service import PATH_SERVICE
+from game.maze.tilemap import as_tilemap
 
 class Guard:
     # THÊM THAM SỐ algorithm_mode VÀO __init__
-    def __init__(self, start_x, start_y, tiles, patrol_speed=1, chase_speed=3, detect_radius=5, algorithm_mode="A_STAR"):
-        self.tiles = tiles
+    def __init__(self, start_x, start_y, tiles, patrol_speed=1, chase_speed=3, detect_radius=5, algorithm_mode="A_STAR",
+                 cooperative=False):
+        self.tiles = as_tilemap(tiles)
         self.size = config.CELL_SIZE
 
         # Tile coords
@@ -30,6 +37,12 @@ class Guard:
         # Pathfinding
         self.path = []
         self.path_index = 0
+        # Chế độ hợp tác: GuardManager lập kế hoạch chung cho mọi guard
+        self.cooperative = cooperative
+        self.patrol_target = None
+        self.replan_at = 0      # path_index mà tại đó kế hoạch theo cửa sổ cần lập lại
+        self.wait_frames = 0
+        self.search_task = None  # Tìm đường tuần tra chia khung hình (bản đồ lớn)
 
         # Detection
         self.detect_radius = detect_radius
@@ -63,22 +76,101 @@ class Guard:
 
     # --- Chọn tile ngẫu nhiên để tuần tra ---
     def random_patrol(self):
-        free_tiles = [
-            (x, y)
-            for y in range(len(self.tiles))
-            for x in range(len(self.tiles[0]))
-            if self.tiles[y][x] == 0
-        ]
+        free_tiles = self.tiles.free_tiles()
         if not free_tiles:
             return
 
         target = random.choice(free_tiles)
+        self.patrol_target = target
+        if self.cooperative:
+            # Đường đi do GuardManager lập cùng lúc cho mọi guard (game/ai/cooperative.py)
+            self.path, self.path_index = [], 0
+            return
+        if is_budgeted(self.tiles) and self.tiles.width * self.tiles.height < config.HPA_MIN_TILES:
+            # Tìm rải qua nhiều khung hình; trong lúc chờ đi theo đường tạm (xem poll_search)
+            self.search_task = SEARCH_SCHEDULER.submit(self, ResumableSearch(
+                self.tiles, (self.tile_x, self.tile_y), target, self.algorithm_mode != "UCS"))
+            self.path, self.path_index = [], 0
+            return
+        if PATH_SERVICE.enabled:
+            self.request_patrol_path(target)
+            return
+        path = self.plan_patrol_path(target)
+        if path:
+            self.set_path(path)
 
+    def poll_search(self):
+        """Lấy đường từ tìm kiếm chia khung hình: tạm khi đang tìm, đầy đủ khi xong"""
+        task = self.search_task
+        if task.done:
+            self.search_task = None
+        path = task.path_from((self.tile_x, self.tile_y))
+        if path and len(path) > 1:
+            self.set_path(path)
+        elif task.done:
+            self.path, self.path_index = [], 0  # Không có đường / bản đồ đã đổi: chọn đích khác
+
+    def cancel_search(self):
+        if self.search_task is not None:
+            SEARCH_SCHEDULER.cancel(self)
+            self.search_task = None
+        PATH_SERVICE.cancel(self)
+
+    def is_searching(self):
+        """Đang chờ một tìm kiếm tuần tra (chia khung hình hoặc ở PathService)"""
+        return self.search_task is not None or PATH_SERVICE.pending(self)
+
+    def patrol_search(self):
+        """(hàm tìm đường, tham số thêm, nhãn) cho đường tuần tra theo kích thước bản đồ"""
+        if self.tiles.width * self.tiles.height >= config.HPA_MIN_TILES:
+            # Bản đồ lớn: tuần tra xuyên bản đồ bằng HPA*
+            return hpa_path, {}, "hpa"
         # GỌI A* VỚI MODE ĐÃ LƯU
-        path = astar_path(self.tiles, (self.tile_x, self.tile_y), target, 
-                          algorithm_mode=self.algorithm_mode)
+        return astar_path, {"algorithm_mode": self.algorithm_mode}, self.algorithm_mode
+
+    def plan_patrol_path(self, target, start=None):
+        """Đường tuần tra độc lập (không tính guard khác) tới target, từ start
+           (mặc định: ô hiện tại)"""
+        start = start or (self.tile_x, self.tile_y)
+        func, kwargs, label = self.patrol_search()
+        key = PATH_CACHE.make_key(self.tiles, start, target, "guard_patrol:" + label)
+        return PATH_CACHE.get_or_compute(key, lambda: run_search(CALLER_GUARD_PATROL, label, func,
+                                                                 self.tiles, start, target, **kwargs))
+
+    def request_patrol_path(self, target):
+        """Như plan_patrol_path nhưng tìm ở worker của PathService; guard đứng yên tới khi có đường"""
+        start = (self.tile_x, self.tile_y)
+        func, kwargs, label = self.patrol_search()
+        key = PATH_CACHE.make_key(self.tiles, start, target, "guard_patrol:" + label)
+        path = PATH_CACHE.get(key)
+        self.path, self.path_index = [], 0
         if path:
+            self.set_path(list(path))
+            return
+
+        def deliver(path, stats):
+            PATH_CACHE.put(key, path)
+            # Trong lúc chờ guard có thể đã chuyển sang đuổi: bỏ đường tuần tra
+            if path and not self.chasing and tuple(path[0]) == (self.tile_x, self.tile_y):
+                self.set_path(path)
+
+        PATH_SERVICE.request(self, self.tiles, start, target, func, deliver, caller=CALLER_GUARD_PATROL, **kwargs)
+
+    def plan_origin(self):
+        """(ô bắt đầu kế hoạch, đang đi dở?): guard đang giữa hai ô thì lấy ô đang tới"""
+        if (self.path and self.path_index < len(self.path)
+                and (self.pixel_x, self.pixel_y) != (self.tile_x * self.size, self.tile_y * self.size)):
+            return tuple(self.path[self.path_index]), True
+        return (self.tile_x, self.tile_y), False
+
+    def follow_plan(self, path, moving, replan_tick):
+        """Nhận kế hoạch từ GuardManager; path[t] là ô ở nhịp t, path[0] là ô của plan_origin()"""
+        if moving:
+            self.path, self.path_index = list(path), 0
+            self.replan_at = replan_tick
+        else:
             self.set_path(path)
+            self.replan_at = replan_tick - 1
 
     # --- Set path và target pixel ---
     def set_path(self, path):
@@ -92,12 +184,24 @@ class Guard:
 
     # --- Di chuyển theo path (giữ nguyên logic đã sửa) ---
     def move_along_path(self):
+        if self.search_task is not None and (self.search_task.done or self.path_index >= len(self.path)):
+            self.poll_search()
         if not self.path or self.path_index >= len(self.path):
+            if self.is_searching():
+                return  # Đang chờ tìm kiếm, chưa có bước nào để đi
             if not self.chasing:
                  self.random_patrol()
             return
 
         tx, ty = self.path[self.path_index]
+        if (tx, ty) == (self.tile_x, self.tile_y) and (self.pixel_x, self.pixel_y) == (tx * self.size, ty * self.size):
+            # Bước "đứng chờ" trong kế hoạch hợp tác: giữ nguyên chỗ trong thời gian của một bước đi
+            self.wait_frames += 1
+            if self.wait_frames * self.speed >= self.size:
+                self.wait_frames = 0
+                self.path_index += 1
+            return
+
         self.target_pixel_x = tx * self.size
         self.target_pixel_y = ty * self.size
 
@@ -2,11 +2,20 @@ import pygame
 import math
 import time
 from game import config
-from game.ai.pathfinding import PATHFINDING_ALGORITHMS, find_path
+from game.ai.pathfinding import (MAP_CACHED_ALGORITHMS, PATHFINDING_ALGORITHMS, SHORTEST_PATH_ALGORITHMS,
+                                 find_path, lookup_cached_path)
+from game.ai.path_cache import PATH_CACHE
+from game.ai.path_service import PATH_SERVICE, snapshot_guards
+from game.ai.exit_field import find_exit_field
+from game.ai.graph import get_graph
+from game.ai.spacetime import SpaceTimePlanner
+from game.ai.danger import DangerField, PLAYER_DANGER
+from game.ai.resumable import RESUMABLE_ALGORITHMS, SEARCH_SCHEDULER, ResumableSearch, is_budgeted
+from game.maze.tilemap import as_tilemap
 
 class Player:
     def __init__(self, start_x, start_y, tiles, algorithm_name="A* (An toàn)"):
-        self.tiles = tiles
+        self.tiles = as_tilemap(tiles)
         self.x, self.y = start_x, start_y
         self.size = config.CELL_SIZE
         
@@ -36,14 +45,17 @@ class Player:
         self.pathfinding_stats = None
         self.footprints = []
 
-        # Các biến cho logic né tránh
-        self.is_evading = False
-        self.evasion_path = []
-        self.evasion_path_index = 0
+        # Né guard: một kế hoạch trên không gian (ô, nhịp), giữ lại giữa các nhịp
+        self.spacetime = SpaceTimePlanner()
+        # Tìm đường ra chia qua nhiều khung hình (bản đồ lớn), None nếu không có
+        self.search_task = None
+        # Kết quả PathService giao ở khung hình trước, chờ lượt đi kế tiếp lấy ra
+        self.service_result = None
+        self.service_start = None
 
     def move(self, dx, dy, direction):
         new_x, new_y = self.x + dx, self.y + dy
-        if 0 <= new_y < len(self.tiles) and 0 <= new_x < len(self.tiles[0]) and self.tiles[new_y][new_x] == 0:
+        if self.tiles.is_passable(new_x, new_y):
             old_pos = (self.x, self.y)
             if not self.footprints or self.footprints[-1] != old_pos:
                 self.footprints.append(old_pos)
@@ -63,71 +75,54 @@ class Player:
         return player_rect.inflate(-self.size * 0.4, -self.size * 0.4).colliderect(
                guard_rect.inflate(-guard.size * 0.4, -guard.size * 0.4))
 
-    def is_tile_dangerous(self, tile, guards):
-        if not guards:
-            return False
-
-        DANGER_RADIUS = 2 # Tăng bán kính nguy hiểm để AI cẩn thận hơn
-
-        for guard in guards:
-            # 1. Kiểm tra với vị trí hiện tại của lính gác
-            dist_current = abs(tile[0] - guard.tile_x) + abs(tile[1] - guard.tile_y)
-            if dist_current <= DANGER_RADIUS:
-                return True
-
-            # 2. Dự đoán và kiểm tra với vị trí tiếp theo của lính gác
-            if guard.path and guard.path_index < len(guard.path):
-                predicted_pos = guard.path[guard.path_index]
-                dist_predicted = abs(tile[0] - predicted_pos[0]) + abs(tile[1] - predicted_pos[1])
-                if dist_predicted <= DANGER_RADIUS - 1: # Bán kính cho vị trí dự đoán có thể nhỏ hơn một chút
-                    return True
-                    
-        return False
-
-    def find_best_evasion_spot(self, current_tile, guards):
-        """Tìm điểm né tốt nhất ở gần, ưu tiên xa lính gác."""
-        best_spot, max_score, scan_radius = None, -float('inf'), 10
-        for y in range(max(0, current_tile[1] - scan_radius), min(len(self.tiles), current_tile[1] + scan_radius)):
-            for x in range(max(0, current_tile[0] - scan_radius), min(len(self.tiles[0]), current_tile[0] + scan_radius)):
-                if self.tiles[y][x] != 0: continue
-                spot = (x, y)
-                dist_to_g = min([abs(spot[0] - g.tile_x) + abs(spot[1] - g.tile_y) for g in guards]) if guards else float('inf')
-                dist_from_p = abs(spot[0] - current_tile[0]) + abs(spot[1] - current_tile[1])
-                score = 1.5 * dist_to_g - dist_from_p
-                if score > max_score:
-                    max_score, best_spot = score, spot
-        return best_spot if best_spot else current_tile
-
     def handle_ai_move(self, tiles, exit_tile, guards):
-        AI_MOVE_DELAY = 80
         now = pygame.time.get_ticks()
-        if now - self.last_move_time < AI_MOVE_DELAY:
+        if now - self.last_move_time < config.AI_MOVE_DELAY:
             return
 
         current_tile = (self.x, self.y)
         next_move = None
         
-        # --- LOGIC NÉ TRÁNH CHIẾN THUẬT (Ưu tiên cao nhất) ---
-        if self.is_evading:
-            if self.evasion_path and self.evasion_path_index < len(self.evasion_path):
-                next_move = self.evasion_path[self.evasion_path_index]
-                self.evasion_path_index += 1
-            else: # Đã né xong
-                self.is_evading, self.ai_path = False, []
-                self.is_moving = False
-                return
+        # --- CÓ GUARD Ở GẦN: MỘT KẾ HOẠCH VỪA TỚI LỐI RA VỪA NÉ (ưu tiên cao nhất) ---
+        # Dự đoán guard theo đường đi còn lại của chúng, được phép đứng chờ
+        is_guard_nearby = any(abs(current_tile[0] - g.tile_x) + abs(current_tile[1] - g.tile_y)
+                              < config.GUARD_NEARBY_DISTANCE for g in guards)
+        if is_guard_nearby:
+            next_move = self.spacetime.next_step(tiles, current_tile, exit_tile, guards)
+            if next_move is not None:
+                self.ai_path = []  # Đường ra cũ không còn đúng sau khi né
+                if next_move == current_tile:
+                    # Đứng chờ một nhịp để guard đi qua
+                    self.is_moving = False
+                    self.last_move_time = now
+                    return
+        else:
+            self.spacetime.reset()
 
         # --- LOGIC TÌM ĐƯỜNG CHIẾN LƯỢC ---
-        else:
-            recalculate_path = not self.ai_path or self.ai_path_index >= len(self.ai_path)
-            
-            # Tính toán lại đường đi nếu cần hoặc nếu có lính gác ở gần (để cập nhật đường đi an toàn)
-            is_guard_nearby = any(abs(current_tile[0] - g.tile_x) + abs(current_tile[1] - g.tile_y) < 7 for g in guards)
-            if recalculate_path or is_guard_nearby:
-                path, stats = find_path(tiles, current_tile, exit_tile, self.pathfinding_algorithm, guards)
-                if stats:
-                    stats["name"] = self.algorithm_name
-                    self.pathfinding_stats = stats
+        if next_move is None:
+            # Đang chờ tìm kiếm chia khung hình: mỗi bước lấy lại đường (tạm hoặc đầy đủ)
+            if not self.ai_path or self.ai_path_index >= len(self.ai_path) or self.search_task is not None:
+                field = find_exit_field(tiles, exit_tile)
+                if (not is_guard_nearby and field is not None and self.pathfinding_stats
+                        and self.pathfinding_algorithm in SHORTEST_PATH_ALGORITHMS
+                        and get_graph(tiles).uniform):
+                    # Không có guard gần và đã có stats của thuật toán: đi theo bảng
+                    # khoảng cách tới lối ra, cho cùng độ dài mà không cần tìm lại
+                    # (chỉ khi không có địa hình: bảng đếm số bước, không tính chi phí)
+                    path = field.path_from(current_tile)
+                elif self.pathfinding_algorithm in RESUMABLE_ALGORITHMS and is_budgeted(tiles):
+                    path = self.budgeted_exit_path(tiles, current_tile, exit_tile, guards)
+                elif PATH_SERVICE.enabled and (PATH_SERVICE.live_maps
+                                               or self.pathfinding_algorithm not in MAP_CACHED_ALGORITHMS):
+                    # Worker process chỉ có bản chép của bản đồ: D* Lite / nút giao / ALT
+                    # tìm ngay ở đây để giữ cấu trúc tăng dần của chúng
+                    path = self.service_exit_path(tiles, current_tile, exit_tile, guards)
+                else:
+                    path, stats = find_path(tiles, current_tile, exit_tile, self.pathfinding_algorithm, guards)
+                    if stats:
+                        stats["name"] = self.algorithm_name
+                        self.pathfinding_stats = stats
                 
                 if path and len(path) > 1:
                     self.ai_path, self.ai_path_index = path, 1
@@ -135,20 +130,8 @@ class Player:
                     self.is_moving = False
                     return
 
-            next_tile_in_path = self.ai_path[self.ai_path_index]
-
-            # Nếu bước tiếp theo vẫn bị đe dọa trực tiếp -> Kích hoạt né tránh
-            if self.is_tile_dangerous(next_tile_in_path, guards):
-                self.is_evading = True
-                evasion_goal = self.find_best_evasion_spot(current_tile, guards)
-                evasion_path, _ = find_path(tiles, current_tile, evasion_goal, self.pathfinding_algorithm)
-                if evasion_path and len(evasion_path) > 1:
-                    self.evasion_path, self.evasion_path_index = evasion_path, 1
-                self.is_moving = False
-                return # Dừng lại, lượt sau sẽ bắt đầu né
-            else:
-                next_move = next_tile_in_path
-                self.ai_path_index += 1
+            next_move = self.ai_path[self.ai_path_index]
+            self.ai_path_index += 1
 
         # --- THỰC HIỆN DI CHUYỂN ---
         if next_move:
@@ -160,6 +143,53 @@ class Player:
             else: self.is_moving = False
         else: self.is_moving = False
 
+    def budgeted_exit_path(self, tiles, current_tile, exit_tile, guards):
+        """Đường ra từ tìm kiếm chia khung hình: đường tạm tới nút tốt nhất khi
+           đang tìm, đường đầy đủ (và stats) khi xong"""
+        task = self.search_task
+        if task is None or task.stale or task.goal != tuple(exit_tile):
+            danger = DangerField.for_guards(tiles.width, tiles.height, guards, PLAYER_DANGER) if guards else None
+            task = self.search_task = ResumableSearch(tiles, current_tile, exit_tile,
+                                                      RESUMABLE_ALGORITHMS[self.pathfinding_algorithm],
+                                                      danger.costs if danger else None)
+            SEARCH_SCHEDULER.submit(self, task)
+        path = task.path_from(current_tile)
+        if task.done and not task.stale:
+            self.search_task = None
+            if task.path is not None:
+                stats = task.stats()
+                stats["name"] = self.algorithm_name
+                self.pathfinding_stats = stats
+                if path is None:
+                    # Đã đi lệch khỏi đường tìm được (theo đường tạm): tìm lại từ chỗ đang đứng
+                    return self.budgeted_exit_path(tiles, current_tile, exit_tile, guards)
+        return path
+
+    def service_exit_path(self, tiles, current_tile, exit_tile, guards):
+        """Đường ra tìm ở worker của PathService: None (đứng chờ) cho tới khi có
+           kết quả; kết quả tính từ ô khác (đã bị đẩy đi khi né) thì tìm lại"""
+        result, self.service_result = self.service_result, None
+        if result is None or not result[0] or tuple(result[0][0]) != current_tile:
+            if PATH_SERVICE.pending(self) and self.service_start == current_tile:
+                # Vẫn đứng ở ô đã gửi: chờ tiếp kết quả đang tìm, không gửi lại mỗi khi
+                # guard nhích một bước (trường nguy hiểm đổi -> khoá đổi -> không bao giờ xong)
+                return None
+            snapshots = snapshot_guards(guards)
+            key, result = lookup_cached_path(tiles, current_tile, exit_tile, self.pathfinding_algorithm, snapshots)
+            if result is None:
+                def deliver(path, stats):
+                    if key is not None and stats is not None:  # stats None: tìm kiếm lỗi, không cache
+                        PATH_CACHE.put(key, (list(path) if path else path, stats))
+                    self.service_result = (path, stats)
+                PATH_SERVICE.request(self, tiles, current_tile, exit_tile, self.pathfinding_algorithm, deliver,
+                                     guards=snapshots)
+                self.service_start = current_tile
+                return None
+        path, stats = result
+        stats["name"] = self.algorithm_name
+        self.pathfinding_stats = stats
+        return path
+
     def handle_input(self):
         if self.ai_mode: return
         keys = pygame.key.get_pressed(); now = pygame.time.get_ticks()
@@ -2,15 +2,22 @@ import os
 import sys
 import pygame
 import math
-from collections import deque
+from functools import partial
 from game import config
-from game.maze.generator import generate_maze, maze_to_tiles
+from game.maze.pool import MazePool
 from game.render.renderer import render_maze
 from game.entities.player import Player
 from game.controllers.guard_manager import GuardManager
 from game.render.menu import Menu
 from game.render.in_game_menu import InGameMenu
 from game.ai.pathfinding import PATHFINDING_ALGORITHMS
+from game.ai.path_cache import PATH_CACHE
+from game.ai.exit_field import get_exit_field
+from game.ai.connectivity import get_connectivity
+from game.ai.landmarks import attach_landmarks, copy_with_landmarks, landmark_layers
+from game.ai.instrumentation import HistogramSink, get_sink, set_sink
+from game.ai.resumable import SEARCH_SCHEDULER
+from game.ai.path_service import PATH_SERVICE
 
 # =======================================================================================
 # KHAI BÁO BIẾN TOÀN CỤC VÀ TRẠNG THÁI
@@ -36,11 +43,12 @@ current_maze_tiles = None
 replay_stats_history = []
 is_path_blocked = False
 path_warning_timer = 0
-reachable_tiles_from_player = set()
+blocked_tile_pixels = []  # Góc trên-trái (pixel) của các ô người chơi không tới được
 # Biến cho các nút bấm và bảng thông tin
 STATS_BUTTON_RECT = None
 STATS_PANEL_VISIBLE = False
 REPLAY_BUTTON_RECT = None
+REPLAY_MENU_SCROLL = 0  # Số thuật toán đã cuộn qua trong bảng chọn lại thuật toán
 GEAR_SIZE, EDIT_BUTTON_SIZE, HIDE_GUARDS_BUTTON_SIZE, AI_BUTTON_SIZE = 30, 30, 30, 30
 GEAR_RECT, EDIT_BUTTON_RECT, HIDE_GUARDS_BUTTON_RECT, AI_BUTTON_RECT, EXIT_EDIT_BUTTON_RECT = None, None, None, None, None
 GUARDS_VISIBLE = True
@@ -59,9 +67,13 @@ def invalidate_all_ai_paths():
     """Reset đường đi của AI khi bản đồ bị chỉnh sửa."""
     if player:
         player.ai_path, player.ai_path_index = [], 0
+        player.spacetime.reset()
     if guard_manager:
         for guard in guard_manager.guards:
             guard.path, guard.path_index = [], 0
+    if tiles is not None:
+        PATH_CACHE.invalidate(tiles)
+        PATH_SERVICE.invalidate(tiles)
     print("AI paths invalidated due to map edit.")
 
 def load_image(path, size=None):
@@ -351,6 +363,7 @@ def draw_replay_button(screen):
     screen.blit(text, text.get_rect(center=REPLAY_BUTTON_RECT.center))
 
 def draw_replay_menu(screen):
+    global REPLAY_MENU_SCROLL
     algorithms = list(PATHFINDING_ALGORITHMS.keys())
     num_algos = len(algorithms)
 
@@ -379,8 +392,12 @@ def draw_replay_menu(screen):
     
     button_rects = {}
     mouse_pos = pygame.mouse.get_pos()
+
+    # Danh sách dài hơn bảng thì cuộn bằng con lăn chuột
+    visible = max(1, int((panel_h - top_padding - 45) // button_spacing) + 1)
+    REPLAY_MENU_SCROLL = max(0, min(REPLAY_MENU_SCROLL, num_algos - visible))
     
-    for i, algo_name in enumerate(algorithms):
+    for i, algo_name in enumerate(algorithms[REPLAY_MENU_SCROLL:]):
         btn_rect = pygame.Rect(panel_rect.left + 50, panel_rect.top + 80 + i * button_spacing, panel_w - 100, 45)
         
         if panel_rect.contains(btn_rect):
@@ -404,36 +421,23 @@ def draw_footprints(screen, player, footprint_img):
         screen.blit(footprint_img, (pos_x, pos_y))
 
 def update_path_validity():
-    global is_path_blocked, path_warning_timer, reachable_tiles_from_player
-    if not player or not tiles:
+    global is_path_blocked, path_warning_timer, blocked_tile_pixels
+    if not player or tiles is None:
         return
 
-    reachable_tiles_from_player.clear()
-    
-    queue = deque([player.get_tile_position()])
-    visited = {player.get_tile_position()}
-    
-    rows, cols = len(tiles), len(tiles[0])
-
-    while queue:
-        current = queue.popleft()
-        reachable_tiles_from_player.add(current)
-        
-        x, y = current
-        for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-            neighbor = (x + dx, y + dy)
-            if (0 <= neighbor[1] < rows and 0 <= neighbor[0] < cols and 
-                tiles[neighbor[1]][neighbor[0]] == 0 and neighbor not in visited):
-                visited.add(neighbor)
-                queue.append(neighbor)
-
-    exit_pos = (EXIT_TILE_X, EXIT_TILE_Y + 1)
-    if exit_pos not in reachable_tiles_from_player:
-        if not is_path_blocked: 
-            path_warning_timer = pygame.time.get_ticks()
-        is_path_blocked = True
-    else:
+    # Nhãn thành phần liên thông cập nhật tăng dần theo từng lần sửa: tra O(1)
+    connectivity = get_connectivity(tiles)
+    player_tile = player.get_tile_position()
+    if connectivity.connected(player_tile, (EXIT_TILE_X, EXIT_TILE_Y + 1)):
         is_path_blocked = False
+        blocked_tile_pixels = []
+        return
+
+    # Bị chặn: tô đỏ mọi ô đi được nằm ngoài thành phần của người chơi
+    blocked_tile_pixels = (connectivity.unreachable_from(player_tile) * config.CELL_SIZE).tolist()
+    if not is_path_blocked: 
+        path_warning_timer = pygame.time.get_ticks()
+    is_path_blocked = True
 
 def draw_blocked_path_warning(screen):
     """Vẽ cảnh báo và tô đỏ toàn bộ khu vực bị chặn."""
@@ -450,16 +454,12 @@ def draw_blocked_path_warning(screen):
             screen.blit(panel_surf, panel_rect)
             screen.blit(text_surf, text_surf.get_rect(center=panel_rect.center))
 
-        rows, cols = len(tiles), len(tiles[0])
         highlight_surf = pygame.Surface((config.CELL_SIZE, config.CELL_SIZE), pygame.SRCALPHA)
         
         alpha = 100 + 60 * math.sin(pygame.time.get_ticks() * 0.005)
         highlight_surf.fill((255, 0, 0, alpha))
 
-        for y in range(rows):
-            for x in range(cols):
-                if tiles[y][x] == 0 and (x, y) not in reachable_tiles_from_player:
-                    screen.blit(highlight_surf, (x * config.CELL_SIZE, y * config.CELL_SIZE))
+        screen.blits([(highlight_surf, pos) for pos in blocked_tile_pixels], doreturn=False)
                     
 # =======================================================================================
 # LOGIC CHÍNH CỦA GAME
@@ -471,14 +471,19 @@ def setup_new_game(tiles_data, difficulty_name, algorithm_name, map_idx, screen)
     tiles = tiles_data
     SELECTED_DIFFICULTY = difficulty_name
     current_map_index = map_idx
+    SEARCH_SCHEDULER.clear()
+    PATH_SERVICE.clear()
     player = Player(1, 1, tiles, algorithm_name=algorithm_name)
+    # Bảng khoảng cách tới lối ra: dựng một lần cho mỗi mê cung, tự cập nhật khi sửa
+    get_exit_field(tiles, (EXIT_TILE_X, EXIT_TILE_Y + 1))
+    get_connectivity(tiles)  # Nhãn liên thông cho cảnh báo lối ra bị chặn khi sửa bản đồ
     guard_manager = GuardManager(tiles, difficulty=difficulty_name)
     guard_manager.spawn_guards()
     in_game_menu = InGameMenu(screen)
 
 def run_game_loop(screen):
     """Vòng lặp chính xử lý logic khi đang trong màn chơi."""
-    global GAME_STATE, STATS_PANEL_VISIBLE, tiles, GUARDS_VISIBLE
+    global GAME_STATE, STATS_PANEL_VISIBLE, tiles, GUARDS_VISIBLE, REPLAY_MENU_SCROLL
     running = True
     clock = pygame.time.Clock()
     last_edited_tile = None
@@ -496,11 +501,13 @@ def run_game_loop(screen):
                     last_edited_tile = None
             
             if GAME_STATE == REPLAY_SELECT_STATE:
+                if event.type == pygame.MOUSEWHEEL:
+                    REPLAY_MENU_SCROLL -= event.y  # draw_replay_menu tự kẹp giá trị
                 if event.type == pygame.MOUSEBUTTONDOWN:
                     algo_buttons = draw_replay_menu(screen)
                     for algo_name, rect in algo_buttons.items():
                         if rect.collidepoint(event.pos):
-                            setup_new_game(current_maze_tiles, SELECTED_DIFFICULTY, algo_name, current_map_index, screen)
+                            setup_new_game(copy_with_landmarks(current_maze_tiles), SELECTED_DIFFICULTY, algo_name, current_map_index, screen)
                             GAME_STATE = "GAME"
                             break
                 continue
@@ -553,9 +560,9 @@ def run_game_loop(screen):
                     else:
                         mx, my = pygame.mouse.get_pos()
                         tile_x, tile_y = mx // config.CELL_SIZE, my // config.CELL_SIZE
-                        if 0 <= tile_y < len(tiles) and 0 <= tile_x < len(tiles[0]):
+                        if tiles.in_bounds(tile_x, tile_y):
                             if (tile_x, tile_y) not in [(1,1), (EXIT_TILE_X, EXIT_TILE_Y), (EXIT_TILE_X, EXIT_TILE_Y + 1)]:
-                                tiles[tile_y][tile_x] = 1 - tiles[tile_y][tile_x]
+                                tiles.toggle_wall(tile_x, tile_y)
                                 invalidate_all_ai_paths()
                                 update_path_validity()
                                 last_edited_tile = (tile_x, tile_y)
@@ -577,15 +584,19 @@ def run_game_loop(screen):
                 tile_x, tile_y = mx // config.CELL_SIZE, my // config.CELL_SIZE
                 current_tile = (tile_x, tile_y)
                 if current_tile != last_edited_tile:
-                    if 0 <= tile_y < len(tiles) and 0 <= tile_x < len(tiles[0]):
+                    if tiles.in_bounds(tile_x, tile_y):
                         if current_tile not in [(1,1), (EXIT_TILE_X, EXIT_TILE_Y), (EXIT_TILE_X, EXIT_TILE_Y + 1)]:
-                            tiles[tile_y][tile_x] = 1 - tiles[tile_y][tile_x]
+                            tiles.toggle_wall(tile_x, tile_y)
                             invalidate_all_ai_paths()
                             update_path_validity()
                             last_edited_tile = current_tile
 
         # --- CẬP NHẬT LOGIC GAME ---
         if GAME_STATE == "GAME":
+            # Các tìm kiếm dài chạy tiếp trong ngân sách của khung hình này
+            SEARCH_SCHEDULER.run()
+            # Giao các đường đi mà worker của PathService đã tìm xong
+            PATH_SERVICE.poll()
             guard_list = guard_manager.guards if GUARDS_VISIBLE else []
             if player.ai_mode:
                 player.handle_ai_move(tiles, (EXIT_TILE_X, EXIT_TILE_Y + 1), guard_list)
@@ -652,11 +663,23 @@ def main():
     pygame.init()
     pygame.key.set_repeat(100, 50)
     
-    # Tạo mê cung ban đầu để xác định kích thước màn hình
-    grid = generate_maze(config.MAZE_COLS, config.MAZE_ROWS)
-    initial_tiles = maze_to_tiles(grid, config.MAZE_COLS, config.MAZE_ROWS)
-    screen_w = len(initial_tiles[0]) * config.CELL_SIZE
-    screen_h = len(initial_tiles) * config.CELL_SIZE
+    # Bắt đầu sinh mê cung ở nền ngay từ lúc mở menu
+    maze_pool = MazePool(depth=config.MAZE_POOL_DEPTH,
+                         use_processes=config.MAZE_POOL_PROCESSES,
+                         spill_dir=config.MAZE_SPILL_DIR,
+                         terrain_prob=config.TERRAIN_PROB,
+                         # Bảng landmark ALT tính sẵn ở worker, gắn vào mê cung trước khi giao ra
+                         build_layers=partial(landmark_layers, count=config.ALT_LANDMARKS)
+                         if config.ALT_PRECOMPUTE else None,
+                         attach_layers=attach_landmarks)
+    maze_pool.prefetch(config.MAZE_COLS, config.MAZE_ROWS)
+    PATH_SERVICE.start()
+    if config.SEARCH_INSTRUMENTATION:
+        set_sink(HistogramSink(config.INSTRUMENTATION_WINDOW, config.INSTRUMENTATION_TRACE_MEMORY))
+
+    # Kích thước màn hình suy ra trực tiếp từ kích thước mê cung
+    screen_w = (config.MAZE_COLS * 2 + 1) * config.CELL_SIZE
+    screen_h = (config.MAZE_ROWS * 2 + 1) * config.CELL_SIZE
     screen = pygame.display.set_mode((screen_w, screen_h))
     pygame.display.set_caption("Maze Escape")
     
@@ -676,11 +699,11 @@ def main():
                 action, difficulty, algorithm, map_idx = menu.handle_input(event)
                 if action == "PLAY":
                     replay_stats_history.clear()
-                    new_grid = generate_maze(config.MAZE_COLS, config.MAZE_ROWS)
-                    new_tiles = maze_to_tiles(new_grid, config.MAZE_COLS, config.MAZE_ROWS)
-                    if (EXIT_TILE_Y + 1) < len(new_tiles):
-                        new_tiles[EXIT_TILE_Y + 1][EXIT_TILE_X] = 0
-                    current_maze_tiles = [row[:] for row in new_tiles]
+                    new_tiles, _ = maze_pool.take(config.MAZE_COLS, config.MAZE_ROWS)
+                    if (EXIT_TILE_Y + 1) < new_tiles.height:
+                        new_tiles.set_tile(EXIT_TILE_X, EXIT_TILE_Y + 1, 0)
+                    # Bản gốc để chơi lại (replay); giữ cả bảng landmark pool đã gắn
+                    current_maze_tiles = copy_with_landmarks(new_tiles)
                     setup_new_game(new_tiles, difficulty, algorithm, map_idx, screen)
                     GAME_STATE = "GAME"
                 elif action == "QUIT":
@@ -698,6 +721,10 @@ def main():
         
         pygame.display.flip()
         
+    maze_pool.shutdown()
+    PATH_SERVICE.shutdown()
+    if get_sink() is not None:
+        print("\n".join(get_sink().report_lines()))
     pygame.quit()
 
 if __name__ == "__main__":
@@ -1,10 +1,32 @@
 # -*- coding: utf-8 -*-
 import random
+from array import array
+import numpy as np
 from .grid import Cell
+from .tilemap import TileMap, FLOOR, MUD, WATER
 
+# Bit tường của mỗi ô trong chế độ packed (bit bật = còn tường)
+WALL_N, WALL_S, WALL_E, WALL_W = 1, 2, 4, 8
+ALL_WALLS = WALL_N | WALL_S | WALL_E | WALL_W
+
+
+def _get_rng(seed):
+    """seed=None -> dùng module random toàn cục như trước"""
+    return random if seed is None else random.Random(seed)
+
+
+def generate_maze(cols, rows, extra_prob=0.15, seed=None, packed=False, algorithm="dfs"):
+    """Sinh mê cung bằng DFS backtracker (hoặc thuật toán trong MAZE_GENERATORS)
+       + thêm đường phụ.
+
+    packed=True trả về mảng uint8 (rows, cols) chứa bitmask tường thay cho
+    lưới Cell; với cùng seed hai chế độ cho ra cùng một mê cung.
+    """
+    rng = _get_rng(seed)
+    if packed or algorithm != "dfs":
+        walls = MAZE_GENERATORS[algorithm](cols, rows, extra_prob, rng)
+        return walls if packed else walls_to_cells(walls)
 
-def generate_maze(cols, rows, extra_prob=0.15):
-    """Sinh mê cung bằng DFS backtracker + thêm đường phụ"""
     grid = [[Cell(x, y) for x in range(cols)] for y in range(rows)]
     stack = []
 
@@ -16,7 +38,7 @@ def generate_maze(cols, rows, extra_prob=0.15):
         current = stack[-1]
         neighbors = get_unvisited_neighbors(current, grid, cols, rows)
         if neighbors:
-            nxt = random.choice(neighbors)
+            nxt = rng.choice(neighbors)
             remove_wall(current, nxt)
             nxt.visited = True
             stack.append(nxt)
@@ -24,11 +46,195 @@ def generate_maze(cols, rows, extra_prob=0.15):
             stack.pop()
 
     # 🔧 Đục thêm một số tường để tạo nhiều lối đi
-    add_extra_passages(grid, cols, rows, extra_prob)
+    add_extra_passages(grid, cols, rows, extra_prob, rng)
 
     return grid
 
 
+def _generate_maze_packed(cols, rows, extra_prob, rng):
+    """DFS backtracker trên mảng phẳng: mỗi ô chỉ tốn 1 byte tường + 1 byte visited.
+       Thứ tự xét hàng xóm (N, S, E, W) giống hệt bản dùng Cell."""
+    walls = bytearray([ALL_WALLS]) * (cols * rows)
+    visited = bytearray(cols * rows)
+    visited[0] = 1
+    stack = [0]
+
+    while stack:
+        i = stack[-1]
+        y, x = divmod(i, cols)
+        neighbors = []
+        if y > 0 and not visited[i - cols]:
+            neighbors.append(i - cols)  # North
+        if y < rows - 1 and not visited[i + cols]:
+            neighbors.append(i + cols)  # South
+        if x < cols - 1 and not visited[i + 1]:
+            neighbors.append(i + 1)     # East
+        if x > 0 and not visited[i - 1]:
+            neighbors.append(i - 1)     # West
+        if neighbors:
+            j = rng.choice(neighbors)
+            _remove_wall_packed(walls, cols, i, j)
+            visited[j] = 1
+            stack.append(j)
+        else:
+            stack.pop()
+
+    add_extra_passages_packed(walls, cols, rows, extra_prob, rng)
+    return np.frombuffer(walls, dtype=np.uint8).reshape(rows, cols).copy()
+
+
+def _generate_maze_kruskal(cols, rows, extra_prob, rng):
+    """Kruskal ngẫu nhiên trên union-find dạng mảng (không cần stack DFS)"""
+    n = cols * rows
+    walls = bytearray([ALL_WALLS]) * n
+    parent = array("i", range(n))
+    rank = bytearray(n)
+
+    # Cạnh 0..n_h-1: tường E giữa (x, y) và (x+1, y); còn lại: tường S
+    n_h = rows * (cols - 1)
+    n_edges = n_h + (rows - 1) * cols
+    np_rng = np.random.default_rng(rng.getrandbits(64))
+    joined = 0
+    for e in np_rng.permutation(n_edges).tolist():
+        if joined == n - 1:
+            break
+        if e < n_h:
+            y, x = divmod(e, cols - 1)
+            i = y * cols + x
+            j = i + 1
+        else:
+            i = e - n_h
+            j = i + cols
+
+        # find (nén đường đi kiểu halving)
+        ri = i
+        while parent[ri] != ri:
+            parent[ri] = parent[parent[ri]]
+            ri = parent[ri]
+        rj = j
+        while parent[rj] != rj:
+            parent[rj] = parent[parent[rj]]
+            rj = parent[rj]
+        if ri == rj:
+            continue
+
+        # union theo rank
+        if rank[ri] < rank[rj]:
+            ri, rj = rj, ri
+        parent[rj] = ri
+        if rank[ri] == rank[rj]:
+            rank[ri] += 1
+        _remove_wall_packed(walls, cols, i, j)
+        joined += 1
+
+    add_extra_passages_packed(walls, cols, rows, extra_prob, rng)
+    return np.frombuffer(walls, dtype=np.uint8).reshape(rows, cols).copy()
+
+
+def eller_rows(cols, rows, extra_prob=0.15, seed=None):
+    """Thuật toán Eller dạng generator: yield từng hàng bitmask tường (uint8, dài cols).
+
+    Bộ nhớ làm việc chỉ O(cols) nên sinh được mê cung rất cao; có thể đưa
+    thẳng vào iter_tile_rows hoặc serializer mà không cần giữ cả lưới.
+    """
+    return _eller_rows(cols, rows, extra_prob, _get_rng(seed))
+
+
+def _eller_rows(cols, rows, extra_prob, rng):
+    sets = [0] * cols      # 0 = ô chưa thuộc tập nào
+    next_set = 1
+    prev = None            # hàng trước, giữ lại vì đường phụ có thể đục tường S của nó
+    pending_north = bytearray(cols)
+
+    for y in range(rows):
+        row = bytearray([ALL_WALLS]) * cols
+        last = y == rows - 1
+
+        # 1. Gán tập mới cho ô mới; ô được nối từ hàng trên thì mở tường N
+        members = {}
+        for x in range(cols):
+            if sets[x] == 0:
+                sets[x] = next_set
+                next_set += 1
+            else:
+                row[x] &= ~WALL_N
+            if pending_north[x]:
+                row[x] &= ~WALL_N
+            members.setdefault(sets[x], []).append(x)
+
+        # 2. Nối ngang ngẫu nhiên các ô khác tập (hàng cuối: nối hết)
+        for x in range(cols - 1):
+            a, b = sets[x], sets[x + 1]
+            if a != b and (last or rng.random() < 0.5):
+                row[x] &= ~WALL_E
+                row[x + 1] &= ~WALL_W
+                if len(members[a]) < len(members[b]):
+                    a, b = b, a
+                for i in members[b]:
+                    sets[i] = a
+                members[a].extend(members.pop(b))
+
+        # 3. Mỗi tập đi xuống ít nhất một ô
+        if not last:
+            below = [0] * cols
+            for set_id, xs in members.items():
+                drops = [x for x in xs if rng.random() < 0.5]
+                if not drops:
+                    drops = [rng.choice(xs)]
+                for x in drops:
+                    row[x] &= ~WALL_S
+                    below[x] = set_id
+            sets = below
+
+        # 4. Đục thêm đường phụ (cùng quy tắc với add_extra_passages)
+        pending_north = bytearray(cols)
+        for x in range(cols):
+            if rng.random() < extra_prob:
+                neighbors = []
+                if y > 0:
+                    neighbors.append("N")
+                if not last:
+                    neighbors.append("S")
+                if x > 0:
+                    neighbors.append("W")
+                if x < cols - 1:
+                    neighbors.append("E")
+
+                if neighbors:
+                    side = rng.choice(neighbors)
+                    if side == "N":
+                        row[x] &= ~WALL_N
+                        prev[x] &= ~WALL_S
+                    elif side == "S":
+                        row[x] &= ~WALL_S
+                        pending_north[x] = 1
+                    elif side == "W":
+                        row[x] &= ~WALL_W
+                        row[x - 1] &= ~WALL_E
+                    else:
+                        row[x] &= ~WALL_E
+                        row[x + 1] &= ~WALL_W
+
+        if prev is not None:
+            yield np.frombuffer(prev, dtype=np.uint8).copy()
+        prev = row
+
+    if prev is not None:
+        yield np.frombuffer(prev, dtype=np.uint8).copy()
+
+
+def _generate_maze_eller(cols, rows, extra_prob, rng):
+    return np.vstack(list(_eller_rows(cols, rows, extra_prob, rng)))
+
+
+# --- DICTIONARY CÁC THUẬT TOÁN SINH MÊ CUNG (chế độ packed) ---
+MAZE_GENERATORS = {
+    "dfs": _generate_maze_packed,
+    "kruskal": _generate_maze_kruskal,
+    "eller": _generate_maze_eller,
+}
+
+
 def get_unvisited_neighbors(cell, grid, cols, rows):
     neighbors = []
     x, y = cell.x, cell.y
@@ -61,12 +267,28 @@ def remove_wall(c1, c2):
         c2.walls["S"] = False
 
 
-def add_extra_passages(grid, cols, rows, extra_prob=0.15):
+def _remove_wall_packed(walls, cols, i, j):
+    """remove_wall cho mảng bitmask phẳng (i, j là chỉ số ô kề nhau)"""
+    if j == i + 1:
+        walls[i] &= ~WALL_E
+        walls[j] &= ~WALL_W
+    elif j == i - 1:
+        walls[i] &= ~WALL_W
+        walls[j] &= ~WALL_E
+    elif j == i + cols:
+        walls[i] &= ~WALL_S
+        walls[j] &= ~WALL_N
+    else:
+        walls[i] &= ~WALL_N
+        walls[j] &= ~WALL_S
+
+
+def add_extra_passages(grid, cols, rows, extra_prob=0.15, rng=random):
     """Đục thêm ngẫu nhiên một số tường để tạo nhiều đường đi"""
     for y in range(rows):
         for x in range(cols):
             cell = grid[y][x]
-            if random.random() < extra_prob:  # xác suất đục thêm
+            if rng.random() < extra_prob:  # xác suất đục thêm
                 neighbors = []
                 if y > 0:
                     neighbors.append(grid[y - 1][x])
@@ -78,62 +300,206 @@ def add_extra_passages(grid, cols, rows, extra_prob=0.15):
                     neighbors.append(grid[y][x + 1])
 
                 if neighbors:
-                    nxt = random.choice(neighbors)
+                    nxt = rng.choice(neighbors)
                     remove_wall(cell, nxt)
 
 
-def maze_to_tiles(grid, cols, rows, wide_prob=0.1):
-    """Chuyển mê cung sang ma trận tiles (0 = đường, 1 = tường),
-       với một số đoạn hành lang rộng 2 ô"""
-    h = rows * 2 + 1
-    w = cols * 2 + 1
-    tiles = [[1 for _ in range(w)] for _ in range(h)]
-
+def add_extra_passages_packed(walls, cols, rows, extra_prob=0.15, rng=random):
+    """add_extra_passages cho mảng bitmask phẳng (cùng thứ tự rút số ngẫu nhiên)"""
     for y in range(rows):
         for x in range(cols):
+            if rng.random() < extra_prob:
+                i = y * cols + x
+                neighbors = []
+                if y > 0:
+                    neighbors.append(i - cols)
+                if y < rows - 1:
+                    neighbors.append(i + cols)
+                if x > 0:
+                    neighbors.append(i - 1)
+                if x < cols - 1:
+                    neighbors.append(i + 1)
+
+                if neighbors:
+                    _remove_wall_packed(walls, cols, i, rng.choice(neighbors))
+
+
+def cells_to_walls(grid):
+    """Chuyển lưới Cell sang mảng bitmask tường (rows, cols)"""
+    bits = {"N": WALL_N, "S": WALL_S, "E": WALL_E, "W": WALL_W}
+    return np.array([
+        [sum(bit for side, bit in bits.items() if cell.walls[side]) for cell in row]
+        for row in grid
+    ], dtype=np.uint8)
+
+
+def walls_to_cells(walls):
+    """Chuyển mảng bitmask tường về lưới Cell"""
+    rows, cols = walls.shape
+    grid = [[Cell(x, y) for x in range(cols)] for y in range(rows)]
+    for y, row in enumerate(walls.tolist()):
+        for x, bits in enumerate(row):
             cell = grid[y][x]
-            cx, cy = x * 2 + 1, y * 2 + 1
-
-            # Tâm ô -> đường
-            tiles[cy][cx] = 0  
-
-            # Kiểm tra tường mở và tạo đường (chỉ vẽ nếu trong khung an toàn)
-            if not cell.walls["N"] and cy - 1 > 0:
-                tiles[cy - 1][cx] = 0
-            if not cell.walls["S"] and cy + 1 < h - 1:
-                tiles[cy + 1][cx] = 0
-            if not cell.walls["W"] and cx - 1 > 0:
-                tiles[cy][cx - 1] = 0
-            if not cell.walls["E"] and cx + 1 < w - 1:
-                tiles[cy][cx + 1] = 0
-
-    # 🔒 Ép viền ngoài = tường
-    for x in range(w):
-        tiles[0][x] = 1
-        tiles[h - 1][x] = 1
-    for y in range(h):
-        tiles[y][0] = 1
-        tiles[y][w - 1] = 1
-
-    # 🟢 Mở rộng ngẫu nhiên hành lang
-    for y in range(1, h-1):
-        for x in range(1, w-1):
-            if tiles[y][x] == 0 and random.random() < wide_prob:
-                # Chọn ngẫu nhiên 1 hướng để mở rộng
-                direction = random.choice([(0,1),(0,-1),(1,0),(-1,0)])
-                nx, ny = x + direction[0], y + direction[1]
-                if 0 <= nx < w and 0 <= ny < h:
-                    tiles[ny][nx] = 0  # mở rộng thêm 1 ô bên cạnh
-
-    tiles[0][1] = 0
-    tiles[1][1] = 0
+            cell.walls = {"N": bool(bits & WALL_N), "S": bool(bits & WALL_S),
+                          "E": bool(bits & WALL_E), "W": bool(bits & WALL_W)}
+            cell.visited = True
+    return grid
+
+
+# Hướng mở rộng hành lang (dx, dy), đúng thứ tự random.choice của vòng lặp cũ
+_WIDEN_DIRECTIONS = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+
+
+def _draw_widening(row, wide_prob, rng):
+    """Rút số ngẫu nhiên mở rộng hành lang cho một hàng bên trong, đúng thứ tự
+       của vòng lặp cũ: mỗi ô đường (từ trái sang phải) rút random(), ô được
+       chọn rút thêm random.choice() hướng.
+
+    row là mảng tiles của hàng, đã gồm các ô do hàng trên mở xuống. Ô tường
+    vừa được mở sang phải là ô kế tiếp vòng lặp cũ duyệt tới, nên được xét
+    ngay. Trả về (xs, dys): các ô cần mở là (xs[i], y + dys[i]).
+    """
+    rnd, choice = rng.random, rng.choice
+    last = row.shape[0] - 2
+    xs, dys = [], []
+    for x in (np.flatnonzero(row[1:last + 1] == FLOOR) + 1).tolist():
+        while rnd() < wide_prob:
+            dx, dy = choice(_WIDEN_DIRECTIONS)
+            xs.append(x + dx)
+            dys.append(dy)
+            if dx != 1 or x == last or row[x + 1] == FLOOR:
+                break
+            x += 1  # Ô tường bên phải vừa mở: tới lượt nó rút số
+    return xs, dys
+
+
+def maze_to_tiles(grid, cols, rows, wide_prob=0.1, seed=None, terrain_prob=0.0):
+    """Chuyển mê cung sang TileMap (0 = đường, 1 = tường),
+       với một số đoạn hành lang rộng 2 ô.
+
+    grid có thể là lưới Cell hoặc mảng bitmask từ generate_maze(packed=True).
+    Toàn bộ việc đục tường và mở rộng hành lang được làm bằng slicing NumPy.
+    terrain_prob > 0: rải thêm địa hình MUD/WATER lên các ô đường (xem place_terrain).
+
+    Với cùng seed (hoặc cùng trạng thái module random khi seed=None) đầu ra
+    giống hệt vòng lặp cũ: số ngẫu nhiên mở rộng được rút theo đúng thứ tự cũ
+    (_draw_widening), chỉ việc ghi các ô mở rộng là vector hoá theo từng hàng.
+    """
+    walls = grid if isinstance(grid, np.ndarray) else cells_to_walls(grid)
+    rng = _get_rng(seed)
+    h = rows * 2 + 1
+    w = cols * 2 + 1
+    tiles = np.ones((h, w), dtype=np.uint8)
+
+    # Tâm ô -> đường
+    tiles[1:h - 1:2, 1:w - 1:2] = 0
+
+    # Tường N/S giữa hai hàng ô, tường W/E giữa hai cột ô
+    # (chỉ các cạnh bên trong; viền ngoài luôn là tường)
+    open_ns = ((walls[:-1, :] & WALL_S) == 0) | ((walls[1:, :] & WALL_N) == 0)
+    tiles[2:h - 1:2, 1:w - 1:2][open_ns] = 0
+    open_we = ((walls[:, :-1] & WALL_E) == 0) | ((walls[:, 1:] & WALL_W) == 0)
+    tiles[1:h - 1:2, 2:w - 1:2][open_we] = 0
+
+    # 🟢 Mở rộng ngẫu nhiên hành lang: mỗi ô được chọn mở thêm 1 ô kề theo
+    #    hướng ngẫu nhiên; ghi từng hàng một để hàng sau thấy ô được mở xuống
+    for y in range(1, h - 1):
+        xs, dys = _draw_widening(tiles[y], wide_prob, rng)
+        if xs:
+            tiles[np.add(dys, y), xs] = 0
+
+    tiles[0, 1] = 0
+    tiles[1, 1] = 0
     exit_x = cols * 2 - 2
     exit_y = rows * 2 - 1
     
     if exit_y < h and exit_x < w:
-        tiles[exit_y][exit_x] = 0
+        tiles[exit_y, exit_x] = 0
     if (exit_y + 1) < h and exit_x < w:
-        tiles[exit_y + 1][exit_x] = 0
+        tiles[exit_y + 1, exit_x] = 0
 
+    if terrain_prob > 0:
+        place_terrain(tiles, terrain_prob, rng.getrandbits(64))
+
+    return TileMap(tiles)
+
+
+def place_terrain(tiles, terrain_prob, seed=None):
+    """Đổi ngẫu nhiên các ô đường thành MUD/WATER (tại chỗ, trên mảng uint8).
+
+    Ô xuất phát (1, 1), lối vào (1, 0) và hai ô lối ra luôn giữ là đường.
+    Chi phí đi qua từng loại nằm trong config.TERRAIN_COSTS.
+    """
+    h, w = tiles.shape
+    np_rng = np.random.default_rng(seed)
+    u = np_rng.random((h, w), dtype=np.float32)
+    chosen = (tiles == FLOOR) & (u < terrain_prob)
+    # Giữ lối vào/ra và ô xuất phát đi được với chi phí 1
+    for x, y in ((1, 0), (1, 1), (w - 3, h - 2), (w - 3, h - 1)):
+        if 0 <= x < w and 0 <= y < h:
+            chosen[y, x] = False
+    # Nửa dưới của khoảng xác suất -> MUD, nửa trên -> WATER (không cần thêm lần rút)
+    tiles[chosen] = np.where(u[chosen] < terrain_prob / 2, MUD, WATER)
     return tiles
 
+
+def iter_tile_rows(wall_rows, cols, rows, wide_prob=0.1, seed=None):
+    """Phiên bản streaming của maze_to_tiles: nhận từng hàng bitmask tường
+       (ví dụ từ eller_rows) và yield từng hàng tiles uint8 dài cols*2+1.
+
+    Chỉ giữ vài hàng trong bộ nhớ; với cùng seed kết quả ghép lại giống hệt
+    maze_to_tiles trên cả mảng tường.
+    """
+    rng = _get_rng(seed)
+    h = rows * 2 + 1
+    w = cols * 2 + 1
+    exit_x = cols * 2 - 2
+    exit_y = rows * 2 - 1
+
+    def raw_rows():
+        yield np.ones(w, dtype=np.uint8)  # viền trên
+        prev = None
+        for wall_row in wall_rows:
+            wall_row = np.asarray(wall_row, dtype=np.uint8)
+            if prev is not None:
+                yield _center_tile_row(prev, w)
+                between = np.ones(w, dtype=np.uint8)
+                between[1:w - 1:2][((prev & WALL_S) == 0) | ((wall_row & WALL_N) == 0)] = 0
+                yield between
+            prev = wall_row
+        yield _center_tile_row(prev, w)
+        yield np.ones(w, dtype=np.uint8)  # viền dưới
+
+    def finish(t, row):
+        if t <= 1:
+            row[1] = 0
+        if t in (exit_y, exit_y + 1) and exit_x < w:
+            row[exit_x] = 0
+        return row
+
+    source = raw_rows()
+    above = next(source)
+    cur = next(source)
+    for t in range(1, h - 1):
+        below = next(source)
+        xs, dys = _draw_widening(cur, wide_prob, rng)
+        if xs:
+            xs, dys = np.array(xs), np.array(dys)
+            above[xs[dys == -1]] = 0
+            cur[xs[dys == 0]] = 0
+            below[xs[dys == 1]] = 0
+
+        yield finish(t - 1, above)
+        above, cur = cur, below
+
+    yield finish(h - 2, above)
+    yield finish(h - 1, cur)
+
+
+def _center_tile_row(wall_row, w):
+    """Hàng tiles đi qua tâm các ô: tâm luôn mở, mở thêm tường E/W đã bị đục"""
+    row = np.ones(w, dtype=np.uint8)
+    row[1:w - 1:2] = 0
+    open_we = ((wall_row[:-1] & WALL_E) == 0) | ((wall_row[1:] & WALL_W) == 0)
+    row[2:w - 1:2][open_we] = 0
+    return row
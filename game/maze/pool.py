@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+# game/maze/pool.py
+# Dịch vụ cung cấp mê cung: sinh sẵn ở nền để bấm START là có map ngay
+import glob
+import os
+import random
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from .generator import generate_maze, maze_to_tiles
+from .serializers import load_maze, save_maze
+from .tilemap import TileMap
+
+
+def build_maze_tiles(cols, rows, seed, algorithm="dfs", terrain_prob=0.0):
+    """Sinh trọn một mê cung và trả về mảng tiles (hàm top-level để chạy được trong process pool)"""
+    walls = generate_maze(cols, rows, seed=seed, packed=True, algorithm=algorithm)
+    return maze_to_tiles(walls, cols, rows, seed=seed, terrain_prob=terrain_prob).data
+
+
+def build_maze(cols, rows, seed, algorithm="dfs", terrain_prob=0.0, build_layers=None):
+    """Như build_maze_tiles nhưng trả về (tiles, layers); layers = build_layers(TileMap)
+       tính ngay ở worker (ví dụ bảng landmark của game/ai/landmarks.py), {} nếu không có"""
+    data = build_maze_tiles(cols, rows, seed, algorithm, terrain_prob)
+    if build_layers is None:
+        return data, {}
+    return data, build_layers(TileMap(data))
+
+
+class MazePool:
+    """Hàng đợi có giới hạn các mê cung đã sinh sẵn, theo kích thước (cols, rows).
+
+    Worker (thread hoặc process) lấp đầy hàng đợi ở nền; take() lấy ra một
+    mê cung và đặt lịch sinh mê cung thay thế. Nếu có spill_dir, các mê cung
+    chưa dùng được ghi ra đĩa khi shutdown() và nạp lại ở lần chạy sau.
+
+    Layer phụ (bảng tính sẵn theo từng ô) do nơi tạo pool cung cấp, để pool
+    không phụ thuộc vào game.ai:
+    - build_layers(tiles) -> {tên: mảng}: chạy ở worker cùng lúc sinh mê cung
+      (phải là hàm top-level / functools.partial nếu dùng process);
+    - attach_layers(tiles, layers): gắn layer vào TileMap trước khi giao ra.
+    Layer được ghi kèm file spill và nạp lại cùng mê cung.
+    """
+
+    def __init__(self, depth=2, workers=1, use_processes=False, spill_dir=None, algorithm="dfs",
+                 terrain_prob=0.0, build_layers=None, attach_layers=None):
+        self.depth = depth
+        self.algorithm = algorithm
+        self.terrain_prob = terrain_prob
+        self.build_layers = build_layers
+        self.attach_layers = attach_layers
+        self.spill_dir = spill_dir
+        executor_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        self._executor = executor_cls(max_workers=workers)
+        self._ready = {}      # (cols, rows) -> deque[(seed, TileMap, layers)]
+        self._pending = {}    # (cols, rows) -> list[(seed, Future)]
+        self._lock = threading.RLock()  # callback có thể chạy ngay trong prefetch()
+        self._seeds = random.Random()
+        self._closed = False
+        self.failures = 0     # Số lần sinh ở nền thất bại
+
+    # --- Lấp đầy hàng đợi ---
+    def prefetch(self, cols, rows):
+        """Đặt lịch sinh cho đủ `depth` mê cung kích thước (cols, rows)"""
+        key = (cols, rows)
+        with self._lock:
+            if self._closed:
+                return
+            ready = self._ready.setdefault(key, deque())
+            pending = self._pending.setdefault(key, [])
+            if not ready and not pending:
+                self._load_spilled(key, ready)
+            while len(ready) + len(pending) < self.depth:
+                seed = self._seeds.getrandbits(31)
+                future = self._executor.submit(build_maze, cols, rows, seed, self.algorithm,
+                                               self.terrain_prob, self.build_layers)
+                pending.append((seed, future))
+                future.add_done_callback(lambda f, key=key, seed=seed: self._on_done(key, seed, f))
+
+    def _on_done(self, key, seed, future):
+        with self._lock:
+            pending = self._pending.get(key, [])
+            for i, (s, f) in enumerate(pending):
+                if f is future:
+                    del pending[i]
+                    break
+            else:
+                return  # đã được take() lấy trực tiếp
+            if future.cancelled():
+                return
+            try:
+                self._ready[key].append(self._make_item(seed, *future.result()))
+            except Exception as e:
+                self._failed(e, "bỏ qua, take() sẽ sinh bù")
+
+    def _failed(self, error, action):
+        with self._lock:
+            self.failures += 1
+            first = self.failures == 1
+        if first:  # Worker hỏng thường hỏng lặp lại: chỉ in lần đầu, còn lại đếm trong failures
+            print(f"Sinh mê cung ở nền thất bại ({error!r}), {action}")
+
+    def _make_item(self, seed, data, layers):
+        tiles = TileMap(data)
+        if layers and self.attach_layers is not None:
+            self.attach_layers(tiles, layers)
+        return seed, tiles, layers
+
+    # --- Lấy mê cung ---
+    def take(self, cols, rows, seed=None):
+        """Trả về (TileMap, seed). Có seed -> dùng lại nếu đã sinh sẵn, không thì sinh ngay."""
+        key = (cols, rows)
+        item = None
+        future = None
+        with self._lock:
+            ready = self._ready.setdefault(key, deque())
+            pending = self._pending.setdefault(key, [])
+            if seed is None:
+                if ready:
+                    item = ready.popleft()
+                elif pending:
+                    seed, future = pending.pop(0)
+            else:
+                for candidate in ready:
+                    if candidate[0] == seed:
+                        ready.remove(candidate)
+                        item = candidate
+                        break
+        if item is None and future is not None:
+            # Worker đang sinh dở: đợi nó thay vì sinh lại từ đầu
+            try:
+                item = self._make_item(seed, *future.result())
+            except Exception as e:
+                self._failed(e, "sinh lại ngay với seed mới")
+                seed = None
+        if item is None:
+            if seed is None:
+                seed = self._seeds.getrandbits(31)
+            item = self._make_item(seed, *build_maze(cols, rows, seed, self.algorithm, self.terrain_prob,
+                                                     self.build_layers))
+        self.prefetch(cols, rows)
+        seed, tiles, _ = item
+        return tiles, seed
+
+    def ready_count(self, cols, rows):
+        with self._lock:
+            return len(self._ready.get((cols, rows), ()))
+
+    # --- Ghi / nạp đĩa ---
+    def _spill_path(self, key, seed):
+        return os.path.join(self.spill_dir, f"maze_{key[0]}x{key[1]}_{seed}.bin")
+
+    def _load_spilled(self, key, ready):
+        if not self.spill_dir:
+            return
+        pattern = os.path.join(self.spill_dir, f"maze_{key[0]}x{key[1]}_*.bin")
+        for path in sorted(glob.glob(pattern))[:self.depth]:
+            try:
+                tiles, meta = load_maze(path, with_layers=True)
+            except (OSError, ValueError) as e:
+                print(f"Bỏ qua file mê cung hỏng {path}: {e}")
+            else:
+                if meta["layers"] and self.attach_layers is not None:
+                    self.attach_layers(tiles, meta["layers"])
+                ready.append((meta["seed"], tiles, meta["layers"]))
+            os.remove(path)
+
+    def shutdown(self):
+        """Dừng worker; nếu có spill_dir thì ghi các mê cung chưa dùng ra đĩa"""
+        with self._lock:
+            self._closed = True
+            for pending in self._pending.values():
+                for _, future in pending:
+                    future.cancel()
+        self._executor.shutdown(wait=True)
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with self._lock:
+                for key, ready in self._ready.items():
+                    for seed, tiles, layers in ready:
+                        save_maze(self._spill_path(key, seed), tiles, seed=seed, layers=layers or None)
+                    ready.clear()
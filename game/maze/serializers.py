@@ -1 +1,249 @@
-# load/save map nếu cần
\ No newline at end of file
+# -*- coding: utf-8 -*-
+# game/maze/serializers.py
+# load/save map: định dạng nhị phân có phiên bản (đọc bằng mmap) + JSON/text để debug
+import json
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+import numpy as np
+from .tilemap import FLOOR, TileMap, WALL
+
+MAGIC = b"MAZE"
+FORMAT_VERSION = 1
+NO_SEED = -1
+TILE_LAYER = "tiles"
+
+# Header: magic, version, số layer, width, height, seed, theme
+_HEADER = struct.Struct("<4sHHIIq32s")
+# Bảng layer: tên, kiểu dữ liệu ("bits" hoặc dtype numpy như "<u2"), offset, số byte
+_LAYER = struct.Struct("<16s8sQQ")
+_ALIGN = 8
+
+
+class MazeFormatError(ValueError):
+    """File không đúng định dạng mê cung nhị phân"""
+
+
+def _align(n):
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _encode(text, size):
+    raw = (text or "").encode("utf-8")
+    if len(raw) > size:
+        raise ValueError(f"'{text}' dài quá {size} byte")
+    return raw
+
+
+def _decode(raw):
+    return raw.rstrip(b"\0").decode("utf-8")
+
+
+def _pack_tiles(data):
+    """Tiles chỉ gồm tường/đường -> bit-packed theo từng hàng, ngược lại giữ uint8"""
+    if np.all(data <= WALL):
+        return "bits", np.packbits(data.astype(bool), axis=1)
+    return "|u1", np.ascontiguousarray(data, dtype=np.uint8)
+
+
+@contextmanager
+def _atomic_open(path):
+    """Ghi vào file tạm cạnh path rồi mới đổi tên: lỗi giữa chừng (nguồn hàng
+       hỏng, ngoại lệ, hết chỗ) không để lại file .bin dở dang hay làm hỏng file cũ"""
+    tmp_path = os.fspath(path) + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _write(path, width, height, seed, theme, layers):
+    """layers: list (tên, kiểu, mảng numpy) theo đúng thứ tự ghi"""
+    table_end = _HEADER.size + _LAYER.size * len(layers)
+    offset = _align(table_end)
+    entries = []
+    for name, kind, arr in layers:
+        entries.append(_LAYER.pack(_encode(name, 16), _encode(kind, 8), offset, arr.nbytes))
+        offset = _align(offset + arr.nbytes)
+
+    with _atomic_open(path) as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(layers), width, height,
+                             NO_SEED if seed is None else seed, _encode(theme, 32)))
+        for entry in entries:
+            f.write(entry)
+        for _, _, arr in layers:
+            f.write(b"\0" * (_align(f.tell()) - f.tell()))
+            f.write(arr.tobytes())
+
+
+def save_maze(path, tiles, seed=None, theme=None, layers=None):
+    """Ghi TileMap (+ các layer chi phí tuỳ chọn, mỗi layer là mảng (height, width))"""
+    data = tiles.data if isinstance(tiles, TileMap) else np.asarray(tiles, dtype=np.uint8)
+    height, width = data.shape
+    kind, packed = _pack_tiles(data)
+    out = [(TILE_LAYER, kind, packed)]
+    for name, arr in (layers or {}).items():
+        arr = np.ascontiguousarray(arr)
+        if arr.shape != (height, width):
+            raise ValueError(f"layer '{name}' phải có kích thước {(height, width)}")
+        out.append((name, arr.dtype.str, arr))
+    _write(path, width, height, seed, theme, out)
+
+
+def save_maze_rows(path, tile_rows, width, height, seed=None, theme=None):
+    """Ghi tiles dạng streaming (ví dụ từ iter_tile_rows) mà không giữ cả bản đồ.
+
+    Layer tiles luôn bit-packed nên chỉ nhận hàng gồm tường/đường; bản đồ có
+    địa hình (bùn, nước...) phải ghi bằng save_maze. Nguồn hàng hỏng giữa chừng
+    (thiếu hàng, sai độ rộng, có địa hình) báo ValueError và không để lại file.
+    """
+    row_bytes = (width + 7) // 8
+    offset = _align(_HEADER.size + _LAYER.size)
+    with _atomic_open(path) as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 1, width, height,
+                             NO_SEED if seed is None else seed, _encode(theme, 32)))
+        f.write(_LAYER.pack(_encode(TILE_LAYER, 16), b"bits", offset, row_bytes * height))
+        f.write(b"\0" * (offset - f.tell()))
+        count = 0
+        for row in tile_rows:
+            row = np.asarray(row)
+            if row.shape != (width,):
+                raise ValueError(f"hàng {count} có {row.size} ô, cần {width}")
+            walls = row == WALL
+            if not (walls | (row == FLOOR)).all():
+                raise ValueError(f"hàng {count} có ô địa hình, không ghi bit-packed được (dùng save_maze)")
+            f.write(np.packbits(walls).tobytes())
+            count += 1
+        if count != height:
+            raise ValueError(f"nhận {count} hàng, cần {height}")
+
+
+class MazeFile:
+    """Mở file mê cung nhị phân bằng mmap (chỉ đọc).
+
+    Header và bảng layer được đọc ngay; dữ liệu chỉ được chạm tới khi cần,
+    nên file lớn mở tức thì và nhiều process có thể dùng chung trang nhớ.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read_header()
+        except Exception:
+            self._mm.close()
+            raise
+
+    def _read_header(self):
+        if len(self._mm) < _HEADER.size:
+            raise MazeFormatError("file quá ngắn")
+        magic, version, count, width, height, seed, theme = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise MazeFormatError("sai magic, không phải file mê cung")
+        if version != FORMAT_VERSION:
+            raise MazeFormatError(f"không hỗ trợ phiên bản {version}")
+        self.width, self.height = width, height
+        self.seed = None if seed == NO_SEED else seed
+        self.theme = _decode(theme) or None
+        if _HEADER.size + count * _LAYER.size > len(self._mm):
+            raise MazeFormatError(f"bảng {count} layer vượt quá kích thước file")
+        self._layers = {}
+        for i in range(count):
+            name, kind, offset, nbytes = _LAYER.unpack_from(self._mm, _HEADER.size + i * _LAYER.size)
+            if offset + nbytes > len(self._mm):
+                raise MazeFormatError("layer vượt quá kích thước file")
+            self._layers[_decode(name)] = (_decode(kind), offset, nbytes)
+        if TILE_LAYER not in self._layers:
+            raise MazeFormatError("thiếu layer tiles")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def layer_names(self):
+        return [name for name in self._layers if name != TILE_LAYER]
+
+    def _view(self, name):
+        kind, offset, nbytes = self._layers[name]
+        if kind == "bits":
+            row_bytes = (self.width + 7) // 8
+            return np.frombuffer(self._mm, np.uint8, row_bytes * self.height, offset).reshape(self.height, row_bytes)
+        dtype = np.dtype(kind)
+        return np.frombuffer(self._mm, dtype, nbytes // dtype.itemsize, offset).reshape(self.height, self.width)
+
+    def tiles(self):
+        """Giải nén layer tiles thành TileMap (bản sao có thể chỉnh sửa)"""
+        kind = self._layers[TILE_LAYER][0]
+        raw = self._view(TILE_LAYER)
+        if kind == "bits":
+            raw = np.unpackbits(raw, axis=1, count=self.width)
+        return TileMap(raw)
+
+    def layer(self, name):
+        """View chỉ-đọc trực tiếp trên mmap (không copy)"""
+        return self._view(name)
+
+    def meta(self):
+        return {"width": self.width, "height": self.height, "seed": self.seed, "theme": self.theme}
+
+    def close(self):
+        """Đóng mmap; mọi view từ layer() phải được giải phóng trước"""
+        self._mm.close()
+
+
+def load_maze(path, with_layers=False):
+    """Đọc file nhị phân -> (TileMap, meta); with_layers=True thêm dict các layer (đã copy)"""
+    with MazeFile(path) as maze_file:
+        tiles = maze_file.tiles()
+        meta = maze_file.meta()
+        if with_layers:
+            meta["layers"] = {name: np.array(maze_file.layer(name)) for name in maze_file.layer_names}
+    return tiles, meta
+
+
+# --- XUẤT JSON / TEXT ĐỂ DEBUG ---
+_TEXT_CHARS = {0: ".", WALL: "#"}
+
+
+def tiles_to_text(tiles):
+    """Vẽ tiles thành text: '#' = tường, '.' = đường, số = loại địa hình khác"""
+    data = tiles.data if isinstance(tiles, TileMap) else np.asarray(tiles)
+    return "\n".join(
+        "".join(_TEXT_CHARS.get(v, str(v)) for v in row) for row in data.tolist()
+    )
+
+
+def text_to_tiles(text):
+    reverse = {c: v for v, c in _TEXT_CHARS.items()}
+    return TileMap([[reverse[c] if c in reverse else int(c) for c in line]
+                    for line in text.splitlines() if line])
+
+
+def export_json(path, tiles, seed=None, theme=None):
+    tiles = tiles if isinstance(tiles, TileMap) else TileMap(tiles)
+    doc = {
+        "format": "maze-json",
+        "version": FORMAT_VERSION,
+        "width": tiles.width,
+        "height": tiles.height,
+        "seed": seed,
+        "theme": theme,
+        "rows": tiles_to_text(tiles).splitlines(),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, indent=1)
+
+
+def load_json(path):
+    with open(path, encoding="utf-8") as f:
+        doc = json.load(f)
+    tiles = text_to_tiles("\n".join(doc["rows"]))
+    return tiles, {"width": doc["width"], "height": doc["height"], "seed": doc["seed"], "theme": doc["theme"]}
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+# game/maze/tilemap.py
+import itertools
+import weakref
+from collections import deque
+import numpy as np
+
+FLOOR = 0
+WALL = 1
+MUD = 2     # Địa hình chậm (chi phí xem config.TERRAIN_COSTS)
+WATER = 3   # Địa hình rất chậm
+EDIT_LOG_SIZE = 4096  # Số lần sửa gần nhất được ghi lại cho cập nhật tăng dần
+
+_uids = itertools.count()
+
+
+class TileMap:
+    """Ma trận tiles gọn nhẹ (uint8) có bộ đếm phiên bản.
+
+    Mỗi lần một ô bị thay đổi qua set_tile/toggle_wall thì `version` tăng 1,
+    nhờ đó các bộ nhớ đệm (đường đi, đồ thị, trường khoảng cách...) biết
+    khi nào dữ liệu của chúng đã cũ. Worker của PathService đọc thẳng bản đồ
+    trong lúc luồng chính sửa, nên nơi đồng bộ tăng dần phải đọc `version`
+    TRƯỚC changes_since rồi mới ghi nhận version đó.
+    """
+
+    def __init__(self, data):
+        data = np.array(data, dtype=np.uint8)
+        if data.ndim != 2:
+            raise ValueError("TileMap cần mảng 2 chiều (rows x cols)")
+        self._data = data
+        self.height, self.width = data.shape
+        self.version = 0
+        self.uid = next(_uids)
+        self._free_cache = None
+        self._edit_log = deque(maxlen=EDIT_LOG_SIZE)  # (version sau khi sửa, x, y)
+
+    @classmethod
+    def filled(cls, width, height, value=WALL):
+        return cls(np.full((height, width), value, dtype=np.uint8))
+
+    # --- Tương thích với kiểu list-of-lists cũ: tiles[y][x], len(tiles) ---
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, y):
+        row = self._data[y]
+        row.flags.writeable = False  # Mọi thay đổi phải đi qua set_tile
+        return row
+
+    def __iter__(self):
+        for y in range(self.height):
+            yield self[y]
+
+    def __repr__(self):
+        return f"TileMap({self.width}x{self.height}, version={self.version})"
+
+    @property
+    def shape(self):
+        return self._data.shape
+
+    @property
+    def data(self):
+        """View chỉ-đọc của mảng uint8 bên dưới (dùng cho xử lý vector hoá)"""
+        view = self._data.view()
+        view.flags.writeable = False
+        return view
+
+    # --- Truy vấn từng ô ---
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def get(self, x, y):
+        return self._data.item(y, x)
+
+    def is_passable(self, x, y):
+        """Ô (x, y) nằm trong bản đồ và không phải tường"""
+        return 0 <= x < self.width and 0 <= y < self.height and self._data.item(y, x) != WALL
+
+    # --- Chỉnh sửa (tăng version) ---
+    def set_tile(self, x, y, value):
+        if self._data.item(y, x) == value:
+            return False
+        self._data[y, x] = value
+        self._free_cache = None
+        # Ghi nhật ký trước rồi mới tăng version: worker đọc version trước khi gọi
+        # changes_since thì luôn thấy đủ các lần sửa tới version đó
+        self._edit_log.append((self.version + 1, x, y))
+        self.version += 1
+        return True
+
+    def toggle_wall(self, x, y):
+        """Đổi tường <-> đường (dùng cho chế độ Edit)"""
+        return self.set_tile(x, y, FLOOR if self._data.item(y, x) == WALL else WALL)
+
+    def changes_since(self, version):
+        """Danh sách ô (x, y) đã sửa sau `version`, hoặc None nếu nhật ký không
+           còn đủ dữ liệu (khi đó nơi gọi phải dựng lại từ đầu)"""
+        if version == self.version:
+            return []
+        log = list(self._edit_log)  # Chụp một lần: luồng chính có thể đang sửa tiếp
+        if version > self.version or not log or log[0][0] > version + 1:
+            return None
+        return [(x, y) for v, x, y in log if v > version]
+
+    # --- Truy vấn hàng loạt ---
+    def passable_mask(self):
+        return self._data != WALL
+
+    def wall_positions(self):
+        """Mảng (N, 2) các toạ độ (x, y) của tường"""
+        ys, xs = np.nonzero(self._data == WALL)
+        return np.column_stack((xs, ys))
+
+    def free_tiles(self):
+        """Danh sách (x, y) các ô đi được, theo thứ tự hàng (được cache theo version)"""
+        if self._free_cache is None or self._free_cache[0] != self.version:
+            ys, xs = np.nonzero(self.passable_mask())
+            self._free_cache = (self.version, list(zip(xs.tolist(), ys.tolist())))
+        return self._free_cache[1]
+
+    def copy(self):
+        return TileMap(self._data)
+
+    def tolist(self):
+        return self._data.tolist()
+
+
+class TileMapRef:
+    """Thuộc tính `tiles` giữ TileMap bằng weakref.
+
+    Dùng cho các cấu trúc dữ liệu được cache theo chính TileMap của chúng
+    (WeakKeyDictionary): nếu giá trị giữ tham chiếu mạnh tới khoá thì bản đồ
+    không bao giờ được giải phóng. Gán list-of-lists thì chuyển sang TileMap
+    và giữ bình thường, vì ngoài đối tượng này không ai giữ bản đồ đó.
+    """
+
+    def __set_name__(self, owner, name):
+        self._attr = "_" + name + "_ref"
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return obj.__dict__[self._attr]()
+
+    def __set__(self, obj, tiles):
+        if isinstance(tiles, TileMap):
+            obj.__dict__[self._attr] = weakref.ref(tiles)
+        else:
+            tiles = TileMap(tiles)
+            obj.__dict__[self._attr] = lambda: tiles
+
+
+def as_tilemap(tiles):
+    """Nhận TileMap hoặc list-of-lists, luôn trả về TileMap"""
+    if isinstance(tiles, TileMap):
+        return tiles
+    return TileMap(tiles)
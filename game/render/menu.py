@@ -44,6 +44,8 @@ class Menu:
         self.buttons = {}
         self.algo_buttons = {}
         self.map_buttons = {}
+        self.algo_scroll = 0        # Hàng đầu tiên đang hiển thị của cột Algorithm
+        self.algo_visible_rows = len(self.options[1])
 
         self.background_scrollable = self._load_scrolling_background("game/assets/images/background-menu.png")
         self.bg_x = 0
@@ -97,7 +99,20 @@ class Menu:
             y_position = self.height - margin - ((len(members) - 1 - i) * line_height)
             member_rect = member_surf.get_rect(bottomright=(self.width - margin, y_position)); self.screen.blit(member_surf, member_rect)
 
+    def _draw_scroll_arrow(self, cx, y, up):
+        size = 8
+        if up:
+            points = [(cx - size, y), (cx + size, y), (cx, y - size)]
+        else:
+            points = [(cx - size, y), (cx + size, y), (cx, y + size)]
+        pygame.draw.polygon(self.screen, (255, 255, 100), points)
+
     def handle_input(self, event):
+        if event.type == pygame.MOUSEWHEEL:
+            # Cuộn cột Algorithm khi danh sách dài hơn màn hình
+            max_scroll = max(0, len(self.options[1]) - self.algo_visible_rows)
+            self.algo_scroll = min(max(self.algo_scroll - event.y, 0), max_scroll)
+            return None, None, None, None
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
             mouse_pos = event.pos
             if self.buttons.get("PLAY") and self.buttons["PLAY"].collidepoint(mouse_pos): return "PLAY", self.current_difficulty, self.current_algorithm, self.current_map_index
@@ -160,8 +175,14 @@ class Menu:
             title_surf = self.font_button_title.render(title, True, (255, 255, 100))
             self.screen.blit(title_surf, title_surf.get_rect(center=(col_xs[i], start_y_cols)))
 
+        # Số hàng vừa màn hình (chừa chỗ cho banner credit); cột Algorithm cuộn được
+        first_row_y = start_y_cols + title_offset_y
+        self.algo_visible_rows = max(1, int((self.height * 0.9 - first_row_y) // button_spacing))
+        self.algo_scroll = min(self.algo_scroll, max(0, len(self.options[1]) - self.algo_visible_rows))
+        self.algo_buttons = {}
+
         # Vẽ các nút theo từng hàng
-        max_rows = max(len(col) for col in self.options)
+        max_rows = max(len(self.options[0]), len(self.options[2]), min(len(self.options[1]), self.algo_visible_rows))
         for r in range(max_rows):
             y_pos = start_y_cols + title_offset_y + r * button_spacing
             
@@ -175,8 +196,8 @@ class Menu:
                 self.buttons[level] = rect
                 
             # Cột 2: Algorithm
-            if r < len(self.options[1]):
-                algo = self.options[1][r]
+            if r < self.algo_visible_rows and self.algo_scroll + r < len(self.options[1]):
+                algo = self.options[1][self.algo_scroll + r]
                 rect = pygame.Rect(0, 0, button_width, button_height); 
                 rect.center = (col_xs[1], y_pos)
                 is_selected = self.current_algorithm == algo
@@ -192,5 +213,11 @@ class Menu:
                 self._draw_pixel_button(rect, self.options[2][theme_index].replace("_", " ").capitalize(), self.font_medium,
                                       color_sets[2] if is_selected else default_colors, is_selected, rect.collidepoint(mouse_pos))
                 self.map_buttons[theme_index] = rect
+
+        # Mũi tên báo còn thuật toán ở trên/dưới
+        if self.algo_scroll > 0:
+            self._draw_scroll_arrow(col_xs[1], first_row_y - button_height / 2 - 4, up=True)
+        if self.algo_scroll + self.algo_visible_rows < len(self.options[1]):
+            self._draw_scroll_arrow(col_xs[1], first_row_y + (self.algo_visible_rows - 0.5) * button_spacing + 4, up=False)
         
         self._draw_credit_banner()
\ No newline at end of file
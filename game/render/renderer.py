@@ -1,12 +1,36 @@
 # -*- coding: utf-8 -*-
+import numpy as np
 import pygame
 from game import config
+from game.maze.tilemap import as_tilemap, MUD, WATER
+
+# Lớp phủ bán trong suốt cho các ô địa hình (chưa có ảnh riêng)
+TERRAIN_COLORS = {
+    MUD: (125, 85, 40, 150),
+    WATER: (40, 110, 205, 150),
+}
+_terrain_surfaces = {}
+
+
+def _terrain_surface(tile_type):
+    surf = _terrain_surfaces.get(tile_type)
+    if surf is None or surf.get_width() != config.CELL_SIZE:
+        surf = pygame.Surface((config.CELL_SIZE, config.CELL_SIZE), pygame.SRCALPHA)
+        surf.fill(TERRAIN_COLORS[tile_type])
+        _terrain_surfaces[tile_type] = surf
+    return surf
 
 
 def render_maze(screen, tiles, wall_img):
-    for y in range(len(tiles)):
-        for x in range(len(tiles[0])):
-            if tiles[y][x] == 1:  # Tường
-                rect = (x * config.CELL_SIZE, y * config.CELL_SIZE,
-                        config.CELL_SIZE, config.CELL_SIZE)
-                screen.blit(wall_img, rect)
+    tiles = as_tilemap(tiles)
+    # Chỉ duyệt các ô tường và blit cả loạt trong một lần gọi
+    wall_px = tiles.wall_positions() * config.CELL_SIZE
+    screen.blits([(wall_img, (x, y)) for x, y in wall_px.tolist()], False)
+
+    # Địa hình bùn/nước: cũng gom theo loại rồi blit một lần
+    for tile_type in TERRAIN_COLORS:
+        ys, xs = np.nonzero(tiles.data == tile_type)
+        if len(xs):
+            surf = _terrain_surface(tile_type)
+            screen.blits([(surf, (x * config.CELL_SIZE, y * config.CELL_SIZE))
+                          for x, y in zip(xs.tolist(), ys.tolist())], False)
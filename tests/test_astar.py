@@ -0,0 +1,688 @@
+import random
+
+import pytest
+
+from game.ai.astar import astar_path as guard_astar_path
+from game.ai.pathfinding import PATHFINDING_ALGORITHMS, find_path
+from game.maze.generator import generate_maze, maze_to_tiles
+from game.maze.tilemap import WALL, as_tilemap
+
+MAZE = [
+    [1, 1, 1, 1, 1, 1, 1],
+    [1, 0, 0, 0, 1, 0, 1],
+    [1, 0, 1, 0, 1, 0, 1],
+    [1, 0, 1, 0, 0, 0, 1],
+    [1, 1, 1, 1, 1, 1, 1],
+]
+
+
+def _is_valid_path(tiles, path, start, goal):
+    if path[0] != start or path[-1] != goal:
+        return False
+    for (ax, ay), (bx, by) in zip(path, path[1:]):
+        if abs(ax - bx) + abs(ay - by) != 1 or not tiles.is_passable(bx, by):
+            return False
+    return True
+
+
+@pytest.mark.parametrize("name", list(PATHFINDING_ALGORITHMS))
+def test_algorithms_accept_tilemap(name):
+    tiles = as_tilemap(MAZE)
+    random.seed(0)
+    path, stats = find_path(tiles, (1, 1), (5, 1), PATHFINDING_ALGORITHMS[name])
+    if path is None:  # Hill Climbing có thể kẹt ở cực tiểu địa phương
+        assert name == "Hill Climbing"
+        return
+    assert _is_valid_path(tiles, path, (1, 1), (5, 1))
+    assert stats["path_length"] == len(path)
+
+
+def test_optimal_algorithms_on_generated_maze():
+    random.seed(3)
+    tiles = maze_to_tiles(generate_maze(8, 6), 8, 6)
+    goal = (tiles.width - 3, tiles.height - 2)
+    bfs, _ = find_path(tiles, (1, 1), goal, PATHFINDING_ALGORITHMS["Breadth-First (BFS)"])
+    ucs, _ = find_path(tiles, (1, 1), goal, PATHFINDING_ALGORITHMS["Uniform Cost Search (UCS)"])
+    astar, _ = find_path(tiles, (1, 1), goal, PATHFINDING_ALGORITHMS["A* (An toàn)"])
+    assert len(bfs) == len(ucs) == len(astar)
+    assert len(guard_astar_path(tiles, (1, 1), goal)) == len(bfs)
+
+
+def test_grid_graph_is_cached_per_version():
+    from game.ai.graph import get_graph
+    tiles = as_tilemap(MAZE)
+    graph = get_graph(tiles)
+    assert get_graph(tiles) is graph
+    assert graph.coords(graph.node_id((3, 2))) == (3, 2)
+    assert sorted(graph.coords(v) for v in graph.neighbors(graph.node_id((3, 1)))) == [(2, 1), (3, 2)]
+
+    tiles.toggle_wall(4, 1)
+    rebuilt = get_graph(tiles)
+    assert rebuilt is not graph and rebuilt.version == tiles.version
+    path, _ = find_path(tiles, (1, 1), (5, 1), PATHFINDING_ALGORITHMS["Breadth-First (BFS)"])
+    assert len(path) == 5  # đi qua ô vừa mở
+
+
+class _FakeGuard:
+    def __init__(self, x, y, path=()):
+        self.tile_x, self.tile_y = x, y
+        self.path, self.path_index = list(path), 0
+
+
+def test_danger_field_matches_per_guard_rules():
+    from game.ai.danger import DangerField, GUARD_AVOID, PLAYER_DANGER
+    guards = [_FakeGuard(1, 1, [(2, 1)]), _FakeGuard(3, 1)]
+    field = DangerField.for_guards(7, 5, guards, PLAYER_DANGER)
+    for y in range(5):
+        for x in range(7):
+            expected = sum({0: 1000, 1: 50, 2: 20, 3: 5}.get(abs(x - g.tile_x) + abs(y - g.tile_y), 0)
+                           for g in guards)
+            assert field.grid[y, x] == field.cost_at((x, y)) == expected
+    assert DangerField.for_guards(7, 5, guards, PLAYER_DANGER) is field
+    avoid = DangerField.for_guards(7, 5, guards, GUARD_AVOID)
+    assert avoid.cost_at((2, 1)) == 200000 + 50000 + 50000
+    guards[0].tile_x = 2
+    assert DangerField.for_guards(7, 5, guards, PLAYER_DANGER) is not field
+
+
+def test_find_path_uses_versioned_cache():
+    from game.ai.path_cache import PathCache
+    cache = PathCache(maxsize=2)
+    tiles = as_tilemap(MAZE)
+    bfs = PATHFINDING_ALGORITHMS["Breadth-First (BFS)"]
+    path, stats = find_path(tiles, (1, 1), (5, 1), bfs, cache=cache)
+    again, stats2 = find_path(tiles, (1, 1), (5, 1), bfs, cache=cache)
+    assert again == path and stats2["cache_hit"] and not stats["cache_hit"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    tiles.toggle_wall(4, 1)
+    assert cache.invalidate(tiles) == 1
+    shorter, stats3 = find_path(tiles, (1, 1), (5, 1), bfs, cache=cache)
+    assert not stats3["cache_hit"] and len(shorter) < len(path)
+
+    find_path(tiles, (1, 1), (3, 3), bfs, cache=cache)
+    find_path(tiles, (1, 1), (1, 3), bfs, cache=cache)
+    assert len(cache) == 2 and cache.evictions == 1
+
+
+def test_dstar_lite_replans_after_edits():
+    from game.ai.incremental import DStarLite
+    grid = generate_maze(8, 6, seed=3)
+    tiles = maze_to_tiles(grid, 8, 6, seed=3)
+    goal = (tiles.width - 2, tiles.height - 2)
+    planner = DStarLite(tiles, goal)
+    rng = random.Random(0)
+    start = (1, 1)
+    for _ in range(15):
+        path, expanded, _ = planner.plan(start)
+        optimal = PATHFINDING_ALGORITHMS["Breadth-First (BFS)"](tiles, start, goal)[0]
+        assert (path is None) == (optimal is None)
+        if path:
+            assert len(path) == len(optimal) and path[-1] == goal
+            assert all(tiles.is_passable(x, y) for x, y in path[1:])
+            start = path[min(2, len(path) - 1)]
+        x, y = rng.randrange(1, tiles.width - 1), rng.randrange(1, tiles.height - 1)
+        if (x, y) not in (start, goal):
+            tiles.toggle_wall(x, y)
+
+
+def test_dstar_lite_stays_optimal_after_edit_log_overflow():
+    from game.ai.incremental import DStarLite
+    from game.ai.pathfinding import UCS_path
+    from game.maze.tilemap import EDIT_LOG_SIZE
+    for seed in range(30, 42):
+        rng = random.Random(seed)
+        tiles = maze_to_tiles(generate_maze(15, 15, seed=seed), 15, 15, seed=seed, terrain_prob=0.2)
+        goal = (tiles.width - 2, tiles.height - 2)
+        planner = DStarLite(tiles, goal)
+        planner.plan(rng.choice(tiles.free_tiles()))
+        # Tràn nhật ký sửa (số lần chẵn: bản đồ không đổi) + vài sửa thật -> _reset() trong plan()
+        wall = next((x, 1) for x in range(1, tiles.width - 1) if tiles.get(x, 1) == WALL)
+        for _ in range(EDIT_LOG_SIZE + 2):
+            tiles.toggle_wall(*wall)
+        for _ in range(3):
+            tiles.toggle_wall(rng.randrange(1, tiles.width - 1), rng.randrange(1, tiles.height - 1))
+        planner.plan(rng.choice(tiles.free_tiles()))
+        for _ in range(3):
+            start = rng.choice(tiles.free_tiles())
+            path = planner.plan(start)[0]
+            ref = UCS_path(tiles, start, goal)[0]
+            assert (path is None) == (ref is None)
+            if path:
+                cost = lambda p: sum(planner._cost(y * tiles.width + x) for x, y in p[1:])
+                assert cost(path) == cost(ref)
+
+
+def test_dstar_planners_do_not_keep_tilemap_alive():
+    import gc
+    import weakref
+    from game.ai.incremental import _planners, dstar_lite_path
+    tiles = maze_to_tiles(generate_maze(6, 5, seed=1), 6, 5, seed=1)
+    dstar_lite_path(tiles, (1, 1), (tiles.width - 2, tiles.height - 2))
+    ref = weakref.ref(tiles)
+    del tiles
+    gc.collect()
+    assert ref() is None
+    other = maze_to_tiles(generate_maze(6, 5, seed=2), 6, 5, seed=2)
+    dstar_lite_path(other, (1, 1), (other.width - 2, other.height - 2))
+    assert all(planner.tiles is other for planner in _planners.values())
+
+
+def test_jps_matches_ucs_length_with_fewer_expansions():
+    tiles = maze_to_tiles(generate_maze(12, 9, seed=7), 12, 9, wide_prob=0.4, seed=7)
+    free = tiles.free_tiles()
+    jps = PATHFINDING_ALGORITHMS["Jump Point Search (JPS)"]
+    ucs = PATHFINDING_ALGORITHMS["Uniform Cost Search (UCS)"]
+    total_jps = total_ucs = 0
+    for start, goal in zip(free[::7], free[::-5]):
+        path, expanded, _ = jps(tiles, start, goal)
+        ref, ucs_expanded, _ = ucs(tiles, start, goal)
+        assert len(path) == len(ref) and path[0] == start and path[-1] == goal
+        assert all(abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1 for a, b in zip(path, path[1:]))
+        assert guard_astar_path(tiles, start, goal, algorithm_mode="JPS") == path
+        total_jps += expanded
+        total_ucs += ucs_expanded
+    assert total_jps < total_ucs
+
+
+@pytest.mark.parametrize("name", ["Bidirectional BFS", "Bidirectional UCS", "Bidirectional A*"])
+def test_bidirectional_matches_one_directional(name):
+    tiles = maze_to_tiles(generate_maze(12, 9, seed=11), 12, 9, wide_prob=0.4, seed=11)
+    free = tiles.free_tiles()
+    algo = PATHFINDING_ALGORITHMS[name]
+    bfs = PATHFINDING_ALGORITHMS["Breadth-First (BFS)"]
+    for start, goal in zip(free[::9], free[::-4]):
+        path, expanded, generated = algo(tiles, start, goal)
+        ref = bfs(tiles, start, goal)[0]
+        assert len(path) == len(ref) and path[0] == start and path[-1] == goal
+        assert all(abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1 for a, b in zip(path, path[1:]))
+        assert expanded > 0 and generated >= expanded - 1
+
+
+def test_bidirectional_astar_keeps_danger_costs():
+    from game.ai.danger import DangerField, PLAYER_DANGER
+    tiles = as_tilemap(MAZE)
+    guards = [_FakeGuard(3, 2)]
+    field = DangerField.for_guards(tiles.width, tiles.height, guards, PLAYER_DANGER)
+    cost = lambda p: sum(1 + field.cost_at(c) for c in p[1:])
+    one_way = PATHFINDING_ALGORITHMS["A* (An toàn)"](tiles, (1, 1), (5, 3), guards=guards)[0]
+    two_way = PATHFINDING_ALGORITHMS["Bidirectional A*"](tiles, (1, 1), (5, 3), guards=guards)[0]
+    assert cost(two_way) == cost(one_way)
+
+
+def test_hierarchical_paths_follow_edits():
+    from game.ai.hierarchical import HierarchicalGraph
+    tiles = maze_to_tiles(generate_maze(20, 14, seed=5), 20, 14, wide_prob=0.3, seed=5)
+    hpa = HierarchicalGraph(tiles, cluster_size=8)
+    bfs = PATHFINDING_ALGORITHMS["Breadth-First (BFS)"]
+    rng = random.Random(2)
+    for step in range(40):
+        if step % 4 == 0:
+            tiles.toggle_wall(rng.randrange(1, tiles.width - 1), rng.randrange(1, tiles.height - 1))
+        free = tiles.free_tiles()
+        start, goal = rng.choice(free), rng.choice(free)
+        path = hpa.find_path(start, goal)[0]
+        ref = bfs(tiles, start, goal)[0]
+        assert (path is None) == (ref is None)
+        if path:
+            assert _is_valid_path(tiles, path, start, goal) and len(path) >= len(ref)
+    assert hpa.passable == tiles.passable_mask().ravel().tolist()
+
+
+def test_hierarchical_landmark_heuristic_keeps_abstract_costs():
+    from game.ai.hierarchical import HierarchicalGraph
+    from game.ai.landmarks import get_landmarks
+    plain = maze_to_tiles(generate_maze(40, 30, seed=9), 40, 30, wide_prob=0.2, seed=9)
+    guided = plain.copy()
+    get_landmarks(guided)
+    manhattan, alt = HierarchicalGraph(plain, cluster_size=8), HierarchicalGraph(guided, cluster_size=8)
+    rng = random.Random(4)
+    expanded = [0, 0]
+    for step in range(60):
+        if step % 10 == 9:
+            x, y = rng.randrange(1, plain.width - 1), rng.randrange(1, plain.height - 1)
+            plain.toggle_wall(x, y)
+            guided.toggle_wall(x, y)
+        free = plain.free_tiles()
+        start, goal = rng.choice(free), rng.choice(free)
+        a, b = manhattan.find_path(start, goal), alt.find_path(start, goal)
+        assert (a[0] is None) == (b[0] is None)
+        if a[0]:
+            assert _is_valid_path(guided, b[0], start, goal) and len(b[0]) == len(a[0])
+        expanded[0] += a[1]
+        expanded[1] += b[1]
+    assert expanded[1] < expanded[0]
+
+
+def _assert_cache_releases(registry, build):
+    """build(tiles) đăng ký cấu trúc dữ liệu của tiles vào registry; bỏ tiles thì cả hai phải được giải phóng"""
+    import gc
+    import weakref
+    tiles = maze_to_tiles(generate_maze(6, 5, seed=1), 6, 5, seed=1)
+    build(tiles)
+    assert registry
+    ref = weakref.ref(tiles)
+    del tiles
+    gc.collect()
+    assert ref() is None and not registry
+
+
+def test_hierarchy_cache_does_not_keep_tilemap_alive():
+    from game.ai.hierarchical import _hierarchies, get_hierarchy
+    _assert_cache_releases(_hierarchies, lambda tiles: get_hierarchy(tiles).find_path(
+        (1, 1), (tiles.width - 2, tiles.height - 2)))
+
+
+def test_distance_field_descends_shortest_paths():
+    from game.ai.distance_field import DistanceField
+    tiles = maze_to_tiles(generate_maze(10, 8, seed=4), 10, 8, wide_prob=0.3, seed=4)
+    root = (tiles.width - 2, tiles.height - 2)
+    field = DistanceField(tiles, root)
+    bfs = PATHFINDING_ALGORITHMS["Breadth-First (BFS)"]
+    for start in tiles.free_tiles()[::6]:
+        path = field.path_from(start)
+        assert _is_valid_path(tiles, path, start, root)
+        assert len(path) == len(bfs(tiles, start, root)[0]) == field.distance(start) + 1
+    assert not field.is_stale(tiles, root)
+    tiles.toggle_wall(1, 1)
+    assert field.is_stale(tiles, root)
+    limited = DistanceField(tiles, root, max_nodes=5)
+    assert limited.path_from((1, 1)) is None
+
+
+def test_exit_field_tracks_edits_and_guides_astar():
+    from game.ai.exit_field import ExitDistanceField, get_exit_field
+    tiles = maze_to_tiles(generate_maze(10, 8, seed=9), 10, 8, wide_prob=0.3, seed=9)
+    goal = (tiles.width - 2, tiles.height - 2)
+    field = ExitDistanceField(tiles, goal)
+    rng = random.Random(4)
+    for _ in range(30):
+        tiles.toggle_wall(rng.randrange(1, tiles.width - 1), rng.randrange(1, tiles.height - 1))
+        field.sync()
+        assert (field.dist == ExitDistanceField(tiles, goal).dist).all()
+
+    astar = PATHFINDING_ALGORITHMS["A* (An toàn)"]
+    start = next(p for p in tiles.free_tiles() if field.distance(p))
+    plain_path, plain_expanded, _ = astar(tiles.copy(), start, goal)
+    get_exit_field(tiles, goal)
+    path, expanded, _ = astar(tiles, start, goal)
+    assert len(path) == len(plain_path) == field.distance(start) + 1
+    assert field.path_from(start)[-1] == goal and expanded <= plain_expanded
+
+
+def test_exit_field_cache_does_not_keep_tilemap_alive():
+    from game.ai.exit_field import _fields, get_exit_field
+    _assert_cache_releases(_fields, lambda tiles: get_exit_field(tiles, (tiles.width - 2, tiles.height - 2)))
+
+
+def test_connectivity_index_tracks_edits():
+    from game.ai.connectivity import NO_COMPONENT, ConnectivityIndex
+    tiles = maze_to_tiles(generate_maze(10, 8, seed=3), 10, 8, wide_prob=0.3, seed=3)
+    index = ConnectivityIndex(tiles)
+    rng = random.Random(7)
+    for _ in range(60):
+        for _ in range(rng.randint(1, 3)):
+            tiles.toggle_wall(rng.randrange(1, tiles.width - 1), rng.randrange(1, tiles.height - 1))
+        index.sync()
+        fresh = ConnectivityIndex(tiles)
+        # Cùng phân hoạch (nhãn có thể khác tên)
+        pairs = set(zip(index.labels.ravel().tolist(), fresh.labels.ravel().tolist()))
+        assert len(pairs) == len({a for a, _ in pairs}) == len({b for _, b in pairs})
+        assert index.component_count() == fresh.component_count()
+        assert sorted(index.sizes.values()) == sorted(fresh.sizes.values())
+
+    start = next(p for p in tiles.free_tiles())
+    reachable = _reachable(tiles, start)
+    blocked = set(map(tuple, index.unreachable_from(start).tolist()))
+    assert blocked == set(tiles.free_tiles()) - reachable
+    assert index.label((-1, 0)) == NO_COMPONENT and not index.connected((-1, 0), (-1, 0))
+
+
+def _reachable(tiles, start):
+    seen, stack = {start}, [start]
+    while stack:
+        x, y = stack.pop()
+        for n in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if tiles.is_passable(*n) and n not in seen:
+                seen.add(n)
+                stack.append(n)
+    return seen
+
+
+def test_connectivity_cache_does_not_keep_tilemap_alive():
+    from game.ai.connectivity import _indexes, get_connectivity
+    _assert_cache_releases(_indexes, get_connectivity)
+
+
+def test_junction_graph_compresses_corridors_and_follows_edits():
+    from game.ai.junction import JunctionGraph
+    from game.ai.pathfinding import UCS_path
+    tiles = maze_to_tiles(generate_maze(12, 9, seed=5), 12, 9, wide_prob=0.0, terrain_prob=0.1, seed=5)
+    graph = JunctionGraph(tiles)
+    assert graph.node_count() * 4 < len(tiles.free_tiles())
+    rng = random.Random(2)
+
+    def cost(path):
+        return sum(graph.cost[y * tiles.width + x] for x, y in path[1:])
+
+    for _ in range(40):
+        for _ in range(rng.randint(1, 3)):
+            tiles.toggle_wall(rng.randrange(1, tiles.width - 1), rng.randrange(1, tiles.height - 1))
+        start, goal = rng.choice(tiles.free_tiles()), rng.choice(tiles.free_tiles())
+        path, _, _ = graph.find_path(start, goal)
+        expected, _, _ = UCS_path(tiles, start, goal)
+        assert (path is None) == (expected is None)
+        if path:
+            assert _is_valid_path(tiles, path, start, goal) and cost(path) == cost(expected)
+    # Cập nhật tăng dần cho cùng đồ thị như dựng lại (trừ các ô được ghim trên vòng)
+    fresh = JunctionGraph(tiles)
+    assert set(fresh.adj) - set(fresh.pinned) == set(graph.adj) - set(graph.pinned)
+
+
+def test_junction_cache_does_not_keep_tilemap_alive():
+    from game.ai.junction import _junction_graphs, get_junction_graph
+    _assert_cache_releases(_junction_graphs, get_junction_graph)
+
+
+def test_alt_landmarks_stay_admissible_across_edits():
+    from game.ai.landmarks import get_landmarks
+    from game.ai.pathfinding import UCS_path
+    astar, alt = PATHFINDING_ALGORITHMS["A* (An toàn)"], PATHFINDING_ALGORITHMS["A* (ALT Landmarks)"]
+    tiles = maze_to_tiles(generate_maze(16, 10, seed=6), 16, 10, seed=6)
+    table = get_landmarks(tiles)
+    assert len(set(table.landmarks)) == len(table.landmarks) > 1
+    rng = random.Random(1)
+    plain_total = alt_total = 0
+    for i in range(30):
+        if i % 3 == 0:
+            tiles.toggle_wall(rng.randrange(1, tiles.width - 1), rng.randrange(1, tiles.height - 1))
+        start, goal = rng.choice(tiles.free_tiles()), rng.choice(tiles.free_tiles())
+        expected, _, _ = UCS_path(tiles, start, goal)
+        path, expanded, _ = alt(tiles, start, goal)
+        assert (path is None) == (expected is None)
+        if path:
+            assert _is_valid_path(tiles, path, start, goal) and len(path) == len(expected)
+        alt_total += expanded
+        plain_total += astar(tiles, start, goal)[1]
+    assert alt_total < plain_total
+
+
+def test_landmark_cache_does_not_keep_tilemap_alive():
+    from game.ai.landmarks import _tables, get_landmarks
+    _assert_cache_releases(_tables, lambda tiles: get_landmarks(tiles).heuristic((1, 1)))
+
+
+def test_terrain_costs_are_honored():
+    from game.ai.bucket_queue import BucketQueue
+    from game.ai.graph import get_graph
+
+    queue = BucketQueue()
+    for priority, item in [(5, "a"), (1, "b"), (5, "c"), (3, "d")]:
+        queue.push(priority, item)
+    assert [queue.pop() for _ in range(len(queue))] == [(1, "b"), (3, "d"), (5, "c"), (5, "a")]
+
+    tiles = maze_to_tiles(generate_maze(10, 8, seed=2), 10, 8, wide_prob=0.4, seed=2, terrain_prob=0.4)
+    graph = get_graph(tiles)
+    assert not graph.uniform
+    goal = (tiles.width - 3, tiles.height - 2)
+    assert tiles.is_passable(*goal) and tiles.data[1, 1] == 0
+
+    def cost(path):
+        return sum(graph.cost[graph.node_id(p)] for p in path[1:])
+
+    ucs = PATHFINDING_ALGORITHMS["Uniform Cost Search (UCS)"]
+    astar = PATHFINDING_ALGORITHMS["A* (An toàn)"]
+    jps = PATHFINDING_ALGORITHMS["Jump Point Search (JPS)"]
+    bfs = PATHFINDING_ALGORITHMS["Breadth-First (BFS)"]
+    for start in tiles.free_tiles()[::7]:
+        ref = ucs(tiles, start, goal)[0]
+        for algorithm in (astar, jps, guard_astar_path):
+            path = algorithm(tiles, start, goal)
+            path = path[0] if isinstance(path, tuple) else path
+            assert _is_valid_path(tiles, path, start, goal) and cost(path) == cost(ref)
+        assert cost(ref) <= cost(bfs(tiles, start, goal)[0])
+
+
+def test_instrumentation_records_samples_per_caller():
+    from game.ai.instrumentation import HistogramSink, get_sink, run_search, set_sink
+    from game.ai.path_cache import PathCache
+    tiles = maze_to_tiles(generate_maze(10, 8, seed=5), 10, 8, wide_prob=0.4, seed=5)
+    start, goal = (1, 1), (tiles.width - 3, tiles.height - 2)
+    astar = PATHFINDING_ALGORITHMS["A* (An toàn)"]
+    assert get_sink() is None
+    sink = HistogramSink(window=4, trace_memory=True)
+    set_sink(sink)
+    try:
+        for _ in range(6):
+            path, stats = find_path(tiles, start, goal, astar, cache=PathCache())
+        run_search("guard_chase", "A_STAR", guard_astar_path, tiles, start, goal)
+    finally:
+        set_sink(None)
+    assert stats["time_ns"] > 0 and stats["time"] == stats["time_ns"] / 1e9
+    assert sink.keys() == [("A_STAR", "guard_chase"), ("astar_path", "player")]
+    summary = sink.summary()[("astar_path", "player")]
+    assert summary["time_ns"]["count"] == 4  # chỉ giữ cửa sổ gần nhất
+    assert summary["peak_open"]["p50"] > 0 and summary["peak_bytes"]["p50"] > 0
+    assert summary["path_length"]["mean"] == len(path)
+    counts, _ = sink.histogram(("A_STAR", "guard_chase"), "time_ns", bins=3)
+    assert counts.sum() == 1
+
+
+def test_guard_astar_decrease_key_keeps_expansions_and_optimality():
+    from game.ai.graph import get_graph
+    from game.ai.instrumentation import HistogramSink, run_search, set_sink
+    astar, ucs = PATHFINDING_ALGORITHMS["A* (An toàn)"], PATHFINDING_ALGORITHMS["Uniform Cost Search (UCS)"]
+    sink = HistogramSink()
+    set_sink(sink)
+    try:
+        for seed in range(6):
+            tiles = maze_to_tiles(generate_maze(6, 5, seed=seed), 6, 5, wide_prob=0.5, seed=seed, terrain_prob=0.3)
+            goal = (tiles.width - 2, tiles.height - 2)
+            path = run_search("guard_chase", "A_STAR", guard_astar_path, tiles, (1, 1), goal)
+            graph = get_graph(tiles)
+            cost = lambda p: sum(graph.cost[graph.node_id(c)] for c in p[1:])
+            assert _is_valid_path(tiles, path, (1, 1), goal) and cost(path) == cost(ucs(tiles, (1, 1), goal)[0])
+            # Cùng thuật toán với A* của người chơi: mục cũ sau decrease-key bị bỏ qua, không mở rộng lại
+            assert sink.values(("A_STAR", "guard_chase"), "nodes_expanded")[-1] == astar(tiles, (1, 1), goal)[1]
+    finally:
+        set_sink(None)
+    assert sink.values(("A_STAR", "guard_chase"), "reopens").sum() > 0
+
+
+def test_traced_searches_from_threads_do_not_stop_each_other():
+    import threading
+    import time
+    from game.ai.instrumentation import HistogramSink, run_search, set_sink
+
+    def search(tiles, start, goal):
+        buf = bytearray(200_000)
+        time.sleep(0.02)  # Các thread chồng lên nhau nếu không bị xếp hàng
+        return [start, goal] if buf else None
+
+    sink = HistogramSink(window=8, trace_memory=True)
+    set_sink(sink)
+    try:
+        threads = [threading.Thread(target=run_search, args=("guard_patrol", "fake", search, None, (1, 1), (2, 1)))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        set_sink(None)
+    peaks = sink.values(("fake", "guard_patrol"), "peak_bytes")
+    assert peaks.size == 4 and peaks.min() >= 200_000
+
+
+def test_windowed_cooperative_plans_do_not_collide():
+    from game.ai.cooperative import ReservationTable, windowed_astar
+    from game.ai.distance_field import DistanceField
+    from game.ai.graph import get_graph
+    tiles = maze_to_tiles(generate_maze(8, 6, seed=3), 8, 6, wide_prob=0.5, seed=3)
+    graph = get_graph(tiles)
+    free = tiles.free_tiles()
+    rng = random.Random(3)
+    table = ReservationTable()
+    window = 12
+    plans = []
+    for owner in range(5):
+        start, goal = rng.sample(free, 2)
+        field = DistanceField(tiles, goal)
+        ids = windowed_astar(graph, graph.node_id(start), graph.node_id(goal), field.node_distance,
+                             table, owner, window)
+        assert ids[0] == graph.node_id(start)
+        assert all(b == a or b in graph.neighbors(a) for a, b in zip(ids, ids[1:]))
+        if owner == 0:
+            # Bảng trống: đúng là đường ngắn nhất (cắt theo cửa sổ)
+            assert len(ids) == min(field.distance(start), window) + 1
+        table.reserve_path(owner, ids, until=window)
+        plans.append(ids + [ids[-1]] * (window + 1 - len(ids)))
+    for t in range(window + 1):
+        cells = [p[t] for p in plans]
+        assert len(set(cells)) == len(cells)
+        if t:
+            moves = {(p[t - 1], p[t]) for p in plans if p[t - 1] != p[t]}
+            assert not any((b, a) in moves for a, b in moves)
+
+
+def test_spacetime_plan_waits_for_predicted_guard():
+    from game.ai.spacetime import SpaceTimePlanner, predict_guards
+
+    class MovingGuard:
+        size, speed = 32, 32  # một ô mỗi khung hình
+
+        def __init__(self, path):
+            (self.tile_x, self.tile_y), self.path, self.path_index = path[0], path[1:], 0
+
+    # Hành lang ngang y=1; guard đi dọc cột x=3 cắt ngang hành lang
+    tiles = as_tilemap([[1] * 7, [0, 0, 0, 0, 0, 0, 0], [1, 1, 1, 0, 1, 1, 1], [1, 1, 1, 0, 1, 1, 1],
+                        [1, 1, 1, 1, 1, 1, 1]])
+    guard = MovingGuard([(3, 3), (3, 2), (3, 1), (3, 1), (3, 1), (3, 2), (3, 3)])
+    planner = SpaceTimePlanner(horizon=12, player_frames=1)
+    positions = predict_guards([guard], 12, 1, planner._guard_frames)
+    assert positions[0] == [(3, 3)] and positions[2] == [(3, 1)] and positions[12] == [(3, 3)]
+
+    pos, plan = (0, 1), [(0, 1)]
+    while pos != (6, 1) and len(plan) < 20:
+        guard.path_index = min(len(plan) - 1, len(guard.path))
+        guard.tile_x, guard.tile_y = ([(3, 3)] + guard.path)[guard.path_index]
+        pos = planner.next_step(tiles, pos, (6, 1), [guard])
+        plan.append(pos)
+    assert plan[-1] == (6, 1)
+    assert all(abs(a[0] - b[0]) + abs(a[1] - b[1]) <= 1 for a, b in zip(plan, plan[1:]))
+    # Không bao giờ đứng cạnh hay trùng ô với guard ở cùng nhịp
+    for k, p in enumerate(plan):
+        gx, gy = positions[min(k, 12)][0]
+        assert abs(p[0] - gx) + abs(p[1] - gy) > 1
+
+
+def test_resumable_search_matches_astar_across_frames():
+    from game.ai.resumable import FrameScheduler, ResumableSearch
+    tiles = maze_to_tiles(generate_maze(30, 20, seed=6), 30, 20, wide_prob=0.3, seed=6, terrain_prob=0.1)
+    goal = (tiles.width - 3, tiles.height - 2)
+    owners = ["a", "b"]
+    tasks = [ResumableSearch(tiles, (1, 1), goal), ResumableSearch(tiles, (1, 1), goal, use_heuristic=False)]
+    scheduler = FrameScheduler(budget_us=1)  # ngân sách rất nhỏ: buộc phải chạy qua nhiều khung hình
+    for owner, task in zip(owners, tasks):
+        scheduler.submit(owner, task)
+    frames = 0
+    while len(scheduler):
+        partial = tasks[0].partial_path()
+        assert partial[0] == (1, 1) and _is_valid_path(tiles, partial, (1, 1), partial[-1])
+        scheduler.run()
+        frames += 1
+    assert frames > 2 and all(t.done for t in tasks)
+
+    ucs = PATHFINDING_ALGORITHMS["Uniform Cost Search (UCS)"]
+    ref = ucs(tiles, (1, 1), goal)[0]
+    for task in tasks:
+        assert _is_valid_path(tiles, task.path, (1, 1), goal)
+        assert task.stats()["path_length"] == len(task.path) and task.slices > 1
+        assert sum(task.graph.cost[task.graph.node_id(p)] for p in task.path[1:]) == \
+            sum(task.graph.cost[task.graph.node_id(p)] for p in ref[1:])
+    tiles.toggle_wall(1, 2)
+    stale = ResumableSearch(tiles, (1, 1), goal)
+    tiles.toggle_wall(1, 2)
+    assert stale.advance(0) and stale.stale and stale.path_from((1, 1)) is None
+
+
+@pytest.mark.parametrize("mode", ["thread", "process"])
+def test_path_service_coalesces_and_drops_stale_results(mode):
+    import time
+    from game.ai.path_service import PathService
+    astar = PATHFINDING_ALGORITHMS["A* (An toàn)"]
+    tiles = maze_to_tiles(generate_maze(20, 12, seed=8), 20, 12, seed=8)
+    goal = (tiles.width - 3, tiles.height - 2)
+    service = PathService(mode, workers=2)
+    got = []
+
+    def wait(count):
+        deadline = time.monotonic() + 30
+        while (service.stats()["in_flight"] or len(got) < count) and time.monotonic() < deadline:
+            service.poll()
+            time.sleep(0.005)
+
+    try:
+        assert service.request("a", tiles, (1, 1), goal, astar, lambda p, s: got.append(("a", p)))
+        assert not service.request("a", tiles, (1, 1), goal, astar, lambda p, s: got.append(("a", p)))
+        service.request("b", tiles, (1, 1), goal, astar, lambda p, s: got.append(("b", p)))
+        assert service.stats()["submitted"] == 1 and service.stats()["coalesced"] == 1
+        wait(2)
+        assert sorted(owner for owner, _ in got) == ["a", "b"]
+        assert got[0][1] == astar(tiles, (1, 1), goal)[0] and not service.pending("a")
+
+        # Sửa bản đồ trước khi kết quả được giao: kết quả bị bỏ, chủ hết chờ
+        service.request("a", tiles, (1, 1), goal, astar, lambda p, s: got.append(("stale", p)))
+        tiles.toggle_wall(1, 2)
+        tiles.toggle_wall(1, 2)
+        wait(2)
+        assert len(got) == 2 and service.stats()["discarded"] == 1 and not service.pending("a")
+    finally:
+        service.shutdown()
+
+
+def test_path_service_survives_failing_search():
+    import time
+    from game.ai.path_service import PathService
+
+    def broken(tiles, start, goal):
+        raise RuntimeError("boom")
+
+    tiles = maze_to_tiles(generate_maze(6, 5, seed=1), 6, 5, seed=1)
+    service = PathService("thread", workers=1)
+    got = []
+    try:
+        service.request("a", tiles, (1, 1), (3, 3), broken, lambda p, s: got.append((p, s)))
+        deadline = time.monotonic() + 30
+        while not got and time.monotonic() < deadline:
+            service.poll()  # Không được ném lại lỗi của worker
+            time.sleep(0.005)
+        assert got == [(None, None)]
+        assert service.stats()["discarded"] == 1 and not service.pending("a")
+    finally:
+        service.shutdown()
+
+
+def test_path_service_threads_share_incremental_planners():
+    import time
+    from game.ai.path_service import PathService
+    dstar = PATHFINDING_ALGORITHMS["D* Lite (Incremental)"]
+    tiles = maze_to_tiles(generate_maze(20, 12, seed=8), 20, 12, seed=8)
+    start, goal = (1, 1), (tiles.width - 3, tiles.height - 2)
+    dstar(tiles, start, goal)
+    wall = next((x, 1) for x in range(tiles.width - 2, 1, -1) if tiles.is_passable(x, 1))
+    tiles.toggle_wall(*wall)
+    full_replan = dstar(tiles.copy(), start, goal)[1]
+    service = PathService("thread", workers=1)
+    got = []
+    try:
+        service.request("p", tiles, start, goal, dstar, lambda p, s: got.append((p, s)))
+        deadline = time.monotonic() + 30
+        while not got and time.monotonic() < deadline:
+            service.poll()
+            time.sleep(0.005)
+        path, stats = got[0]
+        assert _is_valid_path(tiles, path, start, goal)
+        assert stats["nodes_expanded"] < full_replan
+    finally:
+        service.shutdown()
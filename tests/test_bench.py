@@ -0,0 +1,20 @@
+from game.bench import build_corpus, run_benchmark, summarize, write_reports
+
+
+def test_bench_corpus_round_trip_and_summary(tmp_path):
+    corpus_dir = tmp_path / "corpus"
+    corpus = build_corpus([(6, 4)], 2, seed=1, corpus_dir=str(corpus_dir))
+    assert len(list(corpus_dir.glob("*.bin"))) == 2
+    reloaded = build_corpus([], 0, 0, corpus_dir=str(corpus_dir))
+    assert sorted(c[0] for c in corpus) == [c[0] for c in reloaded]
+
+    algorithms = ["Breadth-First (BFS)", "A* (An toàn)"]
+    runs = run_benchmark(corpus, algorithms, guard_counts=(0, 2), repeats=2, workers=1)
+    assert len(runs) == 2 * 2 * 2 * 2 and all(r["found"] for r in runs)
+    summary = summarize(runs)
+    assert len(summary) == 4
+    bfs = next(r for r in summary if r["algorithm"] == algorithms[0] and r["guards"] == 0)
+    assert bfs["runs"] == 4 and bfs["time_ms_p50"] <= bfs["time_ms_p99"] and bfs["peak_kb_mean"] > 0
+    assert bfs["nodes_generated_mean"] >= bfs["nodes_expanded_mean"]
+    csv_path, json_path = write_reports(str(tmp_path / "out"), summary, runs, {})
+    assert open(csv_path).readline().startswith("algorithm,size,guards")
@@ -0,0 +1,205 @@
+import random
+
+from game.ai.pathfinding import bfs_path
+from game.maze.generator import generate_maze, maze_to_tiles
+from game.maze.tilemap import TileMap, as_tilemap, WALL, FLOOR
+
+
+def test_maze_to_tiles_returns_tilemap():
+    random.seed(1)
+    grid = generate_maze(6, 4)
+    tiles = maze_to_tiles(grid, 6, 4)
+    assert isinstance(tiles, TileMap)
+    assert (tiles.width, tiles.height) == (13, 9)
+    assert tiles.is_passable(1, 1)
+    assert tiles.is_passable(1, 0)  # lối vào
+
+
+def _tile_strings(tiles):
+    return ["".join("#" if v == WALL else "." for v in row) for row in tiles.tolist()]
+
+
+def test_maze_to_tiles_matches_legacy_loop_output():
+    # Bảng dưới sinh bằng maze_to_tiles vòng lặp cũ (trước khi vector hoá): cùng
+    # trạng thái random / cùng seed thì đầu ra phải giữ nguyên từng ô
+    random.seed(3)
+    grid = generate_maze(6, 4)
+    assert _tile_strings(maze_to_tiles(grid, 6, 4, wide_prob=0.3)) == [
+        "#.###########",
+        "#.#.#.......#",
+        "#.#...#.#####",
+        "#.#...#.....#",
+        "#.#######.#.#",
+        "#.....#...#.#",
+        "###...#...#.#",
+        "#...........#",
+        "##########.##",
+    ]
+    random.seed(20)
+    grid = generate_maze(7, 5)
+    legacy = [
+        "#.#.###########",
+        "..#...........#",
+        "#..####..#.##.#",
+        "#.......#...#.#",
+        "#####.....#...#",
+        "#...........#.#",
+        "#..##.#.#.....#",
+        "#.#...#.#.#...#",
+        "#...#...###.###",
+        "..............#",
+        "##########.#.##",
+    ]
+    assert _tile_strings(maze_to_tiles(grid, 7, 5, wide_prob=0.5, seed=11)) == legacy
+    random.seed(11)
+    assert _tile_strings(maze_to_tiles(grid, 7, 5, wide_prob=0.5)) == legacy
+
+
+def test_tilemap_bounds_and_version():
+    tiles = as_tilemap([[1, 1, 1], [1, 0, 1], [1, 1, 1]])
+    assert tiles.is_passable(1, 1)
+    assert not tiles.is_passable(0, 0)
+    assert not tiles.is_passable(-1, 1)
+    assert not tiles.is_passable(3, 1)
+    assert tiles[1][1] == FLOOR and len(tiles) == 3
+
+    assert tiles.version == 0
+    tiles.toggle_wall(1, 1)
+    assert tiles.get(1, 1) == WALL and tiles.version == 1
+    assert not tiles.set_tile(1, 1, WALL)  # không đổi -> không tăng version
+    assert tiles.version == 1
+
+
+def test_tilemap_bulk_views():
+    tiles = as_tilemap([[1, 0, 1], [0, 0, 1]])
+    assert tiles.free_tiles() == [(1, 0), (0, 1), (1, 1)]
+    assert sorted(map(tuple, tiles.wall_positions().tolist())) == [(0, 0), (2, 0), (2, 1)]
+    copy = tiles.copy()
+    copy.toggle_wall(1, 0)
+    assert tiles.get(1, 0) == FLOOR
+    try:
+        tiles[0][1] = 1
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("hàng của TileMap phải là chỉ-đọc")
+
+
+def test_packed_generator_matches_cells_for_same_seed():
+    from game.maze.generator import cells_to_walls
+    cells = generate_maze(9, 7, seed=42)
+    packed = generate_maze(9, 7, seed=42, packed=True)
+    assert (cells_to_walls(cells) == packed).all()
+    a = maze_to_tiles(cells, 9, 7, seed=7)
+    b = maze_to_tiles(packed, 9, 7, seed=7)
+    assert (a.data == b.data).all()
+    assert (maze_to_tiles(packed, 9, 7, seed=7).data == b.data).all()
+
+
+def _open_edges(walls):
+    from game.maze.generator import WALL_E, WALL_S
+    return int(((walls[:, :-1] & WALL_E) == 0).sum() + ((walls[:-1, :] & WALL_S) == 0).sum())
+
+
+def test_pluggable_generators_build_perfect_mazes():
+    from game.maze.generator import MAZE_GENERATORS
+    for algorithm in MAZE_GENERATORS:
+        walls = generate_maze(12, 9, extra_prob=0, seed=4, packed=True, algorithm=algorithm)
+        assert walls.shape == (9, 12)
+        assert _open_edges(walls) == 12 * 9 - 1
+        tiles = maze_to_tiles(walls, 12, 9, wide_prob=0)
+        assert bfs_path(tiles, (1, 1), (tiles.width - 2, tiles.height - 2))[0]
+
+
+def test_streaming_eller_matches_full_conversion():
+    import numpy as np
+    from game.maze.generator import eller_rows, iter_tile_rows
+    walls = np.vstack(list(eller_rows(10, 30, seed=8)))
+    assert (walls == generate_maze(10, 30, seed=8, packed=True, algorithm="eller")).all()
+    streamed = np.array(list(iter_tile_rows(eller_rows(10, 30, seed=8), 10, 30, seed=2)))
+    assert (streamed == maze_to_tiles(walls, 10, 30, seed=2).data).all()
+
+
+def test_maze_pool_serves_prefetched_and_spills(tmp_path):
+    from game.maze.pool import MazePool, build_maze_tiles
+    pool = MazePool(depth=2, spill_dir=str(tmp_path))
+    pool.prefetch(5, 4)
+    tiles, seed = pool.take(5, 4)
+    assert (tiles.data == build_maze_tiles(5, 4, seed)).all()
+    pool.take(5, 4)
+    pool.shutdown()
+    spilled = list(tmp_path.glob("maze_5x4_*.bin"))
+    assert spilled
+
+    pool = MazePool(depth=2, spill_dir=str(tmp_path))
+    pool.prefetch(5, 4)
+    assert pool.ready_count(5, 4) >= len(spilled[:2])
+    pool.shutdown()
+
+
+def test_maze_pool_rebuilds_when_worker_fails():
+    import threading
+    from game.maze.pool import MazePool
+    release, calls = threading.Event(), []
+
+    def flaky_layers(tiles):
+        calls.append(tiles.shape)
+        if len(calls) == 1:
+            release.wait(5)  # Giữ worker đầu tiên để take() phải đợi đúng future này
+            raise RuntimeError("worker hỏng")
+        return {}
+
+    pool = MazePool(depth=1, build_layers=flaky_layers)
+    pool.prefetch(5, 4)
+    threading.Timer(0.05, release.set).start()
+    tiles, seed = pool.take(5, 4)
+    assert tiles.shape == (9, 11) and tiles.is_passable(1, 1) and len(calls) >= 2
+    assert pool.failures == 1
+    pool.shutdown()
+
+
+def test_maze_pool_counts_failed_prefetch():
+    import time
+    from game.maze.pool import MazePool
+
+    def broken_layers(tiles):
+        raise RuntimeError("worker hỏng")
+
+    pool = MazePool(depth=1, build_layers=broken_layers)
+    pool.prefetch(5, 4)
+    deadline = time.monotonic() + 30
+    while not pool.failures and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert pool.failures == 1 and pool.ready_count(5, 4) == 0
+    pool.shutdown()
+
+
+def test_maze_pool_attaches_layers_from_hooks(tmp_path):
+    from functools import partial
+    from game.ai.landmarks import (attach_landmarks, copy_with_landmarks, find_landmarks, get_landmarks,
+                                   landmark_layers)
+    from game.maze.pool import MazePool
+    hooks = dict(build_layers=partial(landmark_layers, count=3), attach_layers=attach_landmarks)
+    pool = MazePool(depth=1, spill_dir=str(tmp_path), **hooks)
+    tiles, _ = pool.take(6, 5)
+    table = find_landmarks(tiles)
+    assert table is not None and len(table.landmarks) == 3 and get_landmarks(tiles) is table
+    copy = copy_with_landmarks(tiles)
+    assert find_landmarks(copy).landmarks == table.landmarks
+    pool.shutdown()
+
+    pool = MazePool(depth=1, spill_dir=str(tmp_path), **hooks)
+    pool.prefetch(6, 5)
+    tiles, _ = pool.take(6, 5)
+    assert len(find_landmarks(tiles).landmarks) == 3
+    pool.shutdown()
+
+
+def test_tilemap_edit_log():
+    tiles = as_tilemap([[1, 0, 1], [0, 0, 1]])
+    assert tiles.changes_since(0) == []
+    tiles.toggle_wall(1, 0)
+    tiles.toggle_wall(2, 1)
+    assert tiles.changes_since(0) == [(1, 0), (2, 1)]
+    assert tiles.changes_since(1) == [(2, 1)]
+    assert tiles.changes_since(5) is None
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from game.maze.generator import eller_rows, generate_maze, iter_tile_rows, maze_to_tiles
+from game.maze.serializers import (MazeFile, MazeFormatError, export_json, load_json,
+                                   load_maze, save_maze, save_maze_rows)
+from game.maze.tilemap import MUD
+
+
+def test_binary_roundtrip_with_cost_layer(tmp_path):
+    tiles = maze_to_tiles(generate_maze(9, 5, seed=1, packed=True), 9, 5, seed=1)
+    cost = np.arange(tiles.width * tiles.height, dtype=np.uint16).reshape(tiles.shape)
+    path = tmp_path / "maze.bin"
+    save_maze(path, tiles, seed=1, theme="ice", layers={"danger": cost})
+
+    loaded, meta = load_maze(path, with_layers=True)
+    assert (loaded.data == tiles.data).all()
+    assert meta["seed"] == 1 and meta["theme"] == "ice"
+    assert (meta["layers"]["danger"] == cost).all()
+
+    with MazeFile(path) as maze_file:
+        view = maze_file.layer("danger")
+        assert not view.flags.writeable
+        assert view[2, 3] == cost[2, 3]
+        del view
+
+
+def test_streamed_rows_match_full_save(tmp_path):
+    rows = list(iter_tile_rows(eller_rows(7, 11, seed=3), 7, 11, seed=3))
+    save_maze_rows(tmp_path / "a.bin", iter(rows), 15, 23, seed=3)
+    save_maze(tmp_path / "b.bin", np.array(rows), seed=3)
+    assert (tmp_path / "a.bin").read_bytes() == (tmp_path / "b.bin").read_bytes()
+
+    # Nguồn hàng thiếu: báo lỗi và không để lại file nào (kể cả file cũ cùng tên vẫn nguyên)
+    with pytest.raises(ValueError):
+        save_maze_rows(tmp_path / "short.bin", iter(rows[:-1]), 15, 23)
+    with pytest.raises(ValueError):
+        save_maze_rows(tmp_path / "a.bin", iter(rows[:5]), 15, 23, seed=3)
+    # Ô địa hình không bit-pack được: báo lỗi thay vì ghi thành đường
+    muddy = [row.copy() for row in rows]
+    muddy[3][np.flatnonzero(muddy[3] == 0)[0]] = MUD
+    with pytest.raises(ValueError):
+        save_maze_rows(tmp_path / "a.bin", iter(muddy), 15, 23, seed=3)
+    # save_maze cũng ghi qua file tạm: lỗi giữa chừng giữ nguyên file cũ
+    with pytest.raises(ValueError):
+        save_maze(tmp_path / "b.bin", np.array(rows), theme="x" * 40)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.bin", "b.bin"]
+    assert (tmp_path / "a.bin").read_bytes() == (tmp_path / "b.bin").read_bytes()
+
+
+def test_json_export_and_bad_magic(tmp_path):
+    tiles = maze_to_tiles(generate_maze(4, 3, seed=2, packed=True), 4, 3, seed=2)
+    export_json(tmp_path / "m.json", tiles, seed=2)
+    loaded, meta = load_json(tmp_path / "m.json")
+    assert (loaded.data == tiles.data).all() and meta["seed"] == 2
+
+    (tmp_path / "bad.bin").write_bytes(b"NOPE" + bytes(64))
+    with pytest.raises(MazeFormatError):
+        MazeFile(tmp_path / "bad.bin")
+
+    # Số layer hỏng trỏ ra ngoài file
+    save_maze(tmp_path / "m.bin", tiles)
+    raw = bytearray((tmp_path / "m.bin").read_bytes())
+    raw[6:8] = (60000).to_bytes(2, "little")
+    (tmp_path / "m.bin").write_bytes(bytes(raw))
+    with pytest.raises(MazeFormatError):
+        MazeFile(tmp_path / "m.bin")
+
+
+def test_landmark_layers_roundtrip(tmp_path):
+    from game.ai.landmarks import LandmarkTable, attach_landmarks, landmark_layers
+    tiles = maze_to_tiles(generate_maze(9, 5, seed=4, packed=True), 9, 5, seed=4)
+    layers = landmark_layers(tiles, 4)
+    save_maze(tmp_path / "maze.bin", tiles, layers=layers)
+    loaded, meta = load_maze(tmp_path / "maze.bin", with_layers=True)
+    table = attach_landmarks(loaded, meta["layers"])
+    assert len(table.landmarks) == 4 and meta["layers"]["landmark0"].dtype == np.int32
+    goal = (loaded.width - 2, loaded.height - 2)
+    assert table.heuristic(goal) == LandmarkTable(tiles, 4).heuristic(goal)